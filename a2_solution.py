@@ -2,8 +2,15 @@
 A model of a zombie survival game wherein the player has to reach
 the hospital whilst evading zombies.
 """
-from typing import Tuple, Optional, Dict, List
+from typing import (Tuple, Optional, Dict, List, Iterable, Iterator, Callable,
+                    Set)
+from collections import deque
+import bisect
+import copy
+import functools
+import itertools
 import random
+import re
 from constants import *
 import math
 
@@ -22,6 +29,143 @@ def random_directions() -> List[Tuple[int, int]]:
     return random.sample(OFFSETS, k=4)
 
 
+_PERMUTATIONS = [list(order) for order in itertools.permutations(OFFSETS)]
+
+RNGState = Tuple[int, int, int]
+"""
+RNGState is the state of a GameRNG as a (seed, block, offset) tuple of the
+seed, the number of the block of directions currently being read and the
+number of directions already read from that block.
+"""
+
+
+class GameRNG:
+    """
+    A GameRNG is the source of randomness of a single game.
+
+    Random direction orders are generated in blocks, each block being derived
+    only from the seed and the number of the block. The whole state of the
+    generator is therefore three integers, which makes it cheap to save and
+    restore, so a saved or copied game continues with the same sequence.
+
+    Examples:
+        >>> rng = GameRNG(42)
+        >>> first = [rng.directions() for _ in range(3)]
+        >>> state = rng.get_state()
+        >>> later = [rng.directions() for _ in range(3)]
+        >>> GameRNG(42).directions() == first[0]
+        True
+        >>> copy = GameRNG()
+        >>> copy.set_state(state)
+        >>> [copy.directions() for _ in range(3)] == later
+        True
+        >>> sorted(rng.directions()) == sorted(OFFSETS)
+        True
+
+        A state saved at the end of a block continues with the next block.
+
+        >>> rng = GameRNG(1)
+        >>> for _ in range(GameRNG.BLOCK_SIZE): order = rng.directions()
+        >>> state = rng.get_state()
+        >>> state
+        (1, 0, 1024)
+        >>> copy = GameRNG()
+        >>> copy.set_state(state)
+        >>> copy.directions() == rng.directions()
+        True
+    """
+
+    BLOCK_SIZE = 1024
+    """The number of direction orders derived from each seed and block."""
+
+    CHUNK_SIZE = 64
+    """The number of direction orders generated at a time."""
+
+    def __init__(self, seed: Optional[int] = None):
+        """
+        Construct a generator from a seed.
+
+        Parameters:
+            seed: The seed of the generator. If None, a seed is drawn from the
+                  random module, so seeding the random module still makes
+                  games reproducible.
+        """
+        if seed is None:
+            seed = random.getrandbits(63)
+        self._seed = seed
+        self._block = -1
+        self._buffer = b""
+        self._offset = 0
+        self._generator: Optional[random.Random] = None
+
+    def get_seed(self) -> int:
+        """Return the seed of this generator."""
+        return self._seed
+
+    def directions(self) -> List[Tuple[int, int]]:
+        """
+        Return a randomly sorted list of the direction offsets, see the
+        `random_directions` function.
+        """
+        if self._offset >= len(self._buffer):
+            self._draw()
+        order = _PERMUTATIONS[self._buffer[self._offset]]
+        self._offset += 1
+        return order[:]
+
+    def _draw(self) -> None:
+        """
+        Generate the next direction orders of the current block, at least
+        up to the current offset, moving on to the next block once the
+        current block is used up.
+
+        Blocks are generated CHUNK_SIZE orders at a time, so short games
+        only pay for the orders they read.
+        """
+        if self._block < 0 or self._offset >= self.BLOCK_SIZE:
+            self._block += 1
+            self._buffer = b""
+            self._offset = 0
+            self._generator = None
+        if self._generator is None:
+            self._generator = random.Random(f"{self._seed}:{self._block}")
+            if self._buffer:
+                # Skip the orders already generated, each took 64 bits.
+                self._generator.getrandbits(64 * len(self._buffer))
+        count = min(max(self.CHUNK_SIZE, self._offset + 1 - len(self._buffer)),
+                    self.BLOCK_SIZE - len(self._buffer))
+        self._buffer += bytes(self._generator.choices(
+            range(len(_PERMUTATIONS)), k=count))
+
+    def get_state(self) -> RNGState:
+        """Return the state of this generator, see RNGState."""
+        return self._seed, self._block, self._offset
+
+    def set_state(self, state: RNGState) -> None:
+        """
+        Restore a state returned by `get_state`.
+
+        Parameters:
+            state: The state to restore.
+        """
+        seed, block, offset = state
+        self._seed = seed
+        self._block = block
+        self._buffer = b""
+        self._offset = offset
+        self._generator = None
+
+    def __copy__(self) -> "GameRNG":
+        """
+        Return a generator with the same state which does not share the
+        random.Random of this generator.
+        """
+        rng = GameRNG.__new__(GameRNG)
+        rng.__dict__.update(self.__dict__)
+        rng._generator = None
+        return rng
+
+
 def first_in_direction(
     grid: 'Grid', start: 'Position', offset: 'Position'
 ) -> Optional[Tuple['Position', 'Entity']]:
@@ -34,16 +178,7 @@ def first_in_direction(
     Returns: A tuple of a position and the first entity found in the
         given direction, None if no entity found
     """
-    position = start.add(offset)
-
-    while grid.in_bounds(position):
-        entity = grid.get_entity(position)
-        if entity is not None:
-            return position, entity
-
-        position = position.add(offset)
-
-    return None
+    return grid.first_in_direction(start, offset)
 
 
 class Position:
@@ -64,6 +199,8 @@ class Position:
         4
     """
 
+    __slots__ = ("_x", "_y", "_hash", "_table", "_neighbours")
+
     def __init__(self, x: int, y: int):
         """
         The position class is constructed from the x and y coordinate which the
@@ -75,6 +212,10 @@ class Position:
         """
         self._x = x
         self._y = y
+        self._hash = hash((x, y))
+        # The intern table this position belongs to, see PositionTable.
+        self._table: Optional["PositionTable"] = None
+        self._neighbours: Optional[Dict["Position", "Position"]] = None
 
     def get_x(self) -> int:
         """Returns the x coordinate of the position."""
@@ -141,9 +282,19 @@ class Position:
 
         Returns:
             A new position representing the current position plus
-            the given position.
-        """
-        return Position(self._x + position.get_x(), self._y + position.get_y())
+            the given position. If this position is interned, the interned
+            instance of the result is returned instead of a new position.
+        """
+        table = self._table
+        if table is not None:
+            neighbours = self._neighbours
+            if neighbours is None:
+                neighbours = self._neighbours = table.neighbours(self)
+            neighbour = neighbours.get(position)
+            if neighbour is not None:
+                return neighbour
+            return table.get(self._x + position._x, self._y + position._y)
+        return Position(self._x + position._x, self._y + position._y)
 
     def __eq__(self, other: object) -> bool:
         """
@@ -159,9 +310,11 @@ class Position:
         # an __eq__ method needs to support any object for example
         # so it can handle `Position(1, 2) == 2`
         # https://www.pythontutorial.net/python-oop/python-__eq__/
+        if self is other:
+            return True
         if not isinstance(other, Position):
             return False
-        return self.get_x() == other.get_x() and self.get_y() == other.get_y()
+        return self._x == other._x and self._y == other._y
 
     def __hash__(self) -> int:
         """
@@ -174,9 +327,11 @@ class Position:
         Therefore, we can calculate an appropriate hash by hashing a tuple of
         the x and y values.
 
+        The hash is calculated once when the position is constructed.
+
         Reference: https://stackoverflow.com/questions/17585730/what-does-hash-do-in-python
         """
-        return hash((self.get_x(), self.get_y()))
+        return self._hash
 
     def __repr__(self) -> str:
         """
@@ -202,6 +357,161 @@ class Position:
         """
         return self.__repr__()
 
+    def __reduce__(self):
+        """
+        Pickle a position by its coordinates and the size of its intern table
+        so that the intern table itself is never pickled.
+        """
+        size = None if self._table is None else self._table.get_size()
+        return _unpickle_position, (self._x, self._y, size)
+
+
+def _unpickle_position(x: int, y: int, size: Optional[int]) -> Position:
+    """Return the position (x, y), interned if size is not None."""
+    if size is None:
+        return Position(x, y)
+    return PositionTable.for_size(size).get(x, y)
+
+
+_SIZE_CACHE = 16
+"""
+The number of grid sizes, the ones used last, whose shared tables are kept,
+see `PositionTable.for_size`, `neighbour_indices` and `BatchStepper.for_size`.
+A grid or game keeps its own tables alive, so dropping the tables of a size
+only means that the next grids of that size build them again.
+"""
+
+
+class PositionTable:
+    """
+    A PositionTable interns the positions of a grid of a given size so that
+    each (x, y) coordinate exists as exactly one Position instance.
+
+    The table covers every position in the grid plus a border one position
+    wide, so that any position one step away from a position in the grid is
+    also interned. Positions outside of this area are not interned.
+
+    Adding an offset to an interned position returns the interned result,
+    which means that moving around the grid does not construct new positions.
+
+    Examples:
+        >>> table = PositionTable.for_size(5)
+        >>> start = table.get(1, 2)
+        >>> start is table.get(1, 2)
+        True
+        >>> start.add(Position(0, 1)) is table.get(1, 3)
+        True
+        >>> table.get(-1, 5)
+        Position(-1, 5)
+        >>> table.intern(Position(9, 9)) is table.intern(Position(9, 9))
+        False
+    """
+
+    EAGER_SIZE = 128
+    """Tables for grids up to this size create every position upfront."""
+
+    def __init__(self, size: int):
+        """
+        Construct an intern table for grids of the given size.
+
+        Use `PositionTable.for_size` instead so that every grid of the same
+        size shares one table.
+
+        Parameters:
+            size: The length and width of the grid.
+        """
+        self._size = size
+        self._width = size + 2
+        self._positions: List[Optional[Position]] = [None] * self._width ** 2
+        if size <= self.EAGER_SIZE:
+            for y in range(-1, size + 1):
+                for x in range(-1, size + 1):
+                    self.get(x, y)
+
+    @classmethod
+    @functools.lru_cache(maxsize=_SIZE_CACHE)
+    def for_size(cls, size: int) -> "PositionTable":
+        """
+        Return the shared intern table for grids of the given size.
+
+        Only the tables of the last _SIZE_CACHE sizes are kept. Positions
+        interned by a dropped table are still equal to the positions of the
+        new table of their size, they are only not the same instances.
+
+        Parameters:
+            size: The length and width of the grid.
+        """
+        return cls(size)
+
+    def get_size(self) -> int:
+        """Return the size of the grid this table interns positions for."""
+        return self._size
+
+    def get(self, x: int, y: int) -> Position:
+        """
+        Return the interned position (x, y), or a new position if (x, y) is
+        outside of the area covered by this table.
+
+        Parameters:
+            x: The x coordinate of the position.
+            y: The y coordinate of the position.
+        """
+        size = self._size
+        if -1 <= x <= size and -1 <= y <= size:
+            index = (y + 1) * self._width + x + 1
+            position = self._positions[index]
+            if position is None:
+                position = Position(x, y)
+                position._table = self
+                self._positions[index] = position
+            return position
+        return Position(x, y)
+
+    def intern(self, position: Position) -> Position:
+        """
+        Return the interned position equal to the given position, or the given
+        position if it is outside of the area covered by this table.
+
+        Parameters:
+            position: The position to intern.
+        """
+        if position._table is self:
+            return position
+        size = self._size
+        x = position._x
+        y = position._y
+        if -1 <= x <= size and -1 <= y <= size:
+            return self.get(x, y)
+        return position
+
+    def neighbours(self, position: Position) -> Dict[Position, Position]:
+        """
+        Return a dictionary mapping each of the direction offsets to the
+        interned position reached by adding the offset to the given position.
+
+        Parameters:
+            position: An interned position of this table.
+        """
+        return {offset: self.get(position._x + offset._x,
+                                 position._y + offset._y)
+                for offset in OFFSET_POSITIONS.values()}
+
+    def __reduce__(self):
+        """Pickle an intern table as a reference to the shared table."""
+        return PositionTable.for_size, (self._size,)
+
+
+OFFSET_POSITIONS = {offset: Position(*offset) for offset in OFFSETS}
+"""The shared Position instance for each of the direction offsets."""
+
+DIRECTION_OFFSETS = {
+    UP: OFFSET_POSITIONS[(0, -1)],
+    DOWN: OFFSET_POSITIONS[(0, 1)],
+    LEFT: OFFSET_POSITIONS[(-1, 0)],
+    RIGHT: OFFSET_POSITIONS[(1, 0)],
+}
+"""The shared offset Position for each direction a player can move in."""
+
 
 class GameInterface:
     """
@@ -267,6 +577,20 @@ def load_map(filename: str) -> Tuple[EntityLocations, int]:
     with open(filename) as map_file:
         contents = map_file.readlines()
 
+    return parse_map(contents)
+
+
+def parse_map(contents: List[str]) -> Tuple[EntityLocations, int]:
+    """
+    Convert the lines of a map file into a tuple, see `load_map`.
+
+    Examples:
+        >>> parse_map(["  P\\n", "H  \\n", "   \\n"])
+        ({(2, 0): 'P', (0, 1): 'H'}, 3)
+
+    Parameters:
+        contents: The lines of the map file.
+    """
     result = {}
     for y, line in enumerate(contents):
         for x, char in enumerate(line.strip("\n")):
@@ -285,8 +609,13 @@ class Entity:
     For example, the game grid will always have a player, so a player is
     considered a type of entity. A game grid may also have a zombie, so a
     zombie is considered a type of entity.
+
+    Entities are slotted, subclasses which add a state declare the
+    attributes of that state in `__slots__`.
     """
 
+    __slots__ = ()
+
     def step(self, position: Position, game: "Game") -> None:
         """
         The `step` method is called on every entity in the game grid after each
@@ -303,6 +632,18 @@ class Entity:
         """
         pass
 
+    def get_period(self) -> int:
+        """
+        Return the number of _step_ events between two steps of this entity.
+
+        Entities whose class overrides this method are scheduled: instead of
+        stepping at every _step_ event they step when their timer in the grid
+        is due, see `Grid.schedule`, and may reschedule themselves from their
+        step method with `Game.schedule`. Other entities step at every
+        _step_ event, so this method is only called on scheduled entities.
+        """
+        return 1
+
     def display(self) -> str:
         """
         Return the character used to represent this entity in a text-based grid.
@@ -318,6 +659,20 @@ class Entity:
         """
         raise NotImplementedError()
 
+    def copy(self) -> "Entity":
+        """
+        Return an entity of the same type and with the same state as this
+        entity, which can be changed without changing this entity.
+        """
+        return copy.copy(self)
+
+    def state_hash(self) -> int:
+        """
+        Return a 64 bit hash of the state of this entity apart from its type,
+        0 for entities without a state of their own, see `Game.state_hash`.
+        """
+        return 0
+
     def __repr__(self) -> str:
         """
         Return a representation of this entity.
@@ -354,6 +709,8 @@ class Player(Entity):
         'P'
     """
 
+    __slots__ = ()
+
     def display(self) -> str:
         """
         Return the character used to represent the player entity in a
@@ -380,6 +737,8 @@ class Hospital(Entity):
         'H'
     """
 
+    __slots__ = ()
+
     def display(self) -> str:
         """
         Return the character used to represent the hospital entity in a
@@ -390,6 +749,169 @@ class Hospital(Entity):
         return HOSPITAL
 
 
+ENTITY_CODES = {
+    PLAYER: 1,
+    HOSPITAL: 2,
+    ZOMBIE: 3,
+    TRACKING_ZOMBIE: 4,
+    GARLIC: 5,
+    CROSSBOW: 6,
+}
+"""
+ENTITY_CODES maps the display character of each entity to the one byte
+type code used by array backed storage. Code 0 is reserved for empty cells.
+"""
+
+OTHER_CODE = 255
+"""Type code used for entities whose display character has no code."""
+
+
+_TYPE_CODES: Dict[type, int] = {}
+
+
+def entity_code(entity: Entity) -> int:
+    """
+    Return the type code of an entity, see ENTITY_CODES.
+
+    Examples:
+        >>> entity_code(Zombie())
+        3
+
+    Parameters:
+        entity: The entity to find the code of.
+    """
+    kind = type(entity)
+    code = _TYPE_CODES.get(kind)
+    if code is None:
+        code = _TYPE_CODES[kind] = ENTITY_CODES.get(entity.display(),
+                                                     OTHER_CODE)
+    return code
+
+
+_MASK64 = (1 << 64) - 1
+
+# Tags which keep the Zobrist keys of the parts of a game other than its grid
+# apart from the keys of the cells, see `Game.state_hash`.
+_STEPS_TAG = 1 << 60
+_INFECTED_TAG = 2 << 60
+_PICKUP_TAG = 3 << 60
+_SLOT_TAG = 4 << 60
+
+
+def splitmix64(value: int) -> int:
+    """
+    Return the output of the splitmix64 generator in the given 64 bit state.
+
+    Consecutive inputs give unrelated outputs, so the Zobrist keys used to
+    hash games are derived from it instead of being stored in a table.
+
+    Examples:
+        >>> splitmix64(0)
+        16294208416658607535
+        >>> splitmix64(1)
+        10451216379200822465
+
+    Parameters:
+        value: The state of the generator.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def zobrist_key(index: int, code: int) -> int:
+    """
+    Return the Zobrist key of an entity with the given type code in the cell
+    with the given index, i.e. y * size + x, see `Grid.get_hash`.
+
+    The keys used last are remembered, at most 65536 of them, since a large
+    grid has millions of (cell, type code) pairs.
+
+    Parameters:
+        index: The index of the cell.
+        code: The type code of the entity, see ENTITY_CODES.
+    """
+    return splitmix64(index << 8 | code)
+
+
+_ACTOR_TYPES: Dict[type, bool] = {}
+_SCHEDULED_TYPES: Dict[type, bool] = {}
+
+
+def is_actor(entity: Entity) -> bool:
+    """
+    Return true if the entity steps at every _step_ event, i.e. its class
+    overrides the `step` method of the Entity class which does nothing but
+    does not override `Entity.get_period`, see `is_scheduled`.
+
+    Examples:
+        >>> is_actor(Hospital())
+        False
+        >>> is_actor(Zombie())
+        True
+
+    Parameters:
+        entity: The entity to check.
+    """
+    kind = type(entity)
+    result = _ACTOR_TYPES.get(kind)
+    if result is None:
+        result = _ACTOR_TYPES[kind] = (kind.step is not Entity.step
+                                       and not is_scheduled(entity))
+    return result
+
+
+def is_scheduled(entity: Entity) -> bool:
+    """
+    Return true if the entity steps when its timer is due rather than at
+    every _step_ event, i.e. its class overrides `Entity.get_period`.
+
+    Examples:
+        >>> class SlowZombie(Zombie):
+        ...     def get_period(self):
+        ...         return 3
+        >>> is_scheduled(SlowZombie()), is_actor(SlowZombie())
+        (True, False)
+        >>> is_scheduled(Zombie())
+        False
+
+    Parameters:
+        entity: The entity to check.
+    """
+    kind = type(entity)
+    result = _SCHEDULED_TYPES.get(kind)
+    if result is None:
+        result = _SCHEDULED_TYPES[kind] = (
+            kind.get_period is not Entity.get_period)
+    return result
+
+
+_FLYWEIGHTS: Dict[type, Entity] = {}
+
+
+def flyweight(kind: type) -> Entity:
+    """
+    Return the instance of an entity class without a state of its own, e.g.
+    Hospital or Zombie, which is shared by every caller.
+
+    The map loaders place this instance in every cell holding such an
+    entity, so a map with many zombies only constructs one zombie.
+
+    Examples:
+        >>> flyweight(Zombie) is flyweight(Zombie)
+        True
+
+    Parameters:
+        kind: The entity class, whose instances must not have a state.
+    """
+    entity = _FLYWEIGHTS.get(kind)
+    if entity is None:
+        entity = _FLYWEIGHTS[kind] = kind()
+    return entity
+
+
 class Grid:
     """
     The Grid class is used to represent the 2D grid of entities.
@@ -427,12 +949,63 @@ class Grid:
             size: The length and width of the grid.
         """
         self._size = size
+        self._positions = PositionTable.for_size(size)
         self._tiles: Dict[Position, Entity] = {}
+        # Positions of the entities in the grid grouped by display character.
+        self._by_token: Dict[str, Dict[Position, None]] = {}
+        # The sorted x coordinates of the entities in each row and the sorted
+        # y coordinates of the entities in each column.
+        self._rows: Dict[int, List[int]] = {}
+        self._columns: Dict[int, List[int]] = {}
+        # Entities which have a step behaviour, see `get_actors`.
+        self._actors: Dict[Position, Entity] = {}
+        self._actors_unordered = False
+        # The _step_ event at which each scheduled entity is next due and the
+        # positions of the scheduled entities due at each event, see
+        # `schedule`.
+        self._timers: Dict[Position, int] = {}
+        self._calendar: Dict[int, Dict[Position, None]] = {}
+        # Names of the containers still shared with a fork, see `fork`.
+        self._shared: Set[str] = set()
+        # (position, entity before the change) pairs of every change to the
+        # grid while it is recorded by a TimeMachine.
+        self._journal: Optional[List[Tuple[Position, Optional[Entity]]]] = None
+        # Functions called with each position changed, see `add_listener`.
+        self._listeners: List[Callable[[Position], None]] = []
+        # The XOR of the Zobrist keys of the entities, see `get_hash`.
+        self._hash = 0
+
+    _SHARED_FIELDS: Tuple[str, ...] = ("_tiles", "_by_token", "_rows",
+                                       "_columns", "_actors", "_timers",
+                                       "_calendar")
+    """The containers of a grid which are shared with its forks."""
+
+    _NESTED_FIELDS: Tuple[str, ...] = ("_by_token", "_rows", "_columns",
+                                       "_calendar")
+    """The shared containers whose values are containers themselves."""
+
+    _ENTITY_FIELDS: Tuple[str, ...] = ("_tiles", "_actors")
+    """The shared containers which refer to the stateful entities."""
+
+    PENDING = -1
+    """The timer of a scheduled entity which is due at the next _step_ event."""
 
     def get_size(self) -> int:
         """Returns the size of the grid."""
         return self._size
 
+    def get_position(self, x: int, y: int) -> Position:
+        """
+        Return the interned position (x, y) of this grid.
+
+        See the PositionTable class for details.
+
+        Parameters:
+            x: The x coordinate of the position.
+            y: The y coordinate of the position.
+        """
+        return self._positions.get(x, y)
+
     def in_bounds(self, position: Position) -> bool:
         """
         Return True if the given position is within the bounds of the grid.
@@ -493,7 +1066,26 @@ class Grid:
             >>> grid.get_entity(Position(-1, 0))
         """
         if self.in_bounds(position):
-            self._tiles[position] = entity
+            if self._shared:
+                self._unshare(self._SHARED_FIELDS)
+            position = self._positions.intern(position)
+            existing = self._get(position)
+            if self._journal is not None:
+                self._journal.append((position, existing))
+            index = position._y * self._size + position._x
+            self._hash ^= zobrist_key(index, entity_code(entity))
+            if existing is not None:
+                self._hash ^= zobrist_key(index, entity_code(existing))
+                self._untrack(position, existing)
+            self._set(position, entity)
+            self._track(position, entity)
+            self._place_actor(position, existing, entity)
+            if self._timers:
+                self._drop_timer(position)
+            if is_scheduled(entity):
+                self._set_timer(position, self.PENDING)
+            for listener in self._listeners:
+                listener(position)
 
     def remove_entity(self, position: Position) -> None:
         """
@@ -511,7 +1103,22 @@ class Grid:
             >>> grid.remove_entity(Position(0, 0))
             >>> grid.get_entity(Position(0, 0))
         """
-        self._tiles.pop(position, None)
+        entity = self._get(position)
+        if entity is not None:
+            if self._shared:
+                self._unshare(self._SHARED_FIELDS)
+            position = self._positions.intern(position)
+            if self._journal is not None:
+                self._journal.append((position, entity))
+            self._hash ^= zobrist_key(position._y * self._size + position._x,
+                                      entity_code(entity))
+            self._delete(position)
+            self._untrack(position, entity)
+            self._actors.pop(position, None)
+            if self._timers:
+                self._drop_timer(position)
+            for listener in self._listeners:
+                listener(position)
 
     def get_entity(self, position: Position) -> Optional[Entity]:
         """
@@ -525,7 +1132,7 @@ class Grid:
         Parameters:
             position: The (x, y) position in the grid to check for an entity.
         """
-        return self._tiles.get(position)
+        return self._get(position)
 
     def get_mapping(self) -> Dict[Position, Entity]:
         """
@@ -546,7 +1153,7 @@ class Grid:
             >>> grid.get_mapping()
             {Position(0, 0): Player(), Position(3, 3): Hospital()}
         """
-        return self._tiles.copy()
+        return dict(self._items())
 
     def get_entities(self) -> List[Entity]:
         """
@@ -566,7 +1173,7 @@ class Grid:
             >>> grid.get_entities()
             [Hospital(), Player(), Hospital(), Hospital()]
         """
-        return list(self._tiles.values())
+        return [entity for _, entity in self._items()]
 
     def move_entity(self, start: Position, end: Position) -> None:
         """
@@ -596,10 +1203,11 @@ class Grid:
         if start == end:
             return
         if self.in_bounds(start) and self.in_bounds(end):
-            entity = self.get_entity(start)
+            entity = self._get(start)
             if entity is not None:
-                self._tiles[end] = entity
-                del self._tiles[start]
+                end = self._positions.intern(end)
+                self._relocate(self._positions.intern(start), end, entity,
+                               self._get(end))
 
     def find_player(self) -> Optional[Position]:
         """
@@ -616,11 +1224,111 @@ class Grid:
             >>> grid.find_player()
             Position(4, 6)
         """
-        for position, entity in self._tiles.items():
-            if entity.display() == PLAYER:
-                return position
+        players = self._by_token.get(PLAYER)
+        if players:
+            return next(iter(players))
+        return None
+
+    def first_in_direction(
+        self, start: Position, offset: Position
+    ) -> Optional[Tuple[Position, Entity]]:
+        """
+        Return the first entity found by repeatedly adding the offset to the
+        start position, and its position, or None if the edge of the grid is
+        reached first. The start position itself is not checked.
+
+        For the four direction offsets this is a binary search of the
+        entities in the row or column of the start position.
+
+        Parameters:
+            start: The position to search from.
+            offset: The offset to move by at each step of the search.
+
+        Examples:
+            >>> grid = Grid(10)
+            >>> grid.add_entity(Position(2, 5), Player())
+            >>> grid.add_entity(Position(7, 5), Zombie())
+            >>> grid.add_entity(Position(9, 5), Zombie())
+            >>> grid.first_in_direction(Position(2, 5), Position(1, 0))
+            (Position(7, 5), Zombie())
+            >>> grid.first_in_direction(Position(2, 5), Position(-1, 0))
+            >>> grid.first_in_direction(Position(7, 5), Position(-1, 0))
+            (Position(2, 5), Player())
+        """
+        dx = offset._x
+        dy = offset._y
+        if self.in_bounds(start) and abs(dx) + abs(dy) == 1:
+            if dy == 0:
+                line = self._rows.get(start._y, ())
+                here = start._x
+            else:
+                line = self._columns.get(start._x, ())
+                here = start._y
+
+            if dx + dy > 0:
+                index = bisect.bisect_right(line, here)
+                if index == len(line):
+                    return None
+            else:
+                index = bisect.bisect_left(line, here) - 1
+                if index < 0:
+                    return None
+
+            if dy == 0:
+                position = self._positions.get(line[index], start._y)
+            else:
+                position = self._positions.get(start._x, line[index])
+            return position, self._get(position)
+
+        position = start.add(offset)
+        while self.in_bounds(position):
+            entity = self._get(position)
+            if entity is not None:
+                return position, entity
+            position = position.add(offset)
         return None
 
+    def positions_of(self, token: str) -> List[Position]:
+        """
+        Return the positions of every entity in the grid which is displayed
+        with the given character, in the order they were placed in the grid.
+
+        Updating the returned list should have no side-effects.
+
+        Parameters:
+            token: The display character of the entities to find.
+
+        Examples:
+            >>> grid = Grid(5)
+            >>> grid.add_entity(Position(1, 1), Hospital())
+            >>> grid.add_entity(Position(3, 0), Hospital())
+            >>> grid.positions_of(HOSPITAL)
+            [Position(1, 1), Position(3, 0)]
+            >>> grid.positions_of(ZOMBIE)
+            []
+        """
+        return list(self._by_token.get(token, ()))
+
+    def count_of(self, token: str) -> int:
+        """
+        Return the number of entities in the grid which are displayed with
+        the given character.
+
+        Parameters:
+            token: The display character of the entities to count.
+
+        Examples:
+            >>> grid = Grid(5)
+            >>> grid.add_entity(Position(1, 1), Hospital())
+            >>> grid.add_entity(Position(3, 0), Hospital())
+            >>> grid.count_of(HOSPITAL)
+            2
+            >>> grid.remove_entity(Position(1, 1))
+            >>> grid.count_of(HOSPITAL)
+            1
+        """
+        return len(self._by_token.get(token, ()))
+
     def serialize(self) -> Dict[Tuple[int, int], str]:
         """
         Serialize the grid into a dictionary that maps tuples to characters.
@@ -641,44 +1349,413 @@ class Grid:
         """
         serialized = {}
 
-        for position, entity in self._tiles.items():
+        for position, entity in self._items():
             pair = (position.get_x(), position.get_y())
             serialized[pair] = entity.display()
 
         return serialized
 
+    def get_codes(self) -> bytearray:
+        """
+        Return the type code of every cell of the grid in row major order,
+        i.e. the code of position (x, y) is at index y * size + x.
 
-class MapLoader:
-    """
-    The MapLoader class is used to read a map file and create an appropriate
-    Grid instance which stores all the map file entities.
+        See ENTITY_CODES for the meaning of each code, empty cells have the
+        code 0. Updating the returned array should have no side-effects.
 
-    The MapLoader class is an abstract class to allow for extensible map
-    definitions. The BasicMapLoader class described below is a very simple
-    implementation of the MapLoader which only handles the player and hospital
-    entities.
-    """
+        Examples:
+            >>> grid = Grid(2)
+            >>> grid.add_entity(Position(1, 0), Zombie())
+            >>> grid.add_entity(Position(0, 1), Player())
+            >>> list(grid.get_codes())
+            [0, 3, 1, 0]
+        """
+        size = self._size
+        codes = bytearray(size * size)
+        for position, entity in self._items():
+            codes[position._y * size + position._x] = ENTITY_CODES.get(
+                entity.display(), OTHER_CODE)
+        return codes
 
-    def load(self, filename: str) -> Grid:
+    def get_actors(self) -> List[Tuple[Position, Entity]]:
         """
-        Load a new Grid instance from a map file.
+        Return the (position, entity) pairs of every entity in the grid which
+        has a step behaviour, i.e. every entity for which `is_actor` is true.
 
-        Load will open the map file and read each line to find all the entities
-        in the grid and add them to the new Grid instance.
+        The pairs are in the same order as the pairs of `get_mapping`.
+        Updating the returned list should have no side-effects.
 
-        The `create_entity` method below is used to turn a character
-        in the map file into an Entity instance.
+        Examples:
+            >>> grid = Grid(5)
+            >>> grid.add_entity(Position(0, 0), Zombie())
+            >>> grid.add_entity(Position(1, 1), Hospital())
+            >>> grid.add_entity(Position(2, 2), HoldingPlayer())
+            >>> grid.get_actors()
+            [(Position(0, 0), Zombie()), (Position(2, 2), HoldingPlayer())]
+        """
+        if self._actors_unordered:
+            self._actors = {position: entity
+                            for position, entity in self._items()
+                            if is_actor(entity)}
+            self._actors_unordered = False
+        return list(self._actors.items())
 
-        \\textbf{Hint:} The `load_map` function in the support code may be helpful.
+    def schedule(self, position: Position, tick: int) -> None:
+        """
+        Set the timer of the scheduled entity at a position, see
+        `is_scheduled`, to the _step_ event at which it is next due.
+
+        A scheduled entity keeps its timer as it moves and loses it when it
+        is removed. An entity added to the grid is due at the next _step_
+        event, i.e. its timer is PENDING.
+
+        Examples:
+            >>> class SlowZombie(Zombie):
+            ...     def get_period(self):
+            ...         return 3
+            >>> grid = Grid(4)
+            >>> grid.add_entity(Position(0, 0), SlowZombie())
+            >>> grid.get_timer(Position(0, 0)) == Grid.PENDING
+            True
+            >>> grid.schedule(Position(0, 0), 3)
+            >>> grid.move_entity(Position(0, 0), Position(1, 0))
+            >>> grid.get_timer(Position(1, 0)), grid.get_due(3)
+            (3, [Position(1, 0)])
+
+        Parameters:
+            position: The position of the scheduled entity.
+            tick: The number of _step_ events played, see `Game.get_steps`,
+                  when the entity is next due.
+
+        Raises:
+            ValueError: If there is no scheduled entity at the position.
+        """
+        entity = self._get(position)
+        if entity is None or not is_scheduled(entity):
+            raise ValueError(f"No scheduled entity at {position}.")
+        if self._shared:
+            self._unshare(("_timers", "_calendar"))
+        self._set_timer(self._positions.intern(position), tick)
+
+    def get_timer(self, position: Position) -> Optional[int]:
+        """
+        Return the _step_ event at which the scheduled entity at a position
+        is next due, None if there is no scheduled entity at the position.
+
+        Parameters:
+            position: The position of the entity.
+        """
+        return self._timers.get(position)
+
+    def get_due(self, tick: int) -> List[Position]:
+        """
+        Return the positions of the scheduled entities due at a _step_
+        event, i.e. whose timer is PENDING or tick, in the order they were
+        scheduled. Only the due entities are visited.
+
+        Updating the returned list should have no side-effects.
+
+        Parameters:
+            tick: The number of _step_ events played.
+        """
+        calendar = self._calendar
+        if not calendar:
+            return []
+        due = list(calendar.get(self.PENDING, ()))
+        due.extend(calendar.get(tick, ()))
+        return due
+
+    def reset_timers(self) -> None:
+        """Make every scheduled entity due at the next _step_ event."""
+        if self._timers:
+            if self._shared:
+                self._unshare(("_timers", "_calendar"))
+            for position in list(self._timers):
+                self._set_timer(position, self.PENDING)
+
+    def get_hash(self) -> int:
+        """
+        Return the Zobrist hash of the grid, the XOR of the Zobrist keys of
+        every entity in the grid, see `zobrist_key`.
+
+        The hash only depends on the type and position of each entity. It is
+        kept up to date as the grid changes so this takes constant time.
+
+        Examples:
+            >>> grid = Grid(4)
+            >>> grid.add_entity(Position(0, 0), Zombie())
+            >>> grid.add_entity(Position(2, 1), Hospital())
+            >>> before = grid.get_hash()
+            >>> grid.move_entity(Position(0, 0), Position(0, 1))
+            >>> grid.get_hash() == grid.compute_hash() != before
+            True
+            >>> grid.move_entity(Position(0, 1), Position(0, 0))
+            >>> grid.get_hash() == before
+            True
+        """
+        return self._hash
+
+    def compute_hash(self) -> int:
+        """
+        Return the Zobrist hash of the grid computed from every entity in the
+        grid, a slow reference for `get_hash`.
+        """
+        size = self._size
+        result = 0
+        for position, entity in self._items():
+            result ^= zobrist_key(position.get_y() * size + position.get_x(),
+                                  ENTITY_CODES.get(entity.display(),
+                                                   OTHER_CODE))
+        return result
+
+    def fork(self) -> "Grid":
+        """
+        Return a grid with the same entities as this grid which can be
+        changed without changing this grid.
+
+        The two grids share their storage until either of them is changed,
+        at which point the changed grid takes its own copy, so forking takes
+        the same time for any size of grid. Entities are shared by both
+        grids, entities with a state of their own should be replaced with
+        copies before they are changed, see `Game.fork`.
+
+        Examples:
+            >>> grid = Grid(4)
+            >>> grid.add_entity(Position(0, 0), Zombie())
+            >>> fork = grid.fork()
+            >>> fork.move_entity(Position(0, 0), Position(1, 0))
+            >>> grid.serialize(), fork.serialize()
+            ({(0, 0): 'Z'}, {(1, 0): 'Z'})
+        """
+        fork = copy.copy(self)
+        self._shared = set(self._SHARED_FIELDS)
+        fork._shared = set(self._SHARED_FIELDS)
+        fork._journal = None
+        fork._listeners = []
+        return fork
+
+    def add_listener(self, listener: Callable[[Position], None]) -> None:
+        """
+        Call a function with every position of this grid whose entity
+        changes, after the change. Forks of the grid do not call it.
+
+        Examples:
+            >>> grid = Grid(4)
+            >>> changed = []
+            >>> grid.add_listener(changed.append)
+            >>> grid.add_entity(Position(0, 0), Zombie())
+            >>> grid.move_entity(Position(0, 0), Position(0, 1))
+            >>> changed
+            [Position(0, 0), Position(0, 0), Position(0, 1)]
+
+        Parameters:
+            listener: The function to call with each changed position.
+        """
+        self._listeners = self._listeners + [listener]
+
+    def remove_listener(self, listener: Callable[[Position], None]) -> None:
+        """
+        Stop calling a function added by `add_listener`.
+
+        Parameters:
+            listener: The function to stop calling.
+        """
+        self._listeners = [other for other in self._listeners
+                           if other != listener]
+
+    def _replace(self, position: Position, entity: Entity) -> None:
+        """
+        Replace the entity at an occupied position with an entity of the
+        same type, e.g. a copy of it, without changing the indexes.
+        """
+        if self._shared:
+            # The indexes do not change so they can stay shared.
+            self._unshare(self._ENTITY_FIELDS)
+        position = self._positions.intern(position)
+        if self._journal is not None:
+            self._journal.append((position, self._get(position)))
+        self._set(position, entity)
+        if position in self._actors:
+            self._actors[position] = entity
+        for listener in self._listeners:
+            listener(position)
+
+    def _unshare(self, fields: Iterable[str]) -> None:
+        """Take a copy of each of the given containers which is shared."""
+        for name in fields:
+            if name in self._shared:
+                self._shared.discard(name)
+                value = getattr(self, name)
+                if name in self._NESTED_FIELDS:
+                    value = {key: inner.copy() for key, inner in value.items()}
+                else:
+                    value = value.copy()
+                setattr(self, name, value)
+
+    def _relocate(self, start: Position, end: Position, entity: Entity,
+                  existing: Optional[Entity]) -> None:
+        """
+        Move the entity at start to end, replacing the existing entity at end
+        (None if end is empty), and update the indexes.
+
+        Both positions must be distinct, interned and in bounds.
+        """
+        if self._shared:
+            self._unshare(self._SHARED_FIELDS)
+        if self._journal is not None:
+            self._journal.append((start, entity))
+            self._journal.append((end, existing))
+        size = self._size
+        end_index = end._y * size + end._x
+        code = entity_code(entity)
+        self._hash ^= (zobrist_key(start._y * size + start._x, code)
+                       ^ zobrist_key(end_index, code))
+        if existing is not None:
+            self._hash ^= zobrist_key(end_index, entity_code(existing))
+            self._untrack(end, existing)
+        self._move(start, end, entity)
+        self._untrack(start, entity)
+        self._track(end, entity)
+        self._place_actor(end, existing, entity)
+        self._actors.pop(start, None)
+        if self._timers:
+            self._move_timer(start, end)
+        for listener in self._listeners:
+            listener(start)
+            listener(end)
+
+    def _place_actor(self, position: Position, existing: Optional[Entity],
+                     entity: Entity) -> None:
+        """
+        Update the actors after an entity was stored at a position, replacing
+        the existing entity at that position (None if it was empty).
+        """
+        if is_actor(entity):
+            if existing is not None and not is_actor(existing):
+                # The entity took over the storage slot of an entity which
+                # does not step, so its place in the step order is unknown.
+                self._actors_unordered = True
+            self._actors[position] = entity
+        elif existing is not None and is_actor(existing):
+            del self._actors[position]
+
+    def _set_timer(self, position: Position, tick: int) -> None:
+        """Set the timer of the scheduled entity at an interned position."""
+        self._drop_timer(position)
+        self._timers[position] = tick
+        due = self._calendar.get(tick)
+        if due is None:
+            due = self._calendar[tick] = {}
+        due[position] = None
+
+    def _drop_timer(self, position: Position) -> None:
+        """Forget the timer, if any, of the entity at a position."""
+        tick = self._timers.pop(position, None)
+        if tick is not None:
+            due = self._calendar[tick]
+            del due[position]
+            if not due:
+                del self._calendar[tick]
+
+    def _move_timer(self, start: Position, end: Position) -> None:
+        """Move the timer, if any, of an entity which moved from start to end."""
+        self._drop_timer(end)
+        tick = self._timers.get(start)
+        if tick is not None:
+            self._drop_timer(start)
+            self._set_timer(end, tick)
+
+    def _track(self, position: Position, entity: Entity) -> None:
+        """Add an entity which was placed at a position to the indexes."""
+        token = entity.display()
+        positions = self._by_token.get(token)
+        if positions is None:
+            positions = self._by_token[token] = {}
+        positions[position] = None
+
+        x = position._x
+        y = position._y
+        row = self._rows.get(y)
+        if row is None:
+            row = self._rows[y] = []
+        bisect.insort(row, x)
+        column = self._columns.get(x)
+        if column is None:
+            column = self._columns[x] = []
+        bisect.insort(column, y)
+
+    def _untrack(self, position: Position, entity: Entity) -> None:
+        """Remove an entity which left a position from the indexes."""
+        del self._by_token[entity.display()][position]
+
+        x = position._x
+        y = position._y
+        row = self._rows[y]
+        del row[bisect.bisect_left(row, x)]
+        column = self._columns[x]
+        del column[bisect.bisect_left(column, y)]
+
+    # The methods below are the storage primitives used by the public methods
+    # above. Subclasses can change how entities are stored by overriding only
+    # these methods. Positions given to them are always in bounds.
+
+    def _get(self, position: Position) -> Optional[Entity]:
+        """Return the entity stored at the position, None if empty."""
+        return self._tiles.get(position)
+
+    def _set(self, position: Position, entity: Entity) -> None:
+        """Store the entity at the position, replacing any existing entity."""
+        self._tiles[position] = entity
+
+    def _delete(self, position: Position) -> None:
+        """Remove the entity stored at the position, which must exist."""
+        del self._tiles[position]
+
+    def _move(self, start: Position, end: Position, entity: Entity) -> None:
+        """Move the entity stored at start to end, replacing any entity."""
+        self._tiles[end] = entity
+        del self._tiles[start]
+
+    def _items(self) -> Iterable[Tuple[Position, Entity]]:
+        """Return an iterable of (position, entity) pairs in storage order."""
+        return self._tiles.items()
+
+
+class MapLoader:
+    """
+    The MapLoader class is used to read a map file and create an appropriate
+    Grid instance which stores all the map file entities.
+
+    The MapLoader class is an abstract class to allow for extensible map
+    definitions. The BasicMapLoader class described below is a very simple
+    implementation of the MapLoader which only handles the player and hospital
+    entities.
+    """
+
+    def load(self, filename: str, grid_type: type = Grid) -> Grid:
+        """
+        Load a new Grid instance from a map file.
+
+        Load will open the map file and read each line to find all the entities
+        in the grid and add them to the new Grid instance.
+
+        The `create_entity` method below is used to turn a character
+        in the map file into an Entity instance.
+
+        \\textbf{Hint:} The `load_map` function in the support code may be helpful.
 
         Parameters:
             filename: Path where the map file should be found.
+            grid_type: The Grid subclass used to store the entities,
+                       i.e. Grid or ArrayGrid, which also decides the
+                       order the actors step in, see ArrayGrid.
         """
         mapping, size = load_map(filename)
 
-        grid = Grid(size)
+        grid = grid_type(size)
         for position, entity in mapping.items():
-            grid.add_entity(Position(*position), self.create_entity(entity))
+            grid.add_entity(grid.get_position(*position),
+                            self.create_entity(entity))
 
         return grid
 
@@ -720,13 +1797,16 @@ class BasicMapLoader(MapLoader):
         When a token is provided that does not represent the Player or Hospital,
         this method should raise a ValueError.
 
+        Entities without a state of their own, such as hospitals, are shared
+        by every cell holding one, see `flyweight`.
+
         Parameters:
             token: Character representing the Entity subtype.
         """
         if token == PLAYER:
             return Player()
         elif token == HOSPITAL:
-            return Hospital()
+            return flyweight(Hospital)
 
         raise ValueError(f"Unrecognised entity '{token}' in map file.")
 
@@ -740,7 +1820,7 @@ class Game:
     within the grid so that the player can be controlled.
     """
 
-    def __init__(self, grid: Grid):
+    def __init__(self, grid: Grid, seed: Optional[int] = None):
         """
         The construction of a Game instance takes the grid upon which the game
         is being played.
@@ -750,15 +1830,24 @@ class Game:
 
         Parameters:
             grid (Grid): The game's grid.
+            seed: The seed of the game's random number generator, see GameRNG.
         """
         self._grid = grid
         self._player_position = grid.find_player()
         self._steps = 0
+        self._rng = GameRNG(seed)
+        self._stepper: Optional["BatchStepper"] = None
+        self._flow_field: Optional["FlowField"] = None
+        self._time_machine: Optional["TimeMachine"] = None
 
     def get_grid(self) -> Grid:
         """Return the grid on which this game is being played."""
         return self._grid
 
+    def get_rng(self) -> GameRNG:
+        """Return the random number generator of this game."""
+        return self._rng
+
     def get_player(self) -> Optional[Player]:
         """
         Return the instance of the Player class in the grid.
@@ -785,10 +1874,175 @@ class Game:
         it should pass the entity's current position and this game as parameters.
 
         Note: Do not call this method in the `move_player` method.
-        """
-        for position, entity in self._grid.get_mapping().items():
-            entity.step(position, self)
+
+        Entities which do not have a step behaviour are skipped, see
+        `Grid.get_actors`. Since the positions of the grid are interned,
+        stepping the game does not construct any new Position instances.
+
+        Scheduled entities, see `is_scheduled`, step after the other entities
+        and only when they are due, see `schedule`.
+
+        Examples:
+            >>> grid = Grid(6)
+            >>> grid.add_entity(Position(0, 0), HoldingPlayer())
+            >>> grid.add_entity(Position(3, 3), Zombie())
+            >>> grid.add_entity(Position(5, 1), TrackingZombie())
+            >>> game = AdvancedGame(grid)
+            >>> constructed = []
+            >>> init = Position.__init__
+            >>> Position.__init__ = lambda self, x, y: (
+            ...     constructed.append((x, y)) or init(self, x, y))
+            >>> for _ in range(20):
+            ...     game.move_player(game.direction_to_offset(RIGHT))
+            ...     game.step()
+            >>> Position.__init__ = init
+            >>> constructed
+            []
+        """
+        if self._stepper is not None:
+            self._stepper.step(self)
+        else:
+            for position, entity in self._grid.get_actors():
+                entity.step(position, self)
+        self._step_scheduled()
         self._steps += 1
+        if self._time_machine is not None:
+            self._time_machine.record(self)
+
+    def _step_scheduled(self) -> None:
+        """Step the scheduled entities which are due at this _step_ event."""
+        grid = self._grid
+        tick = self._steps
+        for position in grid.get_due(tick):
+            # An entity due earlier in this event may have removed this one
+            # or moved into its place, the timer of either is then not due.
+            timer = grid.get_timer(position)
+            if timer is None or timer > tick:
+                continue
+            entity = grid.get_entity(position)
+            grid.schedule(position, tick + entity.get_period())
+            entity.step(position, self)
+
+    def schedule(self, position: Position, delay: int) -> None:
+        """
+        Make the scheduled entity at a position, see `is_scheduled`, step
+        again a number of _step_ events from now.
+
+        After stepping, an entity is due again `Entity.get_period` _step_
+        events later; calling this from its step method, with its position
+        after the step, reschedules it instead.
+
+        Examples:
+            >>> class SlowZombie(Zombie):
+            ...     def get_period(self):
+            ...         return 3
+            >>> grid = Grid(5)
+            >>> grid.add_entity(Position(0, 0), HoldingPlayer())
+            >>> grid.add_entity(Position(4, 4), SlowZombie())
+            >>> game = AdvancedGame(grid, seed=0)
+            >>> moved = []
+            >>> for _ in range(7):
+            ...     before = grid.serialize()
+            ...     game.step()
+            ...     if grid.serialize() != before:
+            ...         moved.append(game.get_steps())
+            >>> moved
+            [1, 4, 7]
+
+        Parameters:
+            position: The position of the scheduled entity.
+            delay: The number of _step_ events until it steps, at least 1.
+
+        Raises:
+            ValueError: If delay is less than 1 or there is no scheduled
+                        entity at the position.
+        """
+        if delay < 1:
+            raise ValueError(f"Cannot schedule a step {delay} events ahead.")
+        self._grid.schedule(position, self._steps + delay)
+
+    def get_flow_field(self) -> "FlowField":
+        """
+        Return the flow field that guides the tracking zombies of this game,
+        up to date with the current position of the player.
+        """
+        field = self._flow_field
+        if field is None:
+            field = self._flow_field = FlowField(self._grid.get_size())
+        field.update(self._grid, self._steps)
+        return field
+
+    def set_routing(self, routing: bool) -> None:
+        """
+        Choose whether tracking zombies route around the entities in the grid
+        instead of heading straight for the player, see FlowField.
+
+        Parameters:
+            routing: Whether tracking zombies should route around entities.
+        """
+        self._flow_field = FlowField(self._grid.get_size(), routing)
+
+    def get_step_mode(self) -> str:
+        """Return how the _step_ event is performed, see `set_step_mode`."""
+        if self._stepper is None:
+            return REFERENCE_STEP
+        if isinstance(self._stepper, LodStepper):
+            return LOD_STEP
+        if isinstance(self._stepper, BatchStepper):
+            return BATCH_STEP
+        return CUSTOM_STEP
+
+    def set_step_mode(self, mode: str) -> None:
+        """
+        Choose how the _step_ event is performed.
+
+        REFERENCE_STEP calls the step method of every entity in turn.
+        BATCH_STEP moves all of the zombies in one pass over the type codes
+        of an ArrayGrid, see the BatchStepper class. Both modes produce the
+        same game. LOD_STEP lets the zombies far from the player go dormant,
+        see `set_level_of_detail`, which changes the game.
+
+        Parameters:
+            mode: One of REFERENCE_STEP, BATCH_STEP or LOD_STEP.
+        """
+        if mode == REFERENCE_STEP:
+            self._stepper = None
+        elif mode == BATCH_STEP:
+            self._stepper = BatchStepper.for_size(self._grid.get_size())
+        elif mode == LOD_STEP:
+            self._stepper = LodStepper()
+        else:
+            raise ValueError(f"Unknown step mode '{mode}'.")
+
+    def set_level_of_detail(self, radius: int,
+                            period: Optional[int] = None) -> None:
+        """
+        Step the game in LOD_STEP mode: zombies further than radius from the
+        player are dormant and take turns to make up period moves at once,
+        about once every period _step_ events, see the LodStepper class.
+
+        Dormant zombies move as fast as in REFERENCE_STEP mode but may be a
+        few moves ahead or behind, so the time until the player is infected
+        drifts by less than period events on average.
+
+        Parameters:
+            radius: The activity radius around the player, at least 1.
+            period: The number of _step_ events between two steps of a
+                    dormant zombie, None for LodStepper.DEFAULT_PERIOD.
+        """
+        if period is None:
+            period = LodStepper.DEFAULT_PERIOD
+        self._stepper = LodStepper(radius, period)
+
+    def set_stepper(self, stepper: object) -> None:
+        """
+        Perform the _step_ event with a stepper of another module, i.e. an
+        object whose `step` method takes the game, in CUSTOM_STEP mode.
+
+        Parameters:
+            stepper: The object performing the _step_ event.
+        """
+        self._stepper = stepper
 
     def get_steps(self) -> int:
         """
@@ -797,6 +2051,192 @@ class Game:
         """
         return self._steps
 
+    def state_hash(self) -> int:
+        """
+        Return a 64 bit fingerprint of the state of the game, i.e. the types
+        and positions of the entities in the grid, the state of the player
+        (such as its inventory) and the number of steps.
+
+        Games in the same state have the same fingerprint and games in
+        different states have different fingerprints with a high probability.
+        The grid keeps its part up to date, see `Grid.get_hash`, so this takes
+        constant time for a player holding a bounded number of items.
+
+        Examples:
+            >>> grid = Grid(4)
+            >>> grid.add_entity(Position(0, 0), HoldingPlayer())
+            >>> grid.add_entity(Position(1, 0), Garlic())
+            >>> game = AdvancedGame(grid)
+            >>> start = game.state_hash()
+            >>> game.move_player(game.direction_to_offset(RIGHT))
+            >>> game.state_hash() == game.compute_state_hash() != start
+            True
+            >>> game.get_player().get_inventory().get_items()[0].toggle_active()
+            >>> game.state_hash() == game.compute_state_hash()
+            True
+        """
+        return self._grid.get_hash() ^ self._extra_hash()
+
+    def compute_state_hash(self) -> int:
+        """
+        Return the fingerprint of the state of the game computed from every
+        entity in the grid, a slow reference for `state_hash`.
+        """
+        return self._grid.compute_hash() ^ self._extra_hash()
+
+    def _extra_hash(self) -> int:
+        """Return the hash of the parts of the state outside the grid."""
+        result = splitmix64(_STEPS_TAG | self._steps)
+        player = self.get_player()
+        if player is not None:
+            result ^= player.state_hash()
+        return result
+
+    def fork(self) -> "Game":
+        """
+        Return a copy of this game which can be played without changing this
+        game, e.g. to look ahead at the outcome of some moves.
+
+        The grids of the two games share their storage until either of them
+        is changed, see `Grid.fork`, and the fork continues with the same
+        random numbers. The fork gets its own copy of the player, which is
+        the only entity changed in place while a game is played.
+
+        Examples:
+            >>> grid = Grid(4)
+            >>> grid.add_entity(Position(0, 0), HoldingPlayer())
+            >>> grid.add_entity(Position(3, 3), Hospital())
+            >>> game = AdvancedGame(grid)
+            >>> fork = game.fork()
+            >>> fork.move_player(fork.direction_to_offset(RIGHT))
+            >>> fork.get_player().infect()
+            >>> fork.get_grid().serialize()
+            {(3, 3): 'H', (1, 0): 'P'}
+            >>> game.get_grid().serialize(), game.has_lost(), fork.has_lost()
+            ({(0, 0): 'P', (3, 3): 'H'}, False, True)
+        """
+        fork = copy.copy(self)
+        fork._time_machine = None
+        fork._take_state(self)
+        return fork
+
+    def snapshot(self) -> "Game":
+        """
+        Return a snapshot of the current state of this game to be restored
+        later with `restore`.
+
+        A snapshot is a fork of the game which should not be played.
+        """
+        return self.fork()
+
+    def restore(self, snapshot: "Game") -> None:
+        """
+        Return this game to the state recorded by a snapshot. The snapshot is
+        not changed so it can be restored again. The history of the time
+        machine, if enabled, is forgotten.
+
+        Parameters:
+            snapshot: A snapshot returned by `snapshot`.
+
+        Examples:
+            >>> grid = Grid(4)
+            >>> grid.add_entity(Position(0, 0), Player())
+            >>> game = Game(grid)
+            >>> snapshot = game.snapshot()
+            >>> game.move_player(game.direction_to_offset(DOWN))
+            >>> game.step()
+            >>> game.restore(snapshot)
+            >>> game.get_grid().serialize(), game.get_steps()
+            ({(0, 0): 'P'}, 0)
+        """
+        self._take_state(snapshot)
+
+    def _take_state(self, game: "Game") -> None:
+        """Replace the state of this game with a copy of the state of a game."""
+        self._grid = game._grid.fork()
+        self._player_position = game._player_position
+        self._steps = game._steps
+        self._rng = copy.copy(game._rng)
+        self._stepper = game._stepper
+        self._reset_flow_field()
+
+        player = self.get_player()
+        if player is not None:
+            self._grid._replace(self._player_position, player.copy())
+            self._player_replaced()
+        if self._time_machine is not None:
+            self.enable_time_machine(self._time_machine.get_capacity())
+
+    def _reset_flow_field(self) -> None:
+        """Replace the flow field, if any, after the game state was replaced."""
+        field = self._flow_field
+        if field is not None:
+            self._flow_field = FlowField(self._grid.get_size(),
+                                         field.is_routing())
+
+    def _player_replaced(self) -> None:
+        """Called after the player entity is replaced with a copy of itself."""
+        pass
+
+    def enable_time_machine(self, capacity: Optional[int] = None) -> None:
+        """
+        Start recording the history of this game so that it can be rewound,
+        see TimeMachine. Any previously recorded history is forgotten.
+
+        Parameters:
+            capacity: The greatest number of changes to remember, None for
+                      TimeMachine.DEFAULT_CAPACITY.
+        """
+        if capacity is None:
+            capacity = TimeMachine.DEFAULT_CAPACITY
+        self._time_machine = TimeMachine(self, capacity)
+
+    def get_time_machine(self) -> Optional["TimeMachine"]:
+        """Return the time machine of this game, None if it is not enabled."""
+        return self._time_machine
+
+    def rewind(self, steps: int) -> int:
+        """
+        Return the game to its state a number of _step_ events ago, or to the
+        oldest state remembered by the time machine if that is more recent.
+
+        Changes made since the last _step_ event are undone as well.
+
+        Parameters:
+            steps: The number of _step_ events to go back.
+
+        Returns:
+            The number of _step_ events gone back, 0 if the time machine is
+            not enabled.
+
+        Examples:
+            >>> grid = Grid(4)
+            >>> grid.add_entity(Position(0, 0), HoldingPlayer())
+            >>> grid.add_entity(Position(2, 0), Crossbow())
+            >>> game = AdvancedGame(grid)
+            >>> game.enable_time_machine()
+            >>> for _ in range(3):
+            ...     game.move_player(game.direction_to_offset(RIGHT))
+            ...     game.step()
+            >>> game.get_grid().serialize(), game.get_steps()
+            ({(3, 0): 'P'}, 3)
+            >>> game.get_player().get_inventory().get_items()
+            [Crossbow(5)]
+            >>> game.rewind(2)
+            2
+            >>> game.get_grid().serialize(), game.get_steps()
+            ({(1, 0): 'P', (2, 0): 'C'}, 1)
+            >>> game.get_player().get_inventory().get_items()
+            []
+            >>> game.rewind(5)
+            1
+            >>> game.get_grid().serialize()
+            {(2, 0): 'C', (0, 0): 'P'}
+        """
+        if self._time_machine is None:
+            return 0
+        return self._time_machine.rewind(self, steps)
+
     def move_player(self, offset: Position) -> None:
         """
         Move the player entity in the grid by a given offset.
@@ -843,16 +2283,7 @@ class Game:
             >>> game.direction_to_offset("N")
             >>> game.direction_to_offset("that way!")
         """
-        if direction == UP:
-            return Position(0, -1)
-        elif direction == DOWN:
-            return Position(0, 1)
-        elif direction == LEFT:
-            return Position(-1, 0)
-        elif direction == RIGHT:
-            return Position(1, 0)
-        else:
-            return None
+        return DIRECTION_OFFSETS.get(direction)
 
     def has_won(self) -> bool:
         """
@@ -861,7 +2292,7 @@ class Game:
         The player wins the game by stepping onto the hospital. When the player
         steps on the hospital, there will be no hospital entity in the grid.
         """
-        return HOSPITAL not in self._grid.serialize().values()
+        return self._grid.count_of(HOSPITAL) == 0
 
     def has_lost(self) -> bool:
         """
@@ -999,6 +2430,8 @@ class VulnerablePlayer(Player):
         True
     """
 
+    __slots__ = ("_infected", "_infected_by", "_on_infected")
+
     def __init__(self):
         """
         When an object of the VulnerablePlayer class is constructed,
@@ -1006,13 +2439,62 @@ class VulnerablePlayer(Player):
         """
         super().__init__()
         self._infected = False
+        self._infected_by: Optional[Entity] = None
+        self._on_infected: Optional[Callable[[], None]] = None
 
-    def infect(self) -> None:
+    def infect(self, source: Optional[Entity] = None) -> None:
         """
         When the infect method is called, the player becomes infected and
         subsequent calls to `is_infected` return true.
+
+        The first time the player becomes infected, the function registered
+        with `watch_infection`, if any, is called.
+
+        Parameters:
+            source: The entity infecting the player, if known.
         """
-        self._infected = True
+        if not self._infected:
+            self._infected = True
+            self._infected_by = source
+            if self._on_infected is not None:
+                self._on_infected()
+
+    def get_infected_by(self) -> Optional[Entity]:
+        """
+        Return the entity which infected the player, None if the player is
+        not infected or the entity is not known.
+
+        Examples:
+            >>> player = VulnerablePlayer()
+            >>> player.infect(TrackingZombie())
+            >>> player.get_infected_by()
+            TrackingZombie()
+        """
+        return self._infected_by
+
+    def copy(self) -> "VulnerablePlayer":
+        """
+        Return a player in the same state as this player. The copy is not
+        watched for infection, see `watch_infection`.
+        """
+        player = super().copy()
+        player._on_infected = None
+        return player
+
+    def state_hash(self) -> int:
+        if self._infected:
+            return splitmix64(_INFECTED_TAG)
+        return 0
+
+    def watch_infection(self, callback: Optional[Callable[[], None]]) -> None:
+        """
+        Register a function to be called when the player becomes infected,
+        replacing any previously registered function.
+
+        Parameters:
+            callback: A function taking no arguments, or None to stop watching.
+        """
+        self._on_infected = callback
 
     def is_infected(self) -> bool:
         """Return the current infected state of the player."""
@@ -1027,6 +2509,8 @@ class Zombie(Entity):
     i.e. the zombie moves during each _step_ event.
     """
 
+    __slots__ = ()
+
     def _directions(
         self, position: Position, game: Game
     ) -> List[Tuple[int, int]]:
@@ -1038,7 +2522,7 @@ class Zombie(Entity):
             position: current position of this zombie
             game: current game being played
         """
-        return random_directions()
+        return game.get_rng().directions()
 
     def step(self, position: Position, game: Game) -> None:
         """
@@ -1077,9 +2561,7 @@ class Zombie(Entity):
             game: The current game being played.
         """
         for direction in self._directions(position, game):
-            destination = position.add(
-                Position(*direction)  # pylint: disable=(not-an-iterable)
-            )
+            destination = position.add(OFFSET_POSITIONS[direction])
 
             destination_entity = game.get_grid().get_entity(destination)
             if destination_entity is not None:
@@ -1087,7 +2569,7 @@ class Zombie(Entity):
                 # implement it, however, we gotta make the type checker happy.
                 # if destination_entity.display() == PLAYER:
                 if isinstance(destination_entity, VulnerablePlayer):
-                    destination_entity.infect()
+                    destination_entity.infect(self)
                     return
 
                 continue
@@ -1114,15 +2596,61 @@ class IntermediateGame(Game):
     to lose the game when they become infected.
     """
 
+    def __init__(self, grid: Grid, seed: Optional[int] = None):
+        """
+        Construct an intermediate game which watches its player for infection
+        so that `has_lost` does not need to inspect the player.
+
+        Parameters:
+            grid (Grid): The game's grid.
+            seed: The seed of the game's random number generator, see GameRNG.
+        """
+        super().__init__(grid, seed)
+        self._watched: Optional[VulnerablePlayer] = None
+        self._infected = False
+        self._watch_player()
+
+    def _watch_player(self) -> None:
+        """Start watching the current player of the game for infection."""
+        player = self.get_player()
+        if isinstance(player, VulnerablePlayer):
+            self._watched = player
+            self._infected = player.is_infected()
+            player.watch_infection(self._player_infected)
+
+    def _player_infected(self) -> None:
+        """Record that the watched player has become infected."""
+        self._infected = True
+
+    def _player_replaced(self) -> None:
+        self._watched = None
+        self._infected = False
+        self._watch_player()
+
     def has_lost(self) -> bool:
         """
         Return true if the player has lost the game.
 
         The player loses the game if they become infected by a zombie.
+
+        Examples:
+            >>> grid = Grid(3)
+            >>> grid.add_entity(Position(0, 0), VulnerablePlayer())
+            >>> game = IntermediateGame(grid)
+            >>> game.has_lost()
+            False
+            >>> game.get_player().infect()
+            >>> game.has_lost()
+            True
+            >>> grid.remove_entity(Position(0, 0))
+            >>> game.has_lost()
+            True
         """
         player = self.get_player()
         if player is None:
             return True
+        if player is self._watched:
+            return self._infected
 
         # This is to ensure that the type checker is happy.
         # Students are not required to implement this.
@@ -1148,7 +2676,7 @@ class IntermediateMapLoader(BasicMapLoader):
 
     def create_entity(self, token: str) -> Entity:
         if token == ZOMBIE:
-            return Zombie()
+            return flyweight(Zombie)
         elif token == PLAYER:
             return VulnerablePlayer()
         return super().create_entity(token)
@@ -1161,19 +2689,12 @@ class TrackingZombie(Zombie):
     to see the player and move towards them.
     """
 
+    __slots__ = ()
+
     def _directions(
         self, position: Position, game: Game
     ) -> List[Tuple[int, int]]:
-        target = game.get_grid().find_player()
-        if target is None:
-            return []  # Should never happen.
-
-        def distance(direction):
-            new_position = position.add(Position(*direction))
-            return new_position.distance(target), direction
-
-        best_directions = sorted(OFFSETS, key=distance)
-        return best_directions
+        return game.get_flow_field().directions(position)
 
     def step(self, position: Position, game: Game) -> None:
         """
@@ -1232,6 +2753,184 @@ class TrackingZombie(Zombie):
         return TRACKING_ZOMBIE
 
 
+def _sign(value: int) -> int:
+    """Return -1, 0 or 1 for a negative, zero or positive value."""
+    return (value > 0) - (value < 0)
+
+
+def _tracking_order(sign_x: int, sign_y: int) -> List[Tuple[int, int]]:
+    """
+    Return the offsets sorted by the distance to a target after moving in
+    each direction, ties broken by comparing the offsets, for a target in
+    the direction (sign_x, sign_y).
+
+    The change in distance from moving along an axis only depends on the
+    sign of the difference between the target and the position along that
+    axis, so this order is the same for every position with those signs.
+    """
+    def change(offset):
+        dx, dy = offset
+        towards = (dx != 0 and dx == sign_x) or (dy != 0 and dy == sign_y)
+        return -1 if towards else 1
+
+    return sorted(OFFSETS, key=lambda offset: (change(offset), offset))
+
+
+_TRACKING_ORDERS = {(sign_x, sign_y): _tracking_order(sign_x, sign_y)
+                    for sign_x in (-1, 0, 1) for sign_y in (-1, 0, 1)}
+
+
+@functools.lru_cache(maxsize=_SIZE_CACHE)
+def neighbour_indices(size: int) -> List[int]:
+    """
+    Return the index of the cell reached from each cell of a grid of the
+    given size in each of the direction offsets, or -1 if the direction
+    leaves the grid.
+
+    Cells are indexed in row major order, i.e. (x, y) has the index
+    y * size + x, and the neighbour of a cell in the direction OFFSETS[n] is
+    at index cell * 4 + n of the returned list. The list is shared between
+    every caller and must not be modified, the lists of the last
+    _SIZE_CACHE sizes are kept.
+
+    Examples:
+        >>> neighbour_indices(2)
+        [-1, 2, -1, 1, 0, 3, -1, -1, -1, -1, 0, 3, 2, -1, 1, -1]
+
+    Parameters:
+        size: The length and width of the grid.
+    """
+    table = []
+    for index in range(size * size):
+        x, y = index % size, index // size
+        for dx, dy in OFFSETS:
+            if 0 <= x + dx < size and 0 <= y + dy < size:
+                table.append(index + dy * size + dx)
+            else:
+                table.append(-1)
+    return table
+
+
+class FlowField:
+    """
+    A FlowField gives every tracking zombie in a game the order in which it
+    should try each direction to move towards the player.
+
+    By default the order minimises the manhattan distance to the player with
+    ties broken in the same order as the TrackingZombie step method. The
+    order only depends on which side of the player the zombie is on, so it
+    is looked up rather than sorted and the field only changes when the
+    player moves.
+
+    With routing enabled the field holds the length of the shortest path to
+    the player through empty cells, rebuilt at most once per _step_ event,
+    and directions are ordered by that distance first. This lets tracking
+    zombies walk around other entities rather than getting stuck behind
+    them. Where no path exists the manhattan order is used.
+
+    Examples:
+        >>> grid = Grid(5)
+        >>> grid.add_entity(Position(2, 4), Player())
+        >>> grid.add_entity(Position(2, 2), Zombie())
+        >>> grid.add_entity(Position(3, 2), Zombie())
+        >>> field = FlowField(5)
+        >>> field.update(grid, 0)
+        >>> field.directions(Position(1, 1))
+        [(0, 1), (1, 0), (-1, 0), (0, -1)]
+        >>> field.directions(Position(2, 1))
+        [(0, 1), (-1, 0), (0, -1), (1, 0)]
+        >>> routed = FlowField(5, routing=True)
+        >>> routed.update(grid, 0)
+        >>> routed.directions(Position(2, 1))
+        [(-1, 0), (0, -1), (1, 0), (0, 1)]
+    """
+
+    def __init__(self, size: int, routing: bool = False):
+        """
+        Construct a flow field for a grid of the given size.
+
+        Parameters:
+            size: The length and width of the grid.
+            routing: Whether to route around the entities in the grid.
+        """
+        self._size = size
+        self._routing = routing
+        self._target: Optional[Position] = None
+        self._built_at: Optional[Tuple[Position, int]] = None
+        self._distances: List[int] = []
+
+    def is_routing(self) -> bool:
+        """Return whether this field routes around entities in the grid."""
+        return self._routing
+
+    def update(self, grid: Grid, steps: int) -> None:
+        """
+        Bring the field up to date with the player's position in a grid.
+
+        Parameters:
+            grid: The grid of the game.
+            steps: The number of _step_ events performed in the game so far.
+        """
+        target = grid.find_player()
+        self._target = target
+        if self._routing and target is not None:
+            if self._built_at != (target, steps):
+                self._build(grid, target)
+                self._built_at = (target, steps)
+
+    def _build(self, grid: Grid, target: Position) -> None:
+        """Compute the path length from the target to every empty cell."""
+        size = self._size
+        neighbours = neighbour_indices(size)
+        codes = grid.get_codes()
+        distances = [-1] * (size * size)
+        start = target._y * size + target._x
+        distances[start] = 0
+        frontier = [start]
+        distance = 0
+        while frontier:
+            distance += 1
+            reached = []
+            for cell in frontier:
+                for neighbour in neighbours[cell * 4:cell * 4 + 4]:
+                    if (neighbour >= 0 and distances[neighbour] < 0
+                            and codes[neighbour] == 0):
+                        distances[neighbour] = distance
+                        reached.append(neighbour)
+            frontier = reached
+        self._distances = distances
+
+    def directions(self, position: Position) -> List[Tuple[int, int]]:
+        """
+        Return the offsets in the order that a tracking zombie at the given
+        position should try them, or an empty list if there is no player.
+
+        Parameters:
+            position: The position of the tracking zombie.
+        """
+        target = self._target
+        if target is None:
+            return []
+        order = _TRACKING_ORDERS[(_sign(target._x - position._x),
+                                  _sign(target._y - position._y))]
+        if not self._routing:
+            return order[:]
+
+        size = self._size
+        distances = self._distances
+        base = (position._y * size + position._x) * 4
+        neighbours = neighbour_indices(size)[base:base + 4]
+        unreachable = size * size
+
+        def distance(offset):
+            cell = neighbours[OFFSETS.index(offset)]
+            if cell < 0 or distances[cell] < 0:
+                return unreachable
+            return distances[cell]
+
+        return sorted(order, key=distance)
+
+
 class Pickup(Entity):
     """
     A Pickup is a special type of entity that the player is able to pickup and
@@ -1240,6 +2939,8 @@ class Pickup(Entity):
     The Pickup class is an abstract class.
     """
 
+    __slots__ = ("_lifetime", "_using", "_holder", "_expires")
+
     def __init__(self):
         """
         When a Pickup entity is created, the lifetime of the entity should
@@ -1248,6 +2949,20 @@ class Pickup(Entity):
         self._lifetime = self.get_durability()
         self._using = False     # Entities are not selected to be actively
                                 # used, when they are first picked up.
+        # The inventory holding this pickup, if any. While the pickup is held
+        # and active its lifetime is kept as the tick of the inventory at
+        # which it expires instead, see Inventory.
+        self._holder: Optional["Inventory"] = None
+        self._expires = 0
+
+    def __copy__(self) -> "Pickup":
+        """Return a pickup in the same state which is not held."""
+        pickup = self.__class__.__new__(self.__class__)
+        pickup._lifetime = self.get_lifetime()
+        pickup._using = self._using
+        pickup._holder = None
+        pickup._expires = 0
+        return pickup
 
     def get_durability(self) -> int:
         """
@@ -1268,13 +2983,20 @@ class Pickup(Entity):
         Return the remaining steps a player can take with this instance
         of the item before the item disappears from the player's inventory.
         """
+        holder = self._holder
+        if holder is not None and self._using:
+            return self._expires - holder._tick
         return self._lifetime
 
     def set_lifetime(self, lifetime: int) -> None:
         """
+        Set the remaining steps a player can take with this instance of the
+        item.
 
+        Parameters:
+            lifetime: The new lifetime of the item.
         """
-        self._lifetime = lifetime
+        self._update(lifetime, self._using)
 
     def hold(self) -> None:
         """
@@ -1283,9 +3005,11 @@ class Pickup(Entity):
 
         This will result in the remaining lifetime of the pickup entity
         decreasing by one, if it is selected as being active.
+
+        An inventory ages the items it holds without calling this method.
         """
         if self._using:
-            self._lifetime -= 1
+            self._update(self.get_lifetime() - 1, True)
 
     def is_active(self) -> bool:
         """
@@ -1297,7 +3021,21 @@ class Pickup(Entity):
         """
         Toggle whether this entity is selected as being active or not.
         """
-        self._using = not self._using
+        self._update(self.get_lifetime(), not self._using)
+
+    def _update(self, lifetime: int, using: bool) -> None:
+        """Change the state of this pickup and tell its holder, if any."""
+        holder = self._holder
+        if holder is not None:
+            holder._unschedule(self)
+        self._lifetime = lifetime
+        self._using = using
+        if holder is not None:
+            holder._schedule(self)
+
+    def state_hash(self) -> int:
+        return splitmix64(_PICKUP_TAG | entity_code(self) << 32
+                          | (self.get_lifetime() & 0xFFFF) << 1 | self._using)
 
     def __repr__(self) -> str:
         """
@@ -1316,6 +3054,8 @@ class Garlic(Pickup):
     be infected by a zombie.
     """
 
+    __slots__ = ()
+
     def get_durability(self) -> int:
         """
         Return the durability of a garlic.
@@ -1343,6 +3083,8 @@ class Crossbow(Pickup):
     given direction, removing the first zombie in that direction.
     """
 
+    __slots__ = ()
+
     def get_durability(self) -> int:
         """
         Return the durability of a crossbow.
@@ -1393,13 +3135,37 @@ class Inventory:
         >>> for _ in range(30): inventory.step()
         >>> inventory.get_items()
         []
+
+    Items are indexed by type and by whether they are active, so every
+    query takes constant time. Rather than aging every active item each
+    step, the inventory counts its steps in ticks and files each active item
+    in a timing wheel under the tick at which its lifetime runs out, the
+    lifetime of the item being the difference. Stepping only visits the
+    items which expire.
+    """
+
+    WHEEL_SIZE = 64
+    """
+    The number of slots of the timing wheel. Items which expire more than
+    this many ticks ahead share a slot with items which expire sooner.
     """
 
     def __init__(self):
         """
         When an inventory is constructed, it should not contain any items.
         """
-        self._items = []
+        self._items: Dict[Pickup, None] = {}
+        # The number of steps of the inventory.
+        self._tick = 0
+        # The active items by the tick at which they expire modulo
+        # WHEEL_SIZE, and the items whose lifetime already ran out, which
+        # are removed by the next step.
+        self._wheel: Dict[int, Dict[Pickup, None]] = {}
+        self._spent: Dict[Pickup, None] = {}
+        # The number of items and of active items by display character.
+        self._counts: Dict[str, int] = {}
+        self._active: Dict[str, int] = {}
+        self._active_total = 0
 
     def step(self) -> None:
         """
@@ -1410,21 +3176,35 @@ class Inventory:
         within the inventory should decrease. Any items in the inventory that
         have exceeded their lifetime should be removed.
         """
-        new_items = []
-        for item in self._items:
-            item.hold()
-            if item.get_lifetime() > 0:
-                new_items.append(item)
-        self._items = new_items
+        self._tick += 1
+        tick = self._tick
+        expired = list(self._spent)
+        index = tick % self.WHEEL_SIZE
+        slot = self._wheel.get(index)
+        if slot is not None:
+            expired += [item for item in slot if item._expires == tick]
+        for item in expired:
+            self._discard(item)
+        if slot is not None and not slot:
+            del self._wheel[index]
 
     def add_item(self, item: Pickup) -> None:
         """
         This method should take a pickup entity and add it to the inventory.
 
+        An item is held by one inventory at a time, adding an item held by
+        another inventory moves it.
+
         Parameters:
             item: The pickup entity to add to the inventory.
         """
-        self._items.append(item)
+        if item._holder is not None:
+            item._holder._discard(item)
+        token = item.display()
+        self._items[item] = None
+        self._counts[token] = self._counts.get(token, 0) + 1
+        item._holder = self
+        self._schedule(item)
 
     def get_items(self) -> List[Pickup]:
         """
@@ -1433,7 +3213,62 @@ class Inventory:
         Updating the returned list should have no side-effects. It is not
         possible to add items to the inventory by adding to the returned list.
         """
-        return self._items[:]
+        return list(self._items)
+
+    def copy(self) -> "Inventory":
+        """
+        Return an inventory holding copies of the items in this inventory.
+        """
+        inventory = Inventory()
+        for item in self._items:
+            inventory.add_item(item.copy())
+        return inventory
+
+    def _schedule(self, item: Pickup) -> None:
+        """Index a held item in its current state."""
+        lifetime = item._lifetime
+        if item._using:
+            token = item.display()
+            self._active[token] = self._active.get(token, 0) + 1
+            self._active_total += 1
+            item._expires = self._tick + lifetime
+            if lifetime > 0:
+                slot = self._wheel.get(item._expires % self.WHEEL_SIZE)
+                if slot is None:
+                    slot = self._wheel[item._expires % self.WHEEL_SIZE] = {}
+                slot[item] = None
+        if lifetime <= 0:
+            self._spent[item] = None
+
+    def _unschedule(self, item: Pickup) -> None:
+        """Remove a held item from the indexes of its state."""
+        if item._using:
+            item._lifetime = item._expires - self._tick
+            token = item.display()
+            self._active[token] -= 1
+            self._active_total -= 1
+            slot = self._wheel.get(item._expires % self.WHEEL_SIZE)
+            if slot is not None:
+                slot.pop(item, None)
+        self._spent.pop(item, None)
+
+    def _discard(self, item: Pickup) -> None:
+        """Remove a held item from the inventory."""
+        self._unschedule(item)
+        item._holder = None
+        del self._items[item]
+        self._counts[item.display()] -= 1
+
+    def state_hash(self) -> int:
+        """
+        Return a 64 bit hash of the items in the inventory, their order and
+        their state, see `Game.state_hash`.
+        """
+        result = 0
+        for slot, item in enumerate(self._items):
+            result ^= splitmix64(item.state_hash() ^ splitmix64(_SLOT_TAG
+                                                                | slot))
+        return result
 
     def contains(self, pickup_id: str) -> bool:
         """
@@ -1448,29 +3283,20 @@ class Inventory:
             >>> inventory.contains("G")
             True
         """
-        for item in self._items:
-            if item.display() == pickup_id:
-                return True
-        return False
+        return self._counts.get(pickup_id, 0) > 0
 
     def has_active(self, pickup_id: str) -> bool:
         """
         Returns whether the inventory contains any active entities of the
         corresponding pickup_id type.
         """
-        for item in self._items:
-            if item.display() == pickup_id and item.is_active():
-                return True
-        return False
+        return self._active.get(pickup_id, 0) > 0
 
     def any_active(self) -> bool:
         """
         Returns whether the inventory contains any active entities.
         """
-        for item in self._items:
-            if item.is_active():
-                return True
-        return False
+        return self._active_total > 0
 
 
 class HoldingPlayer(VulnerablePlayer):
@@ -1481,6 +3307,8 @@ class HoldingPlayer(VulnerablePlayer):
     In particular, a holding player will now keep an inventory.
     """
 
+    __slots__ = ("_inventory",)
+
     def __init__(self):
         super().__init__()
         self._inventory = Inventory()
@@ -1492,13 +3320,28 @@ class HoldingPlayer(VulnerablePlayer):
         """
         return self._inventory
 
-    def infect(self) -> None:
+    def copy(self) -> "HoldingPlayer":
+        """
+        Return a player in the same state as this player with a copy of its
+        inventory.
+        """
+        player = super().copy()
+        player._inventory = self._inventory.copy()
+        return player
+
+    def state_hash(self) -> int:
+        return super().state_hash() ^ self._inventory.state_hash()
+
+    def infect(self, source: Optional[Entity] = None) -> None:
         """
         Extend the existing infect method so that the player is
         immune to becoming infected if they are actively holding garlic.
+
+        Parameters:
+            source: The entity infecting the player, if known.
         """
         if not self.get_inventory().has_active(GARLIC):
-            super().infect()
+            super().infect(source)
 
     def step(self, position: Position, game: Game) -> None:
         """
@@ -1537,12 +3380,54 @@ class AdvancedGame(IntermediateGame):
                 if entity is not None and isinstance(entity, Pickup):
                     player = self.get_player()
                     if isinstance(player, HoldingPlayer):
-                        player.get_inventory().add_item(entity)
+                        # The pickup may be shared with a fork of this game,
+                        # see Game.fork, so the player holds a copy of it.
+                        player.get_inventory().add_item(entity.copy())
                         self.get_grid().remove_entity(destination)
                 elif entity is not None and isinstance(entity, Zombie):
                     return
         super().move_player(offset)
 
+    def fire(self, direction: str) -> bool:
+        """
+        Fire the crossbow held by the player in the given direction, killing
+        the first entity in that direction if it is a zombie.
+
+        This does not trigger the _step_ event.
+
+        Parameters:
+            direction: Character representing the direction in which to fire.
+
+        Returns:
+            True if a zombie was killed, false if the player is not holding a
+            crossbow, the direction is not valid or the first entity in that
+            direction is not a zombie.
+
+        Examples:
+            >>> grid = Grid(5)
+            >>> grid.add_entity(Position(0, 2), HoldingPlayer())
+            >>> grid.add_entity(Position(3, 2), Zombie())
+            >>> game = AdvancedGame(grid)
+            >>> game.fire(RIGHT)
+            False
+            >>> game.get_player().get_inventory().add_item(Crossbow())
+            >>> game.fire(UP), game.fire(RIGHT)
+            (False, True)
+            >>> grid.serialize()
+            {(0, 2): 'P'}
+        """
+        player = self.get_player()
+        offset = self.direction_to_offset(direction)
+        if (not isinstance(player, HoldingPlayer) or offset is None
+                or not player.get_inventory().contains(CROSSBOW)):
+            return False
+
+        first = self._grid.first_in_direction(self._player_position, offset)
+        if first is None or first[1].display() not in ZOMBIES:
+            return False
+        self._grid.remove_entity(first[0])
+        return True
+
 
 class AdvancedMapLoader(IntermediateMapLoader):
     """
@@ -1564,7 +3449,7 @@ class AdvancedMapLoader(IntermediateMapLoader):
         if token == PLAYER:
             return HoldingPlayer()
         elif token == TRACKING_ZOMBIE:
-            return TrackingZombie()
+            return flyweight(TrackingZombie)
         elif token == GARLIC:
             return Garlic()
         elif token == CROSSBOW:
@@ -1572,6 +3457,688 @@ class AdvancedMapLoader(IntermediateMapLoader):
         return super().create_entity(token)
 
 
+## Alternative grid storage
+_OCCUPIED_CELL = re.compile(b"[^\x00]")
+
+_ACTOR_CODES = bytes([ENTITY_CODES[PLAYER], ENTITY_CODES[ZOMBIE],
+                      ENTITY_CODES[TRACKING_ZOMBIE], OTHER_CODE])
+"""The type codes of the entities which step, see `ArrayGrid.get_actors`."""
+
+
+def _marks(codes: bytes) -> bytes:
+    """
+    Return the table translating the given type codes to 1 and every other
+    type code to 0, see `bytes.translate`.
+    """
+    return bytes(1 if code in codes else 0 for code in range(256))
+
+
+class ArrayGrid(Grid):
+    """
+    An ArrayGrid has the same behaviour as a Grid but stores the type code of
+    every cell in a dense array of bytes instead of a dictionary of positions.
+
+    Entities without any state of their own (hospitals, zombies and tracking
+    zombies) are stored only as their type code, all other entities
+    (players and pickups) are kept in a side table indexed by cell.
+
+    Entities are iterated in row major order, i.e. sorted by y then x, and
+    the actors are found by scanning the type codes, so the grid does not
+    keep an index of them. The actors therefore step in row major order
+    too, rather than in the order a Grid keeps them in, i.e. the order they
+    were added or last moved in: the same map and seed play a different
+    game on a Grid and on an ArrayGrid. Every grid which stores type codes
+    (ArrayGrid, vecenv.LayerGrid and ecs.EcsGrid) steps in row major order,
+    so a game plays the same on each of them and on BatchStepper.
+
+    Examples:
+        >>> grid = ArrayGrid(4)
+        >>> grid.add_entity(Position(3, 0), Zombie())
+        >>> grid.add_entity(Position(1, 2), Player())
+        >>> grid.get_entity(Position(1, 2))
+        Player()
+        >>> grid.move_entity(Position(3, 0), Position(0, 3))
+        >>> grid.get_mapping()
+        {Position(1, 2): Player(), Position(0, 3): Zombie()}
+        >>> grid.serialize()
+        {(1, 2): 'P', (0, 3): 'Z'}
+        >>> grid.get_entity(Position(-1, 2))
+
+        The order of the actors differs from the order of a Grid:
+
+        >>> grids = [Grid(4), ArrayGrid(4)]
+        >>> for grid in grids:
+        ...     grid.add_entity(Position(1, 2), Zombie())
+        ...     grid.add_entity(Position(3, 0), TrackingZombie())
+        >>> [[position for position, _ in grid.get_actors()]
+        ...  for grid in grids]
+        [[Position(1, 2), Position(3, 0)], [Position(3, 0), Position(1, 2)]]
+    """
+
+    def __init__(self, size: int):
+        """
+        An array grid is constructed with a size that dictates the length and
+        width of the grid.
+
+        Parameters:
+            size: The length and width of the grid.
+        """
+        super().__init__(size)
+        self._codes = bytearray(size * size)
+        self._stateful: Dict[int, Entity] = {}
+        self._prototypes: Dict[int, Entity] = {}
+        # The type codes which may be the codes of actors and the table
+        # marking them, extended when an actor with another code is added.
+        self._actor_codes = _ACTOR_CODES
+        self._actor_marks = _marks(_ACTOR_CODES)
+
+    _SHARED_FIELDS = Grid._SHARED_FIELDS + ("_codes", "_stateful",
+                                            "_prototypes")
+    _ENTITY_FIELDS = ("_stateful",)
+
+    def get_codes(self) -> bytearray:
+        return self._codes[:]
+
+    def _index(self, position: Position) -> int:
+        """Return the index of an in bounds position in the code array."""
+        return position._y * self._size + position._x
+
+    def _get(self, position: Position) -> Optional[Entity]:
+        size = self._size
+        x = position._x
+        y = position._y
+        if not (0 <= x < size and 0 <= y < size):
+            return None
+        index = y * size + x
+        code = self._codes[index]
+        if code == 0:
+            return None
+        entity = self._stateful.get(index)
+        if entity is None:
+            entity = self._prototypes[code]
+        return entity
+
+    # get_entity only needs the lookup, skip the extra call through Grid.
+    get_entity = _get
+
+    def _set(self, position: Position, entity: Entity) -> None:
+        index = self._index(position)
+        code = entity_code(entity)
+        self._codes[index] = code
+        if type(entity) in (Hospital, Zombie, TrackingZombie):
+            self._prototypes.setdefault(code, entity)
+            self._stateful.pop(index, None)
+        else:
+            self._stateful[index] = entity
+            if code not in self._actor_codes and is_actor(entity):
+                # e.g. a hospital which steps.
+                self._actor_codes += bytes([code])
+                self._actor_marks = _marks(self._actor_codes)
+
+    def _delete(self, position: Position) -> None:
+        index = self._index(position)
+        self._codes[index] = 0
+        self._stateful.pop(index, None)
+
+    def _move(self, start: Position, end: Position, entity: Entity) -> None:
+        codes = self._codes
+        start_index = self._index(start)
+        end_index = self._index(end)
+        codes[end_index] = codes[start_index]
+        codes[start_index] = 0
+        stateful = self._stateful.pop(start_index, None)
+        if stateful is not None:
+            self._stateful[end_index] = stateful
+        else:
+            self._stateful.pop(end_index, None)
+
+    def _actor_cells(self) -> List[int]:
+        """
+        Return the indexes of the cells whose type code may be the code of
+        an actor, in row major order.
+        """
+        # Translating is a copy, finding a mark is a memchr, both much faster
+        # than matching a pattern cell by cell.
+        marks = bytes(self._codes).translate(self._actor_marks)
+        find = marks.find
+        cells = []
+        index = find(1)
+        while index >= 0:
+            cells.append(index)
+            index = find(1, index + 1)
+        return cells
+
+    def get_actors(self) -> List[Tuple[Position, Entity]]:
+        size = self._size
+        position_at = self._positions.get
+        stateful = self._stateful
+        prototypes = self._prototypes
+        codes = self._codes
+        actors = []
+        for index in self._actor_cells():
+            entity = stateful.get(index)
+            if entity is None:
+                entity = prototypes[codes[index]]
+            if is_actor(entity):
+                y, x = divmod(index, size)
+                actors.append((position_at(x, y), entity))
+        return actors
+
+    def _place_actor(self, position: Position, existing: Optional[Entity],
+                     entity: Entity) -> None:
+        pass
+
+    def _record_move(self, start: Position, end: Position,
+                     entity: Entity) -> None:
+        """
+        Bring the indexes, hash, journal and listeners up to date with a
+        move of an entity without state from start to an empty end, made to
+        the type codes directly, see BatchStepper.
+        """
+        if self._journal is not None:
+            self._journal.append((start, entity))
+            self._journal.append((end, None))
+        size = self._size
+        code = entity_code(entity)
+        self._hash ^= (zobrist_key(start._y * size + start._x, code)
+                       ^ zobrist_key(end._y * size + end._x, code))
+        self._untrack(start, entity)
+        self._track(end, entity)
+        for listener in self._listeners:
+            listener(start)
+            listener(end)
+
+    def _items(self) -> Iterator[Tuple[Position, Entity]]:
+        size = self._size
+        positions = self._positions
+        stateful = self._stateful
+        prototypes = self._prototypes
+        codes = self._codes
+        for match in _OCCUPIED_CELL.finditer(codes):
+            index = match.start()
+            entity = stateful.get(index)
+            if entity is None:
+                entity = prototypes[codes[index]]
+            yield positions.get(index % size, index // size), entity
+
+
+## Batched stepping
+REFERENCE_STEP = "reference"
+BATCH_STEP = "batch"
+CUSTOM_STEP = "custom"
+
+
+class BatchStepper:
+    """
+    A BatchStepper performs the _step_ event of a game on an ArrayGrid by
+    moving all of its zombies in a single pass over the type codes of the
+    grid, instead of calling the step method of each zombie.
+
+    The stepping is array backed rather than vectorised. The pass visits
+    the cells of the actors in row major order, as `Game.step` does, and
+    resolves the move of each zombie in turn by reading and writing the
+    type codes of its neighbouring cells, only then bringing the indexes of
+    the grid up to date. Moves are not resolved for all zombies at once
+    because the cells a zombie can move to depend on the zombies which
+    moved before it. Each zombie picks its directions as its step method
+    does, so conflicts between zombies and the infection of the player are
+    resolved exactly as the step methods resolve them, and a game with the
+    same seed is the same in both modes. Other entities with a step
+    behaviour have their step method called in turn. Games on other grids
+    are stepped as in REFERENCE_STEP mode.
+
+    Examples:
+        >>> def make_game():
+        ...     grid = ArrayGrid(6)
+        ...     grid.add_entity(Position(2, 2), HoldingPlayer())
+        ...     for x, y in [(0, 0), (5, 5), (3, 1), (0, 4)]:
+        ...         grid.add_entity(Position(x, y), Zombie())
+        ...     grid.add_entity(Position(5, 0), TrackingZombie())
+        ...     return AdvancedGame(grid, seed=7)
+        >>> reference = make_game()
+        >>> batch = make_game()
+        >>> batch.set_step_mode(BATCH_STEP)
+        >>> reference.get_step_mode(), batch.get_step_mode()
+        ('reference', 'batch')
+        >>> for _ in range(25): reference.step()
+        >>> for _ in range(25): batch.step()
+        >>> batch.get_grid().serialize() == reference.get_grid().serialize()
+        True
+        >>> batch.get_grid().get_hash() == reference.get_grid().get_hash()
+        True
+        >>> batch.has_lost() == reference.has_lost()
+        True
+    """
+
+    def __init__(self, size: int):
+        """
+        Construct a stepper for grids of the given size.
+
+        Use `BatchStepper.for_size` instead so that every game with the same
+        grid size shares one stepper.
+
+        Parameters:
+            size: The length and width of the grid.
+        """
+        self._size = size
+        self._neighbours = neighbour_indices(size)
+        self._direction_numbers = {offset: number
+                                   for number, offset in enumerate(OFFSETS)}
+
+    @classmethod
+    @functools.lru_cache(maxsize=_SIZE_CACHE)
+    def for_size(cls, size: int) -> "BatchStepper":
+        """
+        Return the shared stepper for grids of the given size, only the
+        steppers of the last _SIZE_CACHE sizes are kept.
+
+        Parameters:
+            size: The length and width of the grid.
+        """
+        return cls(size)
+
+    def step(self, game: Game) -> None:
+        """
+        Perform the _step_ event of a game.
+
+        Parameters:
+            game: The game to step, its grid must be the size of this stepper.
+        """
+        grid = game.get_grid()
+        if not isinstance(grid, ArrayGrid):
+            for position, entity in grid.get_actors():
+                entity.step(position, game)
+            return
+
+        if grid._shared:
+            # The type codes are written to directly.
+            grid._unshare(grid._SHARED_FIELDS)
+        size = self._size
+        neighbours = self._neighbours
+        numbers = self._direction_numbers
+        position_at = grid._positions.get
+        stateful = grid._stateful
+        prototypes = grid._prototypes
+        rng = game.get_rng()
+        codes = grid._codes
+        # The cells are found before any zombie moves, so a zombie moving
+        # to a later cell does not step twice.
+        for index in grid._actor_cells():
+            entity = stateful.get(index)
+            if entity is not None:
+                if is_actor(entity):
+                    y, x = divmod(index, size)
+                    entity.step(position_at(x, y), game)
+                continue
+
+            code = codes[index]
+            y, x = divmod(index, size)
+            position = position_at(x, y)
+            if code == _ZOMBIE_CODE:
+                directions = rng.directions()
+            elif code == _TRACKING_ZOMBIE_CODE:
+                directions = prototypes[code]._directions(position, game)
+            else:
+                # A hospital, or a cell emptied by an earlier move.
+                continue
+
+            base = index * 4
+            for direction in directions:
+                destination = neighbours[base + numbers[direction]]
+                if destination < 0:
+                    continue
+
+                target = codes[destination]
+                if target == 0:
+                    codes[destination] = code
+                    codes[index] = 0
+                    y, x = divmod(destination, size)
+                    grid._record_move(position, position_at(x, y),
+                                      prototypes[code])
+                    break
+
+                if target == _PLAYER_CODE or target == OTHER_CODE:
+                    player = stateful.get(destination)
+                    if isinstance(player, VulnerablePlayer):
+                        player.infect(prototypes[code])
+                        break
+
+
+_PLAYER_CODE = ENTITY_CODES[PLAYER]
+_ZOMBIE_CODE = ENTITY_CODES[ZOMBIE]
+_TRACKING_ZOMBIE_CODE = ENTITY_CODES[TRACKING_ZOMBIE]
+
+
+## Level of detail
+LOD_STEP = "lod"
+
+
+class LodStepper:
+    """
+    A LodStepper performs the _step_ event of a game at a lower level of
+    detail far from the player.
+
+    Zombies within the activity radius of the player, by the greatest of
+    their x and y distances, step at every _step_ event. The others are
+    dormant and take turns: the i-th dormant zombie in step order steps
+    when the number of steps of the game plus i is a multiple of the
+    period. On its turn a dormant zombie makes up the moves it skipped: it
+    moves as if it stepped period times in a row, with a single move on the
+    grid. A period-th of the dormant zombies moves at each event, so the
+    ones far from the player cost a fraction of a grid update each and that
+    cost is spread evenly over the events. A zombie wakes as soon as it is
+    within the radius. The turns only depend on the positions of the
+    zombies and the player, so a game is still decided by its seed. Other
+    entities with a step behaviour, and zombies of a subclass with its own
+    `step`, step at every event, or once a turn if they are dormant.
+
+    Dormant zombies wander and track the player as fast as in
+    REFERENCE_STEP mode, but in bursts. The step order changes as the
+    zombies move, so a dormant zombie may take its turn early or late and
+    be a few moves ahead of or behind where it would be otherwise: the
+    first zombie to reach the player may reach it a few events sooner or
+    later.
+    The game is the same as in REFERENCE_STEP mode only while every zombie
+    is within the radius.
+
+    Examples:
+        >>> stepped = []
+        >>> class CountingZombie(Zombie):
+        ...     def step(self, position, game):
+        ...         stepped.append(position.get_y())
+        >>> grid = Grid(20)
+        >>> grid.add_entity(Position(0, 0), HoldingPlayer())
+        >>> grid.add_entity(Position(2, 1), Zombie())
+        >>> for y in range(12, 16):
+        ...     grid.add_entity(Position(15, y), CountingZombie())
+        >>> game = AdvancedGame(grid, seed=3)
+        >>> game.set_level_of_detail(radius=5, period=4)
+        >>> for _ in range(8): game.step()
+        >>> stepped
+        [15, 14, 13, 12, 15, 14, 13, 12]
+        >>> game.get_step_mode()
+        'lod'
+
+        The drift of the time until ten tracking zombies across the map
+        reach a player who stands still, over twenty games:
+
+        >>> def infected_at(seed, radius=None):
+        ...     grid = Grid(30)
+        ...     grid.add_entity(Position(15, 15), HoldingPlayer())
+        ...     for x in range(0, 30, 3):
+        ...         grid.add_entity(Position(x, 0), TrackingZombie())
+        ...     game = AdvancedGame(grid, seed=seed)
+        ...     if radius is not None:
+        ...         game.set_level_of_detail(radius)
+        ...     while not game.has_lost():
+        ...         game.step()
+        ...     return game.get_steps()
+        >>> reference = [infected_at(seed) for seed in range(20)]
+        >>> lod = [infected_at(seed, radius=10) for seed in range(20)]
+        >>> sum(reference) / 20, sum(lod) / 20
+        (15.0, 16.0)
+        >>> abs(sum(lod) - sum(reference)) / 20 < LodStepper.DEFAULT_PERIOD
+        True
+    """
+
+    DEFAULT_RADIUS = 10
+    """The default activity radius around the player."""
+
+    DEFAULT_PERIOD = 4
+    """The default number of _step_ events between two dormant steps."""
+
+    _CATCH_UP_STEPS = (Zombie.step, TrackingZombie.step)
+    """The step behaviours a dormant zombie can make up in a single move."""
+
+    def __init__(self, radius: int = DEFAULT_RADIUS,
+                 period: int = DEFAULT_PERIOD):
+        """
+        Parameters:
+            radius: The activity radius around the player, at least 1 so that
+                    a zombie next to the player is never dormant.
+            period: The number of _step_ events between two steps of a
+                    dormant zombie, at least 1.
+        """
+        if radius < 1 or period < 1:
+            raise ValueError(f"Invalid level of detail: radius {radius}, "
+                             f"period {period}.")
+        self._radius = radius
+        self._period = period
+
+    def get_radius(self) -> int:
+        """Return the activity radius around the player."""
+        return self._radius
+
+    def get_period(self) -> int:
+        """Return the number of _step_ events between dormant steps."""
+        return self._period
+
+    def step(self, game: Game) -> None:
+        """
+        Perform the _step_ event of a game.
+
+        Parameters:
+            game: The game to step.
+        """
+        grid = game.get_grid()
+        player = grid.find_player()
+        if player is None:
+            for position, entity in grid.get_actors():
+                entity.step(position, game)
+            return
+
+        radius = self._radius
+        period = self._period
+        player_x = player._x
+        player_y = player._y
+        turn = game.get_steps()
+        for position, entity in grid.get_actors():
+            if (isinstance(entity, Zombie)
+                    and (abs(position._x - player_x) > radius
+                         or abs(position._y - player_y) > radius)):
+                turn += 1
+                if turn % period:
+                    continue
+                if type(entity).step in self._CATCH_UP_STEPS:
+                    self._catch_up(position, entity, game)
+                    continue
+            entity.step(position, game)
+
+    def _catch_up(self, position: Position, zombie: Zombie,
+                  game: Game) -> None:
+        """
+        Make the moves of a dormant zombie over a period of _step_ events at
+        once, as if it stepped period times in a row, with a single move on
+        the grid.
+
+        Parameters:
+            position: The position of the zombie.
+            zombie: The dormant zombie.
+            game: The game being stepped.
+        """
+        grid = game.get_grid()
+        current = position
+        for _ in range(self._period):
+            for direction in zombie._directions(current, game):
+                destination = current.add(OFFSET_POSITIONS[direction])
+                # The zombie has left its cell along the way.
+                if destination == position:
+                    current = destination
+                    break
+
+                destination_entity = grid.get_entity(destination)
+                if destination_entity is not None:
+                    if isinstance(destination_entity, VulnerablePlayer):
+                        destination_entity.infect(zombie)
+                        if current != position:
+                            grid.move_entity(position, current)
+                        return
+
+                    continue
+
+                if grid.in_bounds(destination):
+                    current = destination
+                    break
+
+        if current != position:
+            grid.move_entity(position, current)
+
+
+## Time machine
+Change = Tuple[Position, Optional[Entity]]
+"""
+A Change is a (position, entity) pair recording that the grid was changed at
+the position and holding the entity at the position before the change, None
+if the position was empty.
+"""
+
+Checkpoint = Tuple[Optional[Player], Optional[Position], int, RNGState]
+"""
+A Checkpoint is the state of a game apart from its grid as a (player, player
+position, steps, random number generator state) tuple, the player being a
+copy which is not changed by playing the game.
+"""
+
+
+class TimeMachine:
+    """
+    A TimeMachine records the history of a game so that it can be rewound.
+
+    Instead of copying the game after every _step_ event, the history of a
+    step is the list of changes made to the grid during the step, see Change,
+    and a checkpoint of the rest of the game, see Checkpoint. The memory used
+    by a step therefore depends on how much changed rather than on the size
+    of the grid, and everything which did not change is shared with the
+    current game. Rewinding undoes the changes of each step in reverse, the
+    entities end up where they were but may step in a different order, and
+    scheduled entities are due at the next _step_ event, see `Grid.schedule`.
+
+    Once more changes are recorded than the capacity of the time machine,
+    the oldest steps are forgotten.
+
+    Examples:
+        >>> grid = Grid(3)
+        >>> grid.add_entity(Position(0, 0), Player())
+        >>> game = Game(grid)
+        >>> machine = TimeMachine(game, capacity=6)
+        >>> for direction in (RIGHT, DOWN, RIGHT, DOWN):
+        ...     game.move_player(game.direction_to_offset(direction))
+        ...     game.step()
+        ...     machine.record(game)
+        >>> machine.get_length()
+        2
+        >>> machine.rewind(game, 3)
+        2
+        >>> game.get_grid().serialize(), game.get_steps()
+        ({(1, 1): 'P'}, 2)
+    """
+
+    DEFAULT_CAPACITY = 100000
+    """The default greatest number of changes remembered."""
+
+    def __init__(self, game: Game, capacity: int):
+        """
+        Start recording the history of a game, from its current state.
+
+        Game.step calls `record` when the time machine is enabled with
+        `Game.enable_time_machine`, a time machine constructed directly must
+        be told about every _step_ event.
+
+        Parameters:
+            game: The game to record.
+            capacity: The greatest number of changes to remember, every step
+                      also counts as one change.
+        """
+        self._capacity = capacity
+        self._history: deque = deque()
+        self._recorded = 0
+        self._changes: List[Change] = []
+        game.get_grid()._journal = self._changes
+        self._checkpoint = self._take_checkpoint(game)
+
+    def get_capacity(self) -> int:
+        """Return the greatest number of changes remembered."""
+        return self._capacity
+
+    def get_length(self) -> int:
+        """Return the number of _step_ events which can be rewound."""
+        return len(self._history)
+
+    def record(self, game: Game) -> None:
+        """
+        Record that a _step_ event of a game has finished.
+
+        Parameters:
+            game: The recorded game.
+        """
+        changes = self._changes
+        self._history.append((changes, self._checkpoint))
+        self._recorded += len(changes) + 1
+        while self._recorded > self._capacity and self._history:
+            forgotten, _ = self._history.popleft()
+            self._recorded -= len(forgotten) + 1
+
+        self._changes = []
+        game.get_grid()._journal = self._changes
+        self._checkpoint = self._take_checkpoint(game)
+
+    def rewind(self, game: Game, steps: int) -> int:
+        """
+        Return a game to its state a number of _step_ events ago, or to the
+        oldest state remembered if that is more recent.
+
+        Parameters:
+            game: The recorded game.
+            steps: The number of _step_ events to go back.
+
+        Returns:
+            The number of _step_ events gone back.
+        """
+        grid = game.get_grid()
+        grid._journal = None
+        self._undo(grid, self._changes)
+        checkpoint = self._checkpoint
+        rewound = 0
+        while rewound < steps and self._history:
+            changes, checkpoint = self._history.pop()
+            self._recorded -= len(changes) + 1
+            self._undo(grid, changes)
+            rewound += 1
+
+        player, position, game._steps, state = checkpoint
+        game._player_position = position
+        game._rng.set_state(state)
+        # Timers are not recorded, the scheduled entities step straight away.
+        grid.reset_timers()
+        if player is not None and position is not None:
+            grid._replace(position, player)
+            game._player_replaced()
+        game._reset_flow_field()
+
+        self._changes = []
+        grid._journal = self._changes
+        self._checkpoint = self._take_checkpoint(game)
+        return rewound
+
+    @staticmethod
+    def _undo(grid: Grid, changes: List[Change]) -> None:
+        """Undo the given changes to a grid, which must not be recorded."""
+        for position, entity in reversed(changes):
+            if entity is None:
+                grid.remove_entity(position)
+            else:
+                grid.add_entity(position, entity)
+
+    @staticmethod
+    def _take_checkpoint(game: Game) -> Checkpoint:
+        """Return a checkpoint of the current state of a game."""
+        player = game.get_player()
+        if player is not None:
+            player = player.copy()
+        return (player, game._player_position, game.get_steps(),
+                game.get_rng().get_state())
+
+
 class AdvancedTextInterface(TextInterface):
     """
     A text-based interface between the user and the game instance.
@@ -1666,7 +4233,8 @@ class AdvancedTextInterface(TextInterface):
         """
         if action == FIRE:
             player = game.get_player()
-            if player is None or not isinstance(player, HoldingPlayer):
+            if (player is None or not isinstance(player, HoldingPlayer)
+                    or not isinstance(game, AdvancedGame)):
                 return  # Should never happen.
 
             # Ensure player has a weapon that they can fire.
@@ -1674,26 +4242,10 @@ class AdvancedTextInterface(TextInterface):
                 direction = input(FIRE_PROMPT)
 
                 # Fire the weapon in the indicated direction, if possible.
-                if direction in DIRECTIONS:
-                    start = game.get_grid().find_player()
-                    offset = game.direction_to_offset(direction)
-                    if start is None or offset is None:
-                        return  # Should never happen.
-
-                    # Find the first entity in the direction player fired.
-                    first = first_in_direction(
-                        game.get_grid(), start, offset
-                    )
-
-                    # If the entity is a zombie, kill it.
-                    if first is not None and first[1].display() in ZOMBIES:
-                        position, entity = first
-                        game.get_grid().remove_entity(position)
-                    else:
-                        print(NO_ZOMBIE_MESSAGE)
-
-                else:
+                if direction not in DIRECTIONS:
                     print(INVALID_FIRING_MESSAGE)
+                elif not game.fire(direction):
+                    print(NO_ZOMBIE_MESSAGE)
             else:
                 print(NO_WEAPON_MESSAGE)
             game.step()
@@ -1701,14 +4253,22 @@ class AdvancedTextInterface(TextInterface):
             super().handle_action(game, action)
 
 
-def advanced_game(filename: str) -> AdvancedGame:
+def advanced_game(filename: str, grid_type: type = Grid,
+                  seed: Optional[int] = None) -> AdvancedGame:
     """
     Return an initialised advanced game corresponding to task 3
     in assignment two.
+
+    Parameters:
+        filename: Path where the map file should be found.
+        grid_type: The Grid subclass used to store the entities, which
+                   also decides the order the actors step in, see
+                   ArrayGrid.
+        seed: The seed of the game's random number generator.
     """
     loader = AdvancedMapLoader()
-    grid = loader.load(filename)
-    return AdvancedGame(grid)
+    grid = loader.load(filename, grid_type)
+    return AdvancedGame(grid, seed)
 
 
 def main() -> None:
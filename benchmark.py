@@ -0,0 +1,743 @@
+"""
+Benchmarks for the game model.
+
+Run this module directly to print the results of every benchmark.
+"""
+import copy
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import a2_solution as a2
+from constants import *
+import ecs
+import encoder
+import headless
+import vecenv
+
+SIZES = (10, 100, 1000)
+DENSITY = 0.05
+OPERATIONS = 100000
+
+
+def time_call(function: Callable[[], None], repeat: int = 3) -> float:
+    """
+    Return the best wall clock time, in seconds, of calling a function.
+
+    Parameters:
+        function: The function to time, called without arguments.
+        repeat: How many times the function is timed.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def populate(grid: a2.Grid, density: float,
+             seed: int = 0) -> List[a2.Position]:
+    """
+    Fill a grid with a player, a hospital and randomly placed zombies.
+
+    Parameters:
+        grid: The empty grid to fill.
+        density: The fraction of cells which should contain a zombie.
+        seed: Seed of the random placement.
+
+    Returns:
+        The positions of the zombies placed in the grid.
+    """
+    size = grid.get_size()
+    rng = random.Random(seed)
+    grid.add_entity(a2.Position(0, 0), a2.HoldingPlayer())
+    grid.add_entity(a2.Position(size - 1, size - 1), a2.Hospital())
+
+    zombies = []
+    cells = rng.sample(range(1, size * size - 1), int(size * size * density))
+    for cell in cells:
+        position = a2.Position(cell % size, cell // size)
+        grid.add_entity(position, a2.Zombie())
+        zombies.append(position)
+    return zombies
+
+
+def bench_grid_storage() -> List[Tuple[str, int, float, float]]:
+    """
+    Compare the dictionary backed Grid against the ArrayGrid.
+
+    For each grid size, times random get_entity probes, in_bounds and
+    move_entity pairs as performed by a zombie step, and get_mapping.
+
+    Returns:
+        Rows of (operation, size, grid seconds, array grid seconds).
+    """
+    results = []
+    for size in SIZES:
+        timings = {}
+        for grid_type in (a2.Grid, a2.ArrayGrid):
+            grid = grid_type(size)
+            zombies = populate(grid, DENSITY)
+            rng = random.Random(1)
+            probes = [a2.Position(rng.randrange(size), rng.randrange(size))
+                      for _ in range(OPERATIONS)]
+            moves = [(rng.choice(zombies), rng.choice(a2.OFFSETS))
+                     for _ in range(OPERATIONS)]
+
+            def probe():
+                for position in probes:
+                    grid.get_entity(position)
+
+            def move():
+                for position, (dx, dy) in moves:
+                    end = position.add(a2.Position(dx, dy))
+                    if grid.in_bounds(end) and grid.get_entity(end) is None:
+                        grid.move_entity(position, end)
+                        grid.move_entity(end, position)
+
+            def mapping():
+                grid.get_mapping()
+
+            timings[grid_type] = (time_call(probe), time_call(move),
+                                  time_call(mapping))
+
+        for index, operation in enumerate(("get_entity", "move_entity",
+                                           "get_mapping")):
+            results.append((operation, size, timings[a2.Grid][index],
+                            timings[a2.ArrayGrid][index]))
+    return results
+
+
+def bench_sparse_step(size: int = 200, zombies: int = 10,
+                      ticks: int = 200) -> List[Tuple[str, int, float]]:
+    """
+    Time Game.step on maps with a fixed number of zombies and an increasing
+    number of entities without a step behaviour (garlic on the ground).
+
+    Returns:
+        Rows of (grid type, number of static entities, seconds per tick).
+    """
+    results = []
+    for grid_type in (a2.Grid, a2.ArrayGrid):
+        for statics in (0, 1000, 10000):
+            grid = grid_type(size)
+            rng = random.Random(2)
+            cells = rng.sample(range(1, size * size - 1), zombies + statics)
+            grid.add_entity(a2.Position(0, 0), a2.HoldingPlayer())
+            grid.add_entity(a2.Position(size - 1, size - 1), a2.Hospital())
+            for index, cell in enumerate(cells):
+                entity = a2.Zombie() if index < zombies else a2.Garlic()
+                grid.add_entity(a2.Position(cell % size, cell // size),
+                                entity)
+            game = a2.AdvancedGame(grid)
+
+            def step():
+                for _ in range(ticks):
+                    game.step()
+
+            results.append((grid_type.__name__, statics,
+                            time_call(step) / ticks))
+    return results
+
+
+def zombie_game(size: int, zombies: int, seed: int = 0,
+                grid_type: type = a2.Grid) -> a2.AdvancedGame:
+    """
+    Return a game with a player, a hospital and randomly placed zombies,
+    one in every three of which is a tracking zombie.
+
+    Parameters:
+        size: The length and width of the grid.
+        zombies: The number of zombies to place.
+        seed: Seed of the random placement and of the game.
+        grid_type: The Grid subclass used to store the entities.
+    """
+    rng = random.Random(seed)
+    grid = grid_type(size)
+    cells = rng.sample(range(size * size), zombies + 2)
+    entities = [a2.HoldingPlayer(), a2.Hospital()]
+    entities += [a2.TrackingZombie() if index % 3 == 0 else a2.Zombie()
+                 for index in range(zombies)]
+    for cell, entity in zip(cells, entities):
+        grid.add_entity(a2.Position(cell % size, cell // size), entity)
+    return a2.AdvancedGame(grid, seed=seed)
+
+
+def bench_step_modes(ticks: int = 20) -> List[Tuple[str, str, float]]:
+    """
+    Compare the reference and batch step modes on a 200x200 map with 4000
+    zombies. Only ArrayGrid games are batched, games on other grids step
+    as in the reference mode.
+
+    Returns:
+        Rows of (grid type, step mode, seconds per tick).
+    """
+    results = []
+    for grid_type, mode in ((a2.Grid, a2.REFERENCE_STEP),
+                            (a2.ArrayGrid, a2.REFERENCE_STEP),
+                            (a2.ArrayGrid, a2.BATCH_STEP)):
+        game = zombie_game(200, 4000, grid_type=grid_type)
+        game.set_step_mode(mode)
+
+        def step():
+            for _ in range(ticks):
+                game.step()
+
+        results.append((grid_type.__name__, mode,
+                        time_call(step, repeat=1) / ticks))
+    return results
+
+
+def bench_fork(zombies: int = 50, forks: int = 1000
+               ) -> List[Tuple[str, int, float, float, float]]:
+    """
+    Compare Game.fork against copy.deepcopy on maps of increasing size with
+    the same number of zombies.
+
+    A fork which makes a few changes is timed as a fork followed by one move
+    of the player.
+
+    Returns:
+        Rows of (grid type, size, seconds per fork, seconds per fork and
+        move, seconds per deep copy).
+    """
+    results = []
+    for grid_type in (a2.Grid, a2.ArrayGrid):
+        for size in SIZES:
+            game = zombie_game(size, zombies, grid_type=grid_type)
+            offset = game.direction_to_offset(RIGHT)
+
+            def fork():
+                for _ in range(forks):
+                    game.fork()
+
+            def fork_and_move():
+                for _ in range(forks):
+                    game.fork().move_player(offset)
+
+            def deep_copy():
+                for _ in range(10):
+                    copy.deepcopy(game)
+
+            results.append((grid_type.__name__, size,
+                            time_call(fork) / forks,
+                            time_call(fork_and_move) / forks,
+                            time_call(deep_copy, repeat=1) / 10))
+    return results
+
+
+def bench_time_machine(zombies: int = 50,
+                       ticks: int = 200) -> List[Tuple[int, float]]:
+    """
+    Measure the memory used by the time machine per recorded tick on maps of
+    increasing size with the same number of zombies.
+
+    The memory used by the same game without a time machine is subtracted.
+    Positions of large grids are created as zombies first reach them, so the
+    game is played once beforehand.
+
+    Returns:
+        Rows of (size, bytes per tick).
+    """
+    results = []
+    for size in SIZES:
+        used = []
+        for recorded in (None, False, True):
+            game = zombie_game(size, zombies)
+            if recorded:
+                game.enable_time_machine(capacity=ticks * (2 * zombies + 3))
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            for _ in range(ticks):
+                game.step()
+            used.append(tracemalloc.get_traced_memory()[0] - before)
+            tracemalloc.stop()
+        results.append((size, (used[2] - used[1]) / ticks))
+    return results
+
+
+def bench_vector_env(filename: str = "maps/basic4.txt", count: int = 64,
+                     ticks: int = 100) -> List[Tuple[str, float]]:
+    """
+    Compare stepping a VectorEnv against plain loops over as many games,
+    all with the same random moves.
+
+    The plain loops fork new games from a map loaded once, see
+    `headless.MapTemplate`, step each game on its own and read the type
+    codes of every grid after each step, as a consumer of separate
+    AdvancedGame instances would. One loop plays ArrayGrid games in
+    BATCH_STEP mode, the other LayerGrid games, which separates the cost of
+    the grid from the gain of stepping every game in one pass.
+
+    Returns:
+        Rows of (method, ticks per second).
+    """
+    moves = list(range(len(headless.MOVES)))
+    rng = random.Random(0)
+    actions = [[rng.choice(moves) for _ in range(count)]
+               for _ in range(ticks)]
+
+    def plain_loop(grid_type):
+        template = headless.MapTemplate(filename, grid_type)
+        if grid_type is vecenv.LayerGrid:
+            size = template.get_game().get_grid().get_size()
+            template.get_game().set_stepper(
+                vecenv.LayerStepper(bytearray(size * size), size))
+        else:
+            template.get_game().set_step_mode(a2.BATCH_STEP)
+        seeds = iter(range(count, count + count * ticks))
+        games = [template.new_game(seed) for seed in range(count)]
+        for tick_actions in actions:
+            observations = []
+            for index, game in enumerate(games):
+                headless.apply_action(game,
+                                      headless.MOVES[tick_actions[index]])
+                if headless.finished(game) is not None:
+                    game = games[index] = template.new_game(next(seeds))
+                observations.append(game.get_grid().get_codes())
+
+    def vector_env():
+        env = vecenv.VectorEnv(filename, count)
+        env.reset()
+        for tick_actions in actions:
+            env.step(tick_actions)
+
+    return [("ArrayGrid loop", count * ticks / time_call(
+                lambda: plain_loop(a2.ArrayGrid), repeat=5)),
+            ("LayerGrid loop", count * ticks / time_call(
+                lambda: plain_loop(vecenv.LayerGrid), repeat=5)),
+            ("VectorEnv", count * ticks / time_call(vector_env, repeat=5))]
+
+
+def bench_encoder(size: int = 100, zombies: int = 500,
+                  ticks: int = 50) -> List[Tuple[int, str, float]]:
+    """
+    Compare keeping one-hot planes of a game up to date with an
+    ObservationEncoder against rebuilding them from Grid.serialize after
+    every step, with an increasing number of hospitals which never move.
+    Both are timed on the same game after each step.
+
+    Returns:
+        Rows of (hospitals, method, seconds spent encoding per tick).
+    """
+    cells = size * size
+    channels = {token: channel
+                for channel, token in enumerate(encoder.CHANNELS)}
+    results = []
+    for statics in (0, 2000, 8000):
+        game = zombie_game(size, zombies)
+        grid = game.get_grid()
+        rng = random.Random(1)
+        for cell in rng.sample(range(cells), statics):
+            position = grid.get_position(cell % size, cell // size)
+            if grid.get_entity(position) is None:
+                grid.add_entity(position, a2.Hospital())
+
+        def rebuild() -> None:
+            planes = bytearray(len(encoder.CHANNELS) * cells)
+            for (x, y), token in grid.serialize().items():
+                channel = channels.get(token)
+                if channel is not None:
+                    planes[channel * cells + y * size + x] = 1
+
+        observer = encoder.ObservationEncoder(game)
+        rebuilding = updating = 0.0
+        for _ in range(ticks):
+            game.step()
+            start = time.perf_counter()
+            rebuild()
+            rebuilding += time.perf_counter() - start
+            start = time.perf_counter()
+            observer.update()
+            updating += time.perf_counter() - start
+        results.append((statics, "serialize", rebuilding / ticks))
+        results.append((statics, "encoder", updating / ticks))
+    return results
+
+
+def bench_ecs(size: int = 500, zombies: int = 50000,
+              ticks: int = 5) -> List[Tuple[str, str, float, float]]:
+    """
+    Compare the batch stepped ArrayGrid against the EcsGrid stepped by its
+    systems on a large map with many zombies.
+
+    The memory traced while building each game is divided by the number of
+    entities.
+
+    Returns:
+        Rows of (grid type, step mode, bytes per entity, seconds per tick).
+    """
+    results = []
+    for grid_type, mode in ((a2.ArrayGrid, a2.BATCH_STEP),
+                            (ecs.EcsGrid, ecs.SYSTEMS_STEP)):
+        tracemalloc.start()
+        game = zombie_game(size, zombies, grid_type=grid_type)
+        if grid_type is ecs.EcsGrid:
+            game = ecs.EcsGame(game.get_grid(), seed=0)
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        game.set_step_mode(mode)
+
+        def step():
+            for _ in range(ticks):
+                game.step()
+
+        results.append((grid_type.__name__, mode, used / (zombies + 2),
+                        time_call(step, repeat=1) / ticks))
+    return results
+
+
+def _unslotted(kind: type) -> type:
+    """
+    Return a subclass of an entity class with a __dict__, laid out as the
+    entity classes were before they were slotted.
+    """
+    return type(kind.__name__, (kind,), {})
+
+
+class _InstanceLoader(a2.AdvancedMapLoader):
+    """
+    Loads maps as the AdvancedMapLoader did before it shared flyweights, with
+    a new unslotted instance in every cell.
+    """
+
+    _TYPES = {token: _unslotted(kind) for token, kind in (
+        (HOSPITAL, a2.Hospital), (ZOMBIE, a2.Zombie),
+        (TRACKING_ZOMBIE, a2.TrackingZombie))}
+
+    def create_entity(self, token: str) -> a2.Entity:
+        kind = self._TYPES.get(token)
+        if kind is not None:
+            return kind()
+        return super().create_entity(token)
+
+
+def bench_entity_sizes(count: int = 10000) -> List[Tuple[str, float, float]]:
+    """
+    Measure the memory used by an instance of each entity class with and
+    without __slots__.
+
+    Returns:
+        Rows of (class name, bytes without slots, bytes with slots).
+    """
+    results = []
+    for kind in (a2.Zombie, a2.Garlic, a2.HoldingPlayer):
+        used = []
+        for factory in (_unslotted(kind), kind):
+            tracemalloc.start()
+            entities = [factory() for _ in range(count)]
+            used.append(tracemalloc.get_traced_memory()[0] / count)
+            tracemalloc.stop()
+            del entities
+        results.append((kind.__name__, used[0], used[1]))
+    return results
+
+
+def bench_entity_memory(size: int = 1000, zombies: int = 100000
+                        ) -> List[Tuple[str, str, float, float]]:
+    """
+    Measure the memory used per entity by loading a map with a player, a
+    hospital and randomly placed zombies, with a new unslotted instance in
+    every cell as before and with flyweights.
+
+    Returns:
+        Rows of (loader, grid type, bytes per entity once loaded, peak bytes
+        per entity while loading).
+    """
+    rng = random.Random(0)
+    rows = [[" "] * size for _ in range(size)]
+    tokens = [PLAYER, HOSPITAL] + [ZOMBIE] * zombies
+    for cell, token in zip(rng.sample(range(size * size), len(tokens)),
+                           tokens):
+        rows[cell // size][cell % size] = token
+    descriptor, filename = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(descriptor, "w") as map_file:
+        map_file.write("".join("".join(row) + "\n" for row in rows))
+
+    results = []
+    try:
+        for loader, grid_type in ((_InstanceLoader(), a2.Grid),
+                                  (a2.AdvancedMapLoader(), a2.Grid),
+                                  (a2.AdvancedMapLoader(), a2.ArrayGrid),
+                                  (a2.AdvancedMapLoader(), ecs.EcsGrid)):
+            tracemalloc.start()
+            grid = loader.load(filename, grid_type)
+            used, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del grid
+            name = "instances" if isinstance(loader, _InstanceLoader) \
+                else "flyweights"
+            results.append((name, grid_type.__name__, used / len(tokens),
+                            peak / len(tokens)))
+    finally:
+        os.remove(filename)
+    return results
+
+
+class _ListInventory(a2.Inventory):
+    """
+    An inventory which ages and queries its items as Inventory did before it
+    was indexed, by visiting every item.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._held: List[a2.Pickup] = []
+
+    def add_item(self, item: a2.Pickup) -> None:
+        self._held.append(item)
+
+    def get_items(self) -> List[a2.Pickup]:
+        return self._held[:]
+
+    def step(self) -> None:
+        new_items = []
+        for item in self._held:
+            item.hold()
+            if item.get_lifetime() > 0:
+                new_items.append(item)
+        self._held = new_items
+
+    def contains(self, pickup_id: str) -> bool:
+        return any(item.display() == pickup_id for item in self._held)
+
+    def has_active(self, pickup_id: str) -> bool:
+        return any(item.display() == pickup_id and item.is_active()
+                   for item in self._held)
+
+    def any_active(self) -> bool:
+        return any(item.is_active() for item in self._held)
+
+
+def bench_inventory(ticks: int = 20000) -> List[Tuple[str, float]]:
+    """
+    Compare the indexed Inventory against visiting every item, with a full
+    inventory of which every other item is active, each tick stepping the
+    inventory and making the queries of `HoldingPlayer.infect`,
+    `AdvancedGame.fire` and the inventory view.
+
+    Returns:
+        Rows of (inventory, seconds per tick).
+    """
+    results = []
+    for inventory_type in (_ListInventory, a2.Inventory):
+        inventory = inventory_type()
+        for index in range(MAX_ITEMS):
+            item = a2.Garlic() if index % 2 else a2.Crossbow()
+            item.set_lifetime(2 * ticks)
+            if index % 2:
+                item.toggle_active()
+            inventory.add_item(item)
+
+        def tick():
+            for _ in range(ticks):
+                inventory.step()
+                inventory.has_active(GARLIC)
+                inventory.contains(CROSSBOW)
+                inventory.any_active()
+
+        name = "list" if inventory_type is _ListInventory else "indexed"
+        results.append((name, time_call(tick, repeat=1) / ticks))
+    return results
+
+
+SLOW_PERIOD = 10
+
+
+class _SkippingZombie(a2.Zombie):
+    """A zombie which is visited every tick but moves every SLOW_PERIOD."""
+
+    __slots__ = ()
+
+    def step(self, position: a2.Position, game: a2.Game) -> None:
+        if game.get_steps() % SLOW_PERIOD == 0:
+            super().step(position, game)
+
+
+class _SlowZombie(a2.Zombie):
+    """A zombie scheduled to step every SLOW_PERIOD ticks."""
+
+    __slots__ = ()
+
+    def get_period(self) -> int:
+        return SLOW_PERIOD
+
+
+def bench_scheduler(size: int = 200, zombies: int = 4000,
+                    ticks: int = 40) -> List[Tuple[str, float]]:
+    """
+    Compare zombies which move every SLOW_PERIOD ticks by checking the tick
+    in every step against scheduling them, see `Grid.schedule`, with zombies
+    moving every tick as a reference.
+
+    Returns:
+        Rows of (zombie, seconds per tick).
+    """
+    results = []
+    for name, kind in (("every tick", a2.Zombie),
+                       ("skipping", _SkippingZombie),
+                       ("scheduled", _SlowZombie)):
+        rng = random.Random(0)
+        grid = a2.Grid(size)
+        cells = rng.sample(range(size * size), zombies + 1)
+        grid.add_entity(a2.Position(cells[0] % size, cells[0] // size),
+                        a2.HoldingPlayer())
+        zombie = a2.flyweight(kind)
+        for cell in cells[1:]:
+            grid.add_entity(a2.Position(cell % size, cell // size), zombie)
+        game = a2.AdvancedGame(grid, seed=0)
+
+        def step():
+            for _ in range(ticks):
+                game.step()
+
+        results.append((name, time_call(step, repeat=1) / ticks))
+    return results
+
+
+def bench_level_of_detail(
+        radii: Tuple[int, ...] = (0, 20, 10, 5), ticks: int = 20,
+        games: int = 100, horizon: int = 200
+) -> List[Tuple[int, float, float, float, float]]:
+    """
+    Compare the tick time of LOD_STEP mode with each activity radius, 0 for
+    REFERENCE_STEP, on a 200x200 map with 4000 zombies against the fidelity
+    of its games: how often, and how soon, a player who stands still on a
+    60x60 map with 20 zombies is infected within a horizon of ticks.
+
+    Returns:
+        Rows of (radius, mean seconds per tick, 90th percentile seconds per
+        tick, fraction of games lost, mean ticks until infection of the
+        games lost).
+    """
+    results = []
+    for radius in radii:
+        game = zombie_game(200, 4000)
+        if radius:
+            game.set_level_of_detail(radius)
+        # The first tick also sets up the game, e.g. its flow field.
+        game.step()
+        times = []
+        for _ in range(ticks):
+            start = time.perf_counter()
+            game.step()
+            times.append(time.perf_counter() - start)
+
+        infected = []
+        for seed in range(games):
+            game = zombie_game(60, 20, seed=seed)
+            if radius:
+                game.set_level_of_detail(radius)
+            while game.get_steps() < horizon and not game.has_lost():
+                game.step()
+            if game.has_lost():
+                infected.append(game.get_steps())
+        mean = sum(infected) / len(infected) if infected else 0.0
+        results.append((radius, sum(times) / ticks,
+                        sorted(times)[int(0.9 * ticks)],
+                        len(infected) / games, mean))
+    return results
+
+
+def main() -> None:
+    """Run every benchmark and print the results."""
+    print("Grid storage ({} operations, {:.0%} zombies)".format(
+        OPERATIONS, DENSITY))
+    print("{:<12} {:>6} {:>10} {:>10} {:>8}".format(
+        "operation", "size", "Grid", "ArrayGrid", "speedup"))
+    for operation, size, grid_time, array_time in bench_grid_storage():
+        print("{:<12} {:>6} {:>9.4f}s {:>9.4f}s {:>7.2f}x".format(
+            operation, size, grid_time, array_time, grid_time / array_time))
+
+    print()
+    print("Game.step with 10 zombies")
+    print("{:<10} {:>8} {:>12}".format("grid", "statics", "us per tick"))
+    for grid_name, statics, seconds in bench_sparse_step():
+        print("{:<10} {:>8} {:>12.1f}".format(grid_name, statics,
+                                              seconds * 1e6))
+
+    print()
+    print("Step modes, 200x200 map with 4000 zombies")
+    print("{:<10} {:<10} {:>12}".format("grid", "mode", "ms per tick"))
+    for grid_name, mode, seconds in bench_step_modes():
+        print("{:<10} {:<10} {:>12.2f}".format(grid_name, mode, seconds * 1e3))
+
+    print()
+    print("Forking a game with 50 zombies (us per copy)")
+    print("{:<10} {:>6} {:>10} {:>12} {:>10}".format(
+        "grid", "size", "fork", "fork+move", "deepcopy"))
+    for grid_name, size, fork, moved, deep in bench_fork():
+        print("{:<10} {:>6} {:>10.1f} {:>12.1f} {:>10.1f}".format(
+            grid_name, size, fork * 1e6, moved * 1e6, deep * 1e6))
+
+    print()
+    print("Time machine history of a game with 50 zombies")
+    print("{:>6} {:>14}".format("size", "bytes per tick"))
+    for size, used in bench_time_machine():
+        print("{:>6} {:>14.0f}".format(size, used))
+
+    print()
+    print("64 games of maps/basic4.txt with random moves")
+    print("{:<14} {:>12} {:>8}".format("method", "ticks/s", "speedup"))
+    results = bench_vector_env()
+    for method, rate in results:
+        print("{:<14} {:>12.0f} {:>7.2f}x".format(method, rate,
+                                                  rate / results[0][1]))
+
+    print()
+    print("One-hot planes of a 100x100 map with 500 zombies")
+    print("{:>9} {:<10} {:>12}".format("hospitals", "method", "us per tick"))
+    for statics, method, seconds in bench_encoder():
+        print("{:>9} {:<10} {:>12.1f}".format(statics, method, seconds * 1e6))
+
+    print()
+    print("Entity storage, 500x500 map with 50000 zombies")
+    print("{:<10} {:<10} {:>16} {:>12}".format(
+        "grid", "mode", "bytes per entity", "ms per tick"))
+    for grid_name, mode, used, seconds in bench_ecs():
+        print("{:<10} {:<10} {:>16.0f} {:>12.1f}".format(
+            grid_name, mode, used, seconds * 1e3))
+
+    print()
+    print("Bytes per instance of 10000 entities")
+    print("{:<14} {:>10} {:>10}".format("class", "__dict__", "__slots__"))
+    for name, unslotted, slotted in bench_entity_sizes():
+        print("{:<14} {:>10.0f} {:>10.0f}".format(name, unslotted, slotted))
+
+    print()
+    print("Loading a 1000x1000 map with 100000 zombies (bytes per entity)")
+    print("{:<11} {:<10} {:>8} {:>8}".format("entities", "grid", "loaded",
+                                             "peak"))
+    for name, grid_name, used, peak in bench_entity_memory():
+        print("{:<11} {:<10} {:>8.0f} {:>8.0f}".format(name, grid_name, used,
+                                                       peak))
+
+    print()
+    print("Inventory of {} items, half of them active".format(MAX_ITEMS))
+    print("{:<10} {:>12}".format("inventory", "us per tick"))
+    for name, seconds in bench_inventory():
+        print("{:<10} {:>12.2f}".format(name, seconds * 1e6))
+
+    print()
+    print("200x200 map with 4000 zombies moving every {} ticks".format(
+        SLOW_PERIOD))
+    print("{:<12} {:>12}".format("zombies", "ms per tick"))
+    for name, seconds in bench_scheduler():
+        print("{:<12} {:>12.2f}".format(name, seconds * 1e3))
+
+    print()
+    print("Level of detail, dormant zombies catching up every {} ticks"
+          .format(a2.LodStepper.DEFAULT_PERIOD))
+    print("{:>6} {:>12} {:>12} {:>8} {:>14}".format(
+        "radius", "ms per tick", "p90 ms", "lost", "ticks to loss"))
+    for radius, seconds, p90, lost, ticks in bench_level_of_detail():
+        print("{:>6} {:>12.2f} {:>12.2f} {:>8.0%} {:>14.1f}".format(
+            radius or "off", seconds * 1e3, p90 * 1e3, lost, ticks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1022 @@
+"""
+An entity-component backend for the game model, which stores the entities
+of a grid in parallel arrays instead of one Python object per entity.
+
+The World class holds the type code, cell, infection state and pickup state
+of every entity, and the movement, inventory ageing and infection of the
+_step_ event run as systems over those arrays. EcsGrid adapts a world to the
+Grid interface, so AdvancedGame and the interfaces built on it play on it
+unchanged, and EcsGame performs the _step_ event with the systems.
+"""
+import array
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import a2_solution as a2
+from constants import *
+
+PLAYER_CODE = a2.ENTITY_CODES[PLAYER]
+HOSPITAL_CODE = a2.ENTITY_CODES[HOSPITAL]
+ZOMBIE_CODE = a2.ENTITY_CODES[ZOMBIE]
+TRACKING_ZOMBIE_CODE = a2.ENTITY_CODES[TRACKING_ZOMBIE]
+GARLIC_CODE = a2.ENTITY_CODES[GARLIC]
+CROSSBOW_CODE = a2.ENTITY_CODES[CROSSBOW]
+
+SYSTEMS_STEP = "systems"
+"""
+Step mode of an EcsGame which runs the systems, see `EcsGame.set_step_mode`.
+"""
+
+EntityState = Tuple[int, bool, int, int, bool, tuple]
+"""
+An EntityState is the state of an entity as a (code, infected, source,
+lifetime, active, items) tuple of its type code, whether it is infected, the
+type code of the entity which infected it (0 if none), its lifetime and
+whether it is active, and the EntityState of every item it holds.
+"""
+
+# Entities without a state of their own, shared by every cell holding one.
+_PROTOTYPES: Dict[int, a2.Entity] = {
+    HOSPITAL_CODE: a2.flyweight(a2.Hospital),
+    ZOMBIE_CODE: a2.flyweight(a2.Zombie),
+    TRACKING_ZOMBIE_CODE: a2.flyweight(a2.TrackingZombie),
+}
+
+_PICKUP_TYPES = {GARLIC_CODE: a2.Garlic, CROSSBOW_CODE: a2.Crossbow}
+
+_OCCUPIED_CELL = re.compile(b"[^\x00]")
+_ACTOR_CELL = re.compile(b"[" + bytes([PLAYER_CODE, ZOMBIE_CODE,
+                                          TRACKING_ZOMBIE_CODE]) + b"]")
+
+_DIRECTION_NUMBERS = {offset: number for number, offset in enumerate(OFFSETS)}
+
+
+def describe(entity: a2.Entity) -> EntityState:
+    """
+    Return the state of an entity, see EntityState.
+
+    Examples:
+        >>> garlic = a2.Garlic()
+        >>> garlic.toggle_active()
+        >>> describe(garlic)
+        (5, False, 0, 10, True, ())
+
+    Parameters:
+        entity: An entity of a type loaded by the AdvancedMapLoader.
+    """
+    code = a2.entity_code(entity)
+    if code == a2.OTHER_CODE:
+        raise ValueError(f"Cannot store {entity!r} in a world.")
+    infected = False
+    source = 0
+    lifetime = 0
+    active = False
+    items: tuple = ()
+    if isinstance(entity, a2.VulnerablePlayer):
+        infected = entity.is_infected()
+        if entity.get_infected_by() is not None:
+            source = a2.entity_code(entity.get_infected_by())
+    if isinstance(entity, a2.HoldingPlayer):
+        items = tuple(describe(item)
+                      for item in entity.get_inventory().get_items())
+    if isinstance(entity, a2.Pickup):
+        lifetime = entity.get_lifetime()
+        active = entity.is_active()
+    return code, infected, source, lifetime, active, items
+
+
+def materialise(state: EntityState) -> a2.Entity:
+    """
+    Return an entity, independent of any world, in the given state.
+
+    Entities without a state of their own are shared.
+
+    Examples:
+        >>> materialise((6, False, 0, 2, True, ()))
+        Crossbow(2)
+        >>> garlic = (5, False, 0, 3, False, ())
+        >>> player = materialise((1, True, 4, 0, False, (garlic,)))
+        >>> player.get_infected_by(), player.get_inventory().get_items()
+        (TrackingZombie(), [Garlic(3)])
+
+    Parameters:
+        state: The state of the entity.
+    """
+    code, infected, source, lifetime, active, items = state
+    prototype = _PROTOTYPES.get(code)
+    if prototype is not None:
+        return prototype
+    if code == PLAYER_CODE:
+        player = a2.HoldingPlayer()
+        for item in items:
+            player.get_inventory().add_item(materialise(item))
+        if infected:
+            player.infect(_PROTOTYPES.get(source))
+        return player
+    pickup = _PICKUP_TYPES[code]()
+    pickup.set_lifetime(lifetime)
+    if active:
+        pickup.toggle_active()
+    return pickup
+
+
+class World:
+    """
+    A World stores the entities of a square grid as parallel arrays indexed
+    by entity id, alongside the type code and entity id of every cell.
+
+    Pickups held by a player are entities of the world without a cell, the
+    ids held by each player are kept in order.
+
+    Examples:
+        >>> world = World(3)
+        >>> player = world.add((1, False, 0, 0, False, ()), 0)
+        >>> zombie = world.add((3, False, 0, 0, False, ()), 4)
+        >>> world.move(zombie, 5)
+        >>> list(world.get_codes()), world.get_cell(zombie)
+        ([1, 0, 0, 0, 0, 3, 0, 0, 0], 5)
+        >>> world.remove(zombie)
+        >>> world.count(ZOMBIE_CODE), world.at(5)
+        (0, -1)
+    """
+
+    def __init__(self, size: int):
+        """
+        Parameters:
+            size: The length and width of the grid.
+        """
+        self._size = size
+        self._codes = bytearray(size * size)
+        self._ids = array.array("i", [-1]) * (size * size)
+        self._counts = array.array("i", bytes(4 * 256))
+
+        self._kinds = bytearray()
+        # The cell of each entity, -1 for entities held by a player.
+        self._cells = array.array("i")
+        self._infected = bytearray()
+        # The type code of the entity which infected each entity, 0 if none.
+        self._sources = bytearray()
+        self._lifetimes = array.array("i")
+        self._active = bytearray()
+        self._held: Dict[int, List[int]] = {}
+        self._free: List[int] = []
+
+    def get_size(self) -> int:
+        """Return the length and width of the grid of this world."""
+        return self._size
+
+    def get_codes(self) -> bytearray:
+        """
+        Return the type code of every cell in row major order, which must
+        not be modified, see `Grid.get_codes`.
+        """
+        return self._codes
+
+    def at(self, cell: int) -> int:
+        """Return the id of the entity in a cell, -1 if it is empty."""
+        return self._ids[cell]
+
+    def get_code(self, entity: int) -> int:
+        """Return the type code of an entity."""
+        return self._kinds[entity]
+
+    def get_cell(self, entity: int) -> int:
+        """Return the cell of an entity, -1 if it is held by a player."""
+        return self._cells[entity]
+
+    def get_held(self, player: int) -> List[int]:
+        """Return the ids of the items held by a player, in order."""
+        return self._held.get(player, [])[:]
+
+    def count(self, code: int) -> int:
+        """Return the number of entities with a type code in the cells."""
+        return self._counts[code]
+
+    def add(self, state: EntityState, cell: int) -> int:
+        """
+        Add an entity in the given state and return its id.
+
+        Parameters:
+            state: The state of the new entity.
+            cell: The empty cell of the new entity, -1 for an entity which
+                  is held by a player.
+        """
+        if self._free:
+            entity = self._free.pop()
+        else:
+            entity = len(self._kinds)
+            self._kinds.append(0)
+            self._cells.append(-1)
+            self._infected.append(0)
+            self._sources.append(0)
+            self._lifetimes.append(0)
+            self._active.append(0)
+        code = state[0]
+        self._kinds[entity] = code
+        self._cells[entity] = cell
+        if cell >= 0:
+            self._codes[cell] = code
+            self._ids[cell] = entity
+            self._counts[code] += 1
+        self.load(entity, state)
+        return entity
+
+    def load(self, entity: int, state: EntityState) -> None:
+        """
+        Replace the state of an entity with a state of the same type.
+
+        Parameters:
+            entity: The id of the entity.
+            state: The new state of the entity.
+        """
+        _, infected, source, lifetime, active, items = state
+        self._infected[entity] = infected
+        self._sources[entity] = source
+        self._lifetimes[entity] = lifetime
+        self._active[entity] = active
+        if self._kinds[entity] == PLAYER_CODE:
+            for item in self._held.get(entity, ()):
+                self.remove(item)
+            self._held[entity] = [self.add(item, -1) for item in items]
+
+    def describe(self, entity: int) -> EntityState:
+        """Return the state of an entity, see EntityState."""
+        return (self._kinds[entity], bool(self._infected[entity]),
+                self._sources[entity], self._lifetimes[entity],
+                bool(self._active[entity]),
+                tuple(self.describe(item)
+                      for item in self._held.get(entity, ())))
+
+    def remove(self, entity: int) -> None:
+        """Remove an entity, and every item it holds, from the world."""
+        cell = self._cells[entity]
+        if cell >= 0:
+            self._codes[cell] = 0
+            self._ids[cell] = -1
+            self._counts[self._kinds[entity]] -= 1
+        for item in self._held.pop(entity, ()):
+            self.remove(item)
+        self._kinds[entity] = 0
+        self._free.append(entity)
+
+    def move(self, entity: int, cell: int) -> None:
+        """Move an entity in a cell to another cell, which must be empty."""
+        start = self._cells[entity]
+        self._codes[cell] = self._codes[start]
+        self._codes[start] = 0
+        self._ids[cell] = entity
+        self._ids[start] = -1
+        self._cells[entity] = cell
+
+    def copy(self) -> "World":
+        """Return a world with the same entities which changes separately."""
+        world = World.__new__(World)
+        world.__dict__.update(self.__dict__)
+        for name in ("_codes", "_ids", "_counts", "_kinds", "_cells",
+                     "_infected", "_sources", "_lifetimes", "_active",
+                     "_free"):
+            setattr(world, name, getattr(self, name)[:])
+        world._held = {player: items[:]
+                       for player, items in self._held.items()}
+        return world
+
+
+def actor_order(world: World) -> List[int]:
+    """
+    Return the ids of the entities of a world with a step behaviour in the
+    order they step, i.e. row major order of their cells.
+    """
+    ids = world._ids
+    return [ids[match.start()] for match in _ACTOR_CELL.finditer(world._codes)]
+
+
+def movement_system(world: World, order: List[int],
+                    random_directions: Callable[[], List[Tuple[int, int]]],
+                    tracking_directions: Callable[[int],
+                                                  List[Tuple[int, int]]]
+                    ) -> Tuple[List[Tuple[int, int, int]],
+                               List[Tuple[int, int, int]]]:
+    """
+    Move the zombies of a world in turn, each to the first empty cell in the
+    order of its directions, as `Zombie.step` does.
+
+    A zombie whose next direction holds a player stops there instead and
+    the contact is returned for the infection system.
+
+    Parameters:
+        world: The world to change.
+        order: The ids of the actors in the order of their turns.
+        random_directions: Returns the directions of the next zombie.
+        tracking_directions: Returns the directions of a tracking zombie in
+                             the given cell.
+
+    Returns:
+        The (zombie, start cell, end cell) of every move and the (turn,
+        zombie, player) of every contact with a player, in order.
+    """
+    codes = world._codes
+    ids = world._ids
+    kinds = world._kinds
+    cells = world._cells
+    neighbours = a2.neighbour_indices(world._size)
+    numbers = _DIRECTION_NUMBERS
+    moves = []
+    contacts = []
+    for turn, entity in enumerate(order):
+        kind = kinds[entity]
+        if kind == ZOMBIE_CODE:
+            directions = random_directions()
+        elif kind == TRACKING_ZOMBIE_CODE:
+            directions = tracking_directions(cells[entity])
+        else:
+            continue
+
+        cell = cells[entity]
+        base = cell * 4
+        for direction in directions:
+            destination = neighbours[base + numbers[direction]]
+            if destination < 0:
+                continue
+            code = codes[destination]
+            if code == 0:
+                codes[destination] = kind
+                codes[cell] = 0
+                ids[destination] = entity
+                ids[cell] = -1
+                cells[entity] = destination
+                moves.append((entity, cell, destination))
+                break
+            if code == PLAYER_CODE:
+                contacts.append((turn, entity, ids[destination]))
+                break
+    return moves, contacts
+
+
+def ageing_system(world: World, players: List[int]) -> None:
+    """
+    Age the active items held by players by one step and drop the items
+    whose lifetime ran out, as `Inventory.step` does.
+
+    Parameters:
+        world: The world to change.
+        players: The ids of the players whose items age.
+    """
+    lifetimes = world._lifetimes
+    active = world._active
+    for player in players:
+        kept = []
+        for item in world._held.get(player, ()):
+            if active[item]:
+                lifetimes[item] -= 1
+            if lifetimes[item] > 0:
+                kept.append(item)
+            else:
+                world.remove(item)
+        if player in world._held:
+            world._held[player] = kept
+
+
+def holds(world: World, player: int, code: Optional[int] = None,
+          active: bool = False) -> bool:
+    """
+    Return true if a player holds an item with the given type code.
+
+    Parameters:
+        world: The world holding the player.
+        player: The id of the player.
+        code: The type code of the item, None for an item of any type.
+        active: Whether to only count active items.
+    """
+    for item in world._held.get(player, ()):
+        if ((code is None or world._kinds[item] == code)
+                and (not active or world._active[item])):
+            return True
+    return False
+
+
+def is_shielded(world: World, player: int) -> bool:
+    """Return true if a player holds active garlic."""
+    return holds(world, player, GARLIC_CODE, True)
+
+
+def infection_system(world: World, contacts: List[Tuple[int, int, int]],
+                     turns: Dict[int, int],
+                     shielded: Dict[int, bool]) -> List[int]:
+    """
+    Infect the players touched by zombies, as `HoldingPlayer.infect` does,
+    unless they held active garlic at the time.
+
+    Parameters:
+        world: The world to change.
+        contacts: The contacts returned by the movement system.
+        turns: The turn of each player in the order of the movement system.
+        shielded: Whether each player held active garlic before its turn,
+                  the world holds the state after every turn.
+
+    Returns:
+        The ids of the players who became infected, in order.
+    """
+    infected = []
+    for turn, zombie, player in contacts:
+        if world._infected[player]:
+            continue
+        if turn < turns[player]:
+            protected = shielded[player]
+        else:
+            protected = is_shielded(world, player)
+        if not protected:
+            world._infected[player] = True
+            world._sources[player] = world._kinds[zombie]
+            infected.append(player)
+    return infected
+
+
+def run_systems(world: World,
+                random_directions: Callable[[], List[Tuple[int, int]]],
+                tracking_directions: Callable[[int], List[Tuple[int, int]]]
+                ) -> Tuple[List[Tuple[int, int, int]], List[int]]:
+    """
+    Perform the _step_ event of a world: zombies move, the items of players
+    age and touched players are infected.
+
+    The outcome is the same as stepping every entity in row major order,
+    see `Game.step`.
+
+    Parameters:
+        world: The world to change.
+        random_directions: Returns the directions of the next zombie.
+        tracking_directions: Returns the directions of a tracking zombie in
+                             the given cell.
+
+    Returns:
+        The moves of the movement system and the ids of the players who
+        became infected.
+    """
+    order = actor_order(world)
+    kinds = world._kinds
+    turns = {entity: turn for turn, entity in enumerate(order)
+             if kinds[entity] == PLAYER_CODE}
+    shielded = {player: is_shielded(world, player) for player in turns}
+    moves, contacts = movement_system(world, order, random_directions,
+                                      tracking_directions)
+    ageing_system(world, list(turns))
+    return moves, infection_system(world, contacts, turns, shielded)
+
+
+class _View:
+    """
+    A view is an entity whose state lives in the world of an EcsGrid, so
+    changing the view changes the grid.
+
+    A view subclasses the entity type it stands for, so that the game treats
+    it as one, but it does not call the `__init__` of that type, which would
+    write a new entity's state into the world. Instead each view shadows
+    every attribute of the state of its entity type, with a property reading
+    the world for the attributes stored there.
+
+    Views are only valid while their entity is in the grid, `copy` returns
+    an entity which is independent of the grid.
+    """
+
+    def __init__(self, grid: "EcsGrid", entity: int):
+        """
+        Parameters:
+            grid: The grid whose world holds the entity.
+            entity: The id of the entity.
+        """
+        self._grid = grid
+        self._id = entity
+
+    def copy(self) -> a2.Entity:
+        return materialise(self._grid._world.describe(self._id))
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
+
+class PickupView(_View):
+    """A view of a pickup, its lifetime and whether it is active."""
+
+    # The world holds the items of players, views are never held by an
+    # Inventory and their lifetime is never filed under a tick.
+    _holder = None
+    _expires = 0
+
+    @property
+    def _lifetime(self) -> int:
+        return self._grid._world._lifetimes[self._id]
+
+    @_lifetime.setter
+    def _lifetime(self, lifetime: int) -> None:
+        self._grid._writable()._lifetimes[self._id] = lifetime
+
+    @property
+    def _using(self) -> bool:
+        return bool(self._grid._world._active[self._id])
+
+    @_using.setter
+    def _using(self, using: bool) -> None:
+        self._grid._writable()._active[self._id] = using
+
+
+class GarlicView(PickupView, a2.Garlic):
+    pass
+
+
+class CrossbowView(PickupView, a2.Crossbow):
+    pass
+
+
+class InventoryView:
+    """
+    A view of the items held by a player in the world of an EcsGrid, with
+    the interface of an Inventory.
+
+    Its items are views as well, `copy` returns an Inventory which is
+    independent of the grid.
+
+    Examples:
+        >>> grid = EcsGrid(3)
+        >>> player = a2.HoldingPlayer()
+        >>> player.get_inventory().add_item(a2.Garlic())
+        >>> grid.add_entity(a2.Position(0, 0), player)
+        >>> inventory = grid.get_entity(a2.Position(0, 0)).get_inventory()
+        >>> inventory.add_item(a2.Crossbow())
+        >>> inventory.get_items()[0].toggle_active()
+        >>> inventory.step()
+        >>> inventory.get_items(), inventory.has_active(GARLIC)
+        ([Garlic(9), Crossbow(5)], True)
+        >>> copy = inventory.copy()
+        >>> type(copy).__name__, copy.state_hash() == inventory.state_hash()
+        ('Inventory', True)
+    """
+
+    def __init__(self, grid: "EcsGrid", player: int):
+        """
+        Parameters:
+            grid: The grid whose world holds the player.
+            player: The id of the player.
+        """
+        self._grid = grid
+        self._player = player
+
+    def get_items(self) -> List[a2.Pickup]:
+        view = self._grid._view
+        return [view(item) for item in self._grid._world.get_held(
+            self._player)]
+
+    def step(self) -> None:
+        ageing_system(self._grid._writable(), [self._player])
+
+    def contains(self, pickup_id: str) -> bool:
+        code = a2.ENTITY_CODES.get(pickup_id)
+        return code is not None and holds(self._grid._world, self._player,
+                                          code)
+
+    def has_active(self, pickup_id: str) -> bool:
+        code = a2.ENTITY_CODES.get(pickup_id)
+        return code is not None and holds(self._grid._world, self._player,
+                                          code, True)
+
+    def any_active(self) -> bool:
+        return holds(self._grid._world, self._player, None, True)
+
+    def add_item(self, item: a2.Pickup) -> None:
+        world = self._grid._writable()
+        world._held[self._player].append(world.add(describe(item), -1))
+
+    def copy(self) -> a2.Inventory:
+        inventory = a2.Inventory()
+        for item in self.get_items():
+            inventory.add_item(item.copy())
+        return inventory
+
+    def state_hash(self) -> int:
+        # The items of a copy are in the same order and state.
+        return self.copy().state_hash()
+
+
+class PlayerView(_View, a2.HoldingPlayer):
+    """
+    A view of a player, its infection and its inventory.
+
+    Examples:
+        >>> grid = EcsGrid(3)
+        >>> grid.add_entity(a2.Position(1, 1), a2.HoldingPlayer())
+        >>> player = grid.get_entity(a2.Position(1, 1))
+        >>> player.watch_infection(lambda: print("infected"))
+        >>> player.infect(a2.TrackingZombie())
+        infected
+        >>> player.is_infected(), player.get_infected_by()
+        (True, TrackingZombie())
+        >>> player.state_hash() == player.copy().state_hash()
+        True
+    """
+
+    def __init__(self, grid: "EcsGrid", entity: int):
+        super().__init__(grid, entity)
+        self._on_infected: Optional[Callable[[], None]] = None
+
+    @property
+    def _infected(self) -> bool:
+        return bool(self._grid._world._infected[self._id])
+
+    @_infected.setter
+    def _infected(self, infected: bool) -> None:
+        self._grid._writable()._infected[self._id] = infected
+
+    @property
+    def _infected_by(self) -> Optional[a2.Entity]:
+        return _PROTOTYPES.get(self._grid._world._sources[self._id])
+
+    @_infected_by.setter
+    def _infected_by(self, source: Optional[a2.Entity]) -> None:
+        self._grid._writable()._sources[self._id] = (
+            0 if source is None else a2.entity_code(source))
+
+    @property
+    def _inventory(self) -> InventoryView:
+        return InventoryView(self._grid, self._id)
+
+    def step(self, position: a2.Position, game: a2.Game) -> None:
+        ageing_system(self._grid._writable(), [self._id])
+
+
+_VIEW_TYPES = {PLAYER_CODE: PlayerView, GARLIC_CODE: GarlicView,
+               CROSSBOW_CODE: CrossbowView}
+
+
+class EcsGrid(a2.Grid):
+    """
+    An EcsGrid has the same behaviour as a Grid but stores its entities in a
+    World, see the World class.
+
+    Hospitals and zombies are returned as shared instances, players and
+    pickups as views which change the world when they are changed. Players
+    are stored as holding players. Entities are iterated in row major order,
+    i.e. sorted by y then x, and the indexes of the Grid are answered from
+    the world rather than kept alongside it.
+
+    Examples:
+        >>> grid = EcsGrid(4)
+        >>> grid.add_entity(a2.Position(3, 0), a2.Zombie())
+        >>> grid.add_entity(a2.Position(1, 2), a2.HoldingPlayer())
+        >>> grid.move_entity(a2.Position(3, 0), a2.Position(1, 0))
+        >>> grid.get_mapping()
+        {Position(1, 0): Zombie(), Position(1, 2): HoldingPlayer()}
+        >>> grid.find_player()
+        Position(1, 2)
+        >>> grid.first_in_direction(a2.Position(1, 2), a2.Position(0, -1))
+        (Position(1, 0), Zombie())
+        >>> grid.get_entity(a2.Position(1, 2)).infect(a2.Zombie())
+        >>> grid.get_world().describe(grid.get_world().at(9))
+        (1, True, 3, 0, False, ())
+    """
+
+    def __init__(self, size: int):
+        """
+        Parameters:
+            size: The length and width of the grid.
+        """
+        super().__init__(size)
+        self._world = World(size)
+        # The views handed out for the ids of stateful entities.
+        self._views: Dict[int, a2.Entity] = {}
+
+    _SHARED_FIELDS = ("_world",)
+    _NESTED_FIELDS = ()
+    _ENTITY_FIELDS = ("_world",)
+
+    def get_world(self) -> World:
+        """
+        Return the world storing the entities of this grid, which may be
+        shared with forks of the grid and must not be changed directly.
+        """
+        return self._world
+
+    def fork(self) -> "EcsGrid":
+        fork = super().fork()
+        fork._views = {}
+        return fork
+
+    def _writable(self) -> World:
+        """Return the world of this grid, taking a copy if it is shared."""
+        if self._shared:
+            self._unshare(self._SHARED_FIELDS)
+        return self._world
+
+    def _view(self, entity: int) -> a2.Entity:
+        """Return the entity with the given id of the world."""
+        code = self._world._kinds[entity]
+        prototype = _PROTOTYPES.get(code)
+        if prototype is not None:
+            return prototype
+        view = self._views.get(entity)
+        if view is None or a2.entity_code(view) != code:
+            view = self._views[entity] = _VIEW_TYPES[code](self, entity)
+        return view
+
+    def _release(self, entity: int) -> None:
+        """Remove an entity from the world and forget its view."""
+        self._world.remove(entity)
+        self._views.pop(entity, None)
+
+    def _journal_entity(self, entity: Optional[a2.Entity]
+                        ) -> Optional[a2.Entity]:
+        """Return an entity as recorded by the journal, outliving the grid."""
+        if isinstance(entity, _View):
+            return entity.copy()
+        return entity
+
+    def _notify(self, *positions: a2.Position) -> None:
+        """Call the listeners with each changed position."""
+        for listener in self._listeners:
+            for position in positions:
+                listener(position)
+
+    def add_entity(self, position: a2.Position, entity: a2.Entity) -> None:
+        if not self.in_bounds(position):
+            return
+        state = describe(entity)
+        world = self._writable()
+        position = self._positions.intern(position)
+        index = position._y * self._size + position._x
+        existing = world.at(index)
+        if self._journal is not None:
+            self._journal.append(
+                (position, self._journal_entity(self._get(position))))
+        self._hash ^= a2.zobrist_key(index, state[0])
+        if existing >= 0:
+            self._hash ^= a2.zobrist_key(index, world.get_code(existing))
+            self._release(existing)
+        world.add(state, index)
+        self._notify(position)
+
+    def remove_entity(self, position: a2.Position) -> None:
+        entity = self._get(position)
+        if entity is None:
+            return
+        world = self._writable()
+        position = self._positions.intern(position)
+        index = position._y * self._size + position._x
+        if self._journal is not None:
+            self._journal.append((position, self._journal_entity(entity)))
+        self._hash ^= a2.zobrist_key(index, world.get_code(world.at(index)))
+        self._release(world.at(index))
+        self._notify(position)
+
+    def _relocate(self, start: a2.Position, end: a2.Position,
+                  entity: a2.Entity, existing: Optional[a2.Entity]) -> None:
+        world = self._writable()
+        if self._journal is not None:
+            self._journal.append((start, self._journal_entity(entity)))
+            self._journal.append((end, self._journal_entity(existing)))
+        size = self._size
+        start_index = start._y * size + start._x
+        end_index = end._y * size + end._x
+        moved = world.at(start_index)
+        code = world.get_code(moved)
+        self._hash ^= (a2.zobrist_key(start_index, code)
+                       ^ a2.zobrist_key(end_index, code))
+        if existing is not None:
+            replaced = world.at(end_index)
+            self._hash ^= a2.zobrist_key(end_index, world.get_code(replaced))
+            self._release(replaced)
+        world.move(moved, end_index)
+        self._notify(start, end)
+
+    def _replace(self, position: a2.Position, entity: a2.Entity) -> None:
+        position = self._positions.intern(position)
+        index = position._y * self._size + position._x
+        state = describe(entity)
+        if self._journal is not None:
+            self._journal.append(
+                (position, self._journal_entity(self._get(position))))
+        # A fork replaces its player with a copy of the same state, which
+        # does not need the world to be copied.
+        if self._world.describe(self._world.at(index)) != state:
+            world = self._writable()
+            world.load(world.at(index), state)
+        self._notify(position)
+
+    def record_moves(self, moves: List[Tuple[int, int, int]]) -> None:
+        """
+        Bring the hash, journal and listeners of the grid up to date with
+        moves made to its world by the movement system.
+
+        Parameters:
+            moves: The moves returned by `movement_system`.
+        """
+        size = self._size
+        positions = self._positions
+        kinds = self._world._kinds
+        journal = self._journal
+        key = a2.zobrist_key
+        for entity, start, end in moves:
+            code = kinds[entity]
+            self._hash ^= key(start, code) ^ key(end, code)
+            if journal is not None or self._listeners:
+                start_position = positions.get(start % size, start // size)
+                end_position = positions.get(end % size, end // size)
+                if journal is not None:
+                    journal.append((start_position, _PROTOTYPES[code]))
+                    journal.append((end_position, None))
+                self._notify(start_position, end_position)
+
+    def _get(self, position: a2.Position) -> Optional[a2.Entity]:
+        size = self._size
+        x = position._x
+        y = position._y
+        if not (0 <= x < size and 0 <= y < size):
+            return None
+        entity = self._world._ids[y * size + x]
+        if entity < 0:
+            return None
+        return self._view(entity)
+
+    get_entity = _get
+
+    def _items(self) -> Iterator[Tuple[a2.Position, a2.Entity]]:
+        size = self._size
+        positions = self._positions
+        ids = self._world._ids
+        for match in _OCCUPIED_CELL.finditer(self._world._codes):
+            index = match.start()
+            yield positions.get(index % size, index // size), \
+                self._view(ids[index])
+
+    def get_codes(self) -> bytearray:
+        return self._world._codes[:]
+
+    def get_actors(self) -> List[Tuple[a2.Position, a2.Entity]]:
+        size = self._size
+        positions = self._positions
+        world = self._world
+        return [(positions.get(world._cells[entity] % size,
+                               world._cells[entity] // size),
+                 self._view(entity)) for entity in actor_order(world)]
+
+    def find_player(self) -> Optional[a2.Position]:
+        index = self._world._codes.find(PLAYER_CODE)
+        if index < 0:
+            return None
+        return self._positions.get(index % self._size, index // self._size)
+
+    def positions_of(self, token: str) -> List[a2.Position]:
+        """
+        Return the positions of every entity in the grid which is displayed
+        with the given character, in row major order.
+
+        Parameters:
+            token: The display character of the entities to find.
+        """
+        code = a2.ENTITY_CODES.get(token)
+        if code is None:
+            return []
+        size = self._size
+        positions = self._positions
+        return [positions.get(match.start() % size, match.start() // size)
+                for match in re.finditer(re.escape(bytes([code])),
+                                         self._world._codes)]
+
+    def count_of(self, token: str) -> int:
+        code = a2.ENTITY_CODES.get(token)
+        return 0 if code is None else self._world.count(code)
+
+    def first_in_direction(
+        self, start: a2.Position, offset: a2.Position
+    ) -> Optional[Tuple[a2.Position, a2.Entity]]:
+        dx = offset._x
+        dy = offset._y
+        if not self.in_bounds(start) or abs(dx) + abs(dy) != 1:
+            return super().first_in_direction(start, offset)
+
+        size = self._size
+        if dy == 0:
+            line = self._world._codes[start._y * size:(start._y + 1) * size]
+            here = start._x
+        else:
+            line = self._world._codes[start._x::size]
+            here = start._y
+        if dx + dy > 0:
+            found = _OCCUPIED_CELL.search(line, here + 1)
+            if found is None:
+                return None
+            found = found.start()
+        else:
+            found = len(line[:here].rstrip(b"\x00")) - 1
+            if found < 0:
+                return None
+
+        if dy == 0:
+            position = self._positions.get(found, start._y)
+        else:
+            position = self._positions.get(start._x, found)
+        return position, self._get(position)
+
+
+class SystemStepper:
+    """
+    A SystemStepper performs the _step_ event of a game on an EcsGrid by
+    running the systems over the world of the grid, see `run_systems`.
+
+    Examples:
+        >>> def make_game(grid_type):
+        ...     grid = grid_type(6)
+        ...     grid.add_entity(a2.Position(2, 2), a2.HoldingPlayer())
+        ...     for x, y in [(0, 0), (5, 5), (3, 1), (0, 4)]:
+        ...         grid.add_entity(a2.Position(x, y), a2.Zombie())
+        ...     grid.add_entity(a2.Position(5, 0), a2.TrackingZombie())
+        ...     return a2.AdvancedGame(grid, seed=7)
+        >>> reference = make_game(a2.ArrayGrid)
+        >>> game = EcsGame(make_game(EcsGrid).get_grid(), seed=7)
+        >>> for _ in range(25): reference.step()
+        >>> for _ in range(25): game.step()
+        >>> game.get_grid().serialize() == reference.get_grid().serialize()
+        True
+        >>> game.has_lost() == reference.has_lost()
+        True
+    """
+
+    def step(self, game: a2.Game) -> None:
+        """
+        Perform the _step_ event of a game.
+
+        Parameters:
+            game: The game to step, its grid must be an EcsGrid.
+        """
+        grid = game.get_grid()
+        size = grid.get_size()
+        positions = grid._positions
+        rng = game.get_rng()
+
+        def tracking_directions(cell: int) -> List[Tuple[int, int]]:
+            return game.get_flow_field().directions(
+                positions.get(cell % size, cell // size))
+
+        moves, infected = run_systems(grid._writable(), rng.directions,
+                                      tracking_directions)
+        grid.record_moves(moves)
+        for player in infected:
+            callback = grid._view(player)._on_infected
+            if callback is not None:
+                callback()
+
+
+class EcsGame(a2.AdvancedGame):
+    """
+    An EcsGame is an AdvancedGame on an EcsGrid whose _step_ event runs the
+    systems over the world of the grid by default, see SystemStepper.
+
+    Examples:
+        >>> grid = EcsGrid(4)
+        >>> grid.add_entity(a2.Position(0, 0), a2.HoldingPlayer())
+        >>> grid.add_entity(a2.Position(1, 0), a2.Garlic())
+        >>> grid.add_entity(a2.Position(3, 0), a2.Zombie())
+        >>> game = EcsGame(grid, seed=0)
+        >>> game.move_player(game.direction_to_offset(RIGHT))
+        >>> game.get_player().get_inventory().get_items()[0].toggle_active()
+        >>> for _ in range(3): game.step()
+        >>> game.get_player().get_inventory().get_items(), game.get_step_mode()
+        ([Garlic(7)], 'systems')
+    """
+
+    def __init__(self, grid: EcsGrid, seed: Optional[int] = None):
+        """
+        Parameters:
+            grid: The game's grid.
+            seed: The seed of the game's random number generator, see GameRNG.
+        """
+        super().__init__(grid, seed)
+        self.set_step_mode(SYSTEMS_STEP)
+
+    def get_step_mode(self) -> str:
+        if isinstance(self._stepper, SystemStepper):
+            return SYSTEMS_STEP
+        return super().get_step_mode()
+
+    def set_step_mode(self, mode: str) -> None:
+        """
+        Choose how the _step_ event is performed, SYSTEMS_STEP or one of the
+        modes of `Game.set_step_mode`. Every mode apart from LOD_STEP
+        produces the same game.
+
+        Parameters:
+            mode: The step mode.
+        """
+        if mode == SYSTEMS_STEP:
+            self._stepper = SystemStepper()
+        else:
+            super().set_step_mode(mode)
+
+
+def ecs_game(filename: str, seed: Optional[int] = None) -> EcsGame:
+    """
+    Return a game of a map file stored in an EcsGrid, see `advanced_game`.
+
+    Parameters:
+        filename: Path where the map file should be found.
+        seed: The seed of the game's random number generator.
+    """
+    grid = a2.AdvancedMapLoader().load(filename, EcsGrid)
+    return EcsGame(grid, seed)
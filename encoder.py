@@ -0,0 +1,165 @@
+"""
+Encodes the state of a game as one-hot planes, one plane per type of entity,
+updating only the cells which changed since the last update.
+
+Consumers read the planes through memoryviews of the encoder's buffers, so
+no copy is made, e.g. `numpy.asarray(encoder.get_planes())`.
+"""
+import array
+from typing import List, Optional
+
+import a2_solution as a2
+from constants import *
+
+CHANNELS = (PLAYER, HOSPITAL, ZOMBIE, TRACKING_ZOMBIE, GARLIC, CROSSBOW)
+"""The display character of the entities in each plane, in order."""
+
+INVENTORY_FEATURES = ("garlic", "active_garlic", "garlic_lifetime",
+                      "crossbow", "active_crossbow", "crossbow_lifetime")
+"""
+The features of the inventory of the player: for garlic and then crossbows,
+the number held, the number active and the greatest lifetime of any active
+item, 0 if none is active.
+"""
+
+_CHANNEL_OF = {token: channel for channel, token in enumerate(CHANNELS)}
+
+
+class ObservationEncoder:
+    """
+    An ObservationEncoder keeps a (channels, size, size) tensor of a game,
+    where the value at (channel, y, x) is 1 if the entity at (x, y) is
+    displayed as CHANNELS[channel] and 0 otherwise, and the
+    INVENTORY_FEATURES of the player.
+
+    The encoder listens to the changes of the grid, see `Grid.add_listener`,
+    and `update` encodes only the cells which changed since the last update.
+
+    Examples:
+        >>> grid = a2.Grid(3)
+        >>> grid.add_entity(a2.Position(0, 0), a2.HoldingPlayer())
+        >>> grid.add_entity(a2.Position(2, 0), a2.Zombie())
+        >>> game = a2.AdvancedGame(grid)
+        >>> encoder = ObservationEncoder(game)
+        >>> planes = encoder.get_planes()
+        >>> planes.shape, planes[0, 0, 0], planes[2, 0, 2]
+        ((6, 3, 3), 1, 1)
+        >>> game.move_player(game.direction_to_offset(DOWN))
+        >>> encoder.update()
+        >>> planes.tolist()[0]
+        [[0, 0, 0], [1, 0, 0], [0, 0, 0]]
+        >>> encoder.get_features().tolist()
+        [0, 0, 0, 0, 0, 0]
+    """
+
+    def __init__(self, game: a2.Game):
+        """
+        Parameters:
+            game: The game to encode.
+        """
+        self._game: Optional[a2.Game] = None
+        self._grid: Optional[a2.Grid] = None
+        self._size = 0
+        self._planes = bytearray()
+        # The channel of each cell plus one, 0 for cells without a channel.
+        self._channels = bytearray()
+        self._features = array.array("i", bytes(4 * len(INVENTORY_FEATURES)))
+        self._changed: List[a2.Position] = []
+        self.attach(game)
+
+    def attach(self, game: a2.Game) -> None:
+        """
+        Encode a game from scratch and keep it up to date from now on.
+
+        The buffers are reused if the grid of the game is the same size as
+        the grid encoded before, otherwise views of the old buffers no longer
+        follow the encoder.
+
+        Parameters:
+            game: The game to encode.
+        """
+        self.detach()
+        grid = game.get_grid()
+        size = grid.get_size()
+        if size != self._size:
+            self._size = size
+            self._planes = bytearray(len(CHANNELS) * size * size)
+            self._channels = bytearray(size * size)
+        else:
+            self._planes[:] = bytes(len(self._planes))
+            self._channels[:] = bytes(len(self._channels))
+        self._game = game
+        self._grid = grid
+        for position in grid.get_mapping():
+            self._encode(position)
+        grid.add_listener(self._changed.append)
+        self._encode_inventory()
+
+    def detach(self) -> None:
+        """Stop following the changes of the game being encoded."""
+        if self._grid is not None:
+            self._grid.remove_listener(self._changed.append)
+        self._grid = None
+        self._changed.clear()
+
+    def update(self) -> None:
+        """
+        Encode the cells which changed since the last update and the
+        inventory of the player.
+
+        The game is encoded from scratch if its grid was replaced, e.g. by
+        `Game.restore`.
+        """
+        if self._game.get_grid() is not self._grid:
+            self.attach(self._game)
+            return
+        # A cell may change several times in one step, e.g. when a zombie
+        # moves into the cell another zombie left, but is encoded once.
+        for position in dict.fromkeys(self._changed):
+            self._encode(position)
+        self._changed.clear()
+        self._encode_inventory()
+
+    def get_planes(self) -> memoryview:
+        """
+        Return a (channels, size, size) view of the planes which follows
+        every update.
+        """
+        return memoryview(self._planes).cast(
+            "B", (len(CHANNELS), self._size, self._size))
+
+    def get_features(self) -> memoryview:
+        """
+        Return a view of the INVENTORY_FEATURES which follows every update.
+        """
+        return memoryview(self._features)
+
+    def _encode(self, position: a2.Position) -> None:
+        """Encode the entity, if any, at a position."""
+        size = self._size
+        cell = position.get_y() * size + position.get_x()
+        channels = self._channels
+        previous = channels[cell]
+        if previous:
+            self._planes[(previous - 1) * size * size + cell] = 0
+        entity = self._grid.get_entity(position)
+        channel = None if entity is None else _CHANNEL_OF.get(entity.display())
+        if channel is None:
+            channels[cell] = 0
+        else:
+            channels[cell] = channel + 1
+            self._planes[channel * size * size + cell] = 1
+
+    def _encode_inventory(self) -> None:
+        """Encode the inventory of the player."""
+        values = [0] * len(INVENTORY_FEATURES)
+        player = self._game.get_player()
+        if isinstance(player, a2.HoldingPlayer):
+            for item in player.get_inventory().get_items():
+                base = 0 if item.display() == GARLIC else 3
+                values[base] += 1
+                if item.is_active():
+                    values[base + 1] += 1
+                    values[base + 2] = max(values[base + 2],
+                                           item.get_lifetime())
+        self._features[:] = array.array("i", values)
@@ -0,0 +1,319 @@
+"""
+Support for playing games without a user interface, e.g. to simulate many
+games with an automated policy choosing the actions of the player.
+"""
+import random
+from typing import List, Optional, Tuple
+
+import a2_solution as a2
+from constants import *
+
+TOGGLE = "T"
+"""The first character of an action which toggles an item of the inventory."""
+
+MOVES = list(DIRECTIONS)
+FIRES = [FIRE + direction for direction in DIRECTIONS]
+
+WON = "won"
+INFECTED = "infected"
+TIMEOUT = "timeout"
+OUTCOMES = (WON, INFECTED, TIMEOUT)
+
+DEFAULT_MAX_STEPS = 200
+"""The default number of _step_ events after which a game is abandoned."""
+
+GameSummary = Tuple[str, int, Optional[str]]
+"""
+A GameSummary is the result of a headless game as an (outcome, steps, cause)
+tuple of one of OUTCOMES, the number of _step_ events played and the display
+character of the entity which infected the player, None if not infected.
+"""
+
+
+def apply_action(game: a2.AdvancedGame, action: str,
+                 step: bool = True) -> bool:
+    """
+    Perform an action in a game.
+
+    A direction moves the player and FIRE followed by a direction fires the
+    crossbow, see `AdvancedGame.fire`, both followed by the _step_ event.
+    TOGGLE followed by the index of an item in the inventory toggles whether
+    the item is active without triggering the _step_ event, as clicking the
+    inventory does in the graphical interface. Toggling an empty slot does
+    nothing.
+
+    Parameters:
+        game: The game being played.
+        action: The action to perform.
+        step: Whether to trigger the _step_ event, False to leave it to the
+              caller, e.g. to step many games together.
+
+    Returns:
+        True if the action triggers the _step_ event.
+
+    Examples:
+        >>> grid = a2.Grid(4)
+        >>> grid.add_entity(a2.Position(0, 0), a2.HoldingPlayer())
+        >>> grid.add_entity(a2.Position(1, 0), a2.Garlic())
+        >>> game = a2.AdvancedGame(grid)
+        >>> apply_action(game, RIGHT), apply_action(game, "T0")
+        (True, False)
+        >>> game.get_player().get_inventory().has_active(GARLIC)
+        True
+    """
+    if action.startswith(TOGGLE):
+        items = game.get_player().get_inventory().get_items()
+        index = int(action[1:])
+        if index < len(items):
+            items[index].toggle_active()
+        return False
+    if action.startswith(FIRE):
+        game.fire(action[1:])
+    else:
+        game.move_player(game.direction_to_offset(action))
+    if step:
+        game.step()
+    return True
+
+
+def is_action(action: object) -> bool:
+    """
+    Return true if an action can be performed by `apply_action`.
+
+    Examples:
+        >>> [is_action(action) for action in ("A", "FW", "T3", "T", "X")]
+        [True, True, True, False, False]
+    """
+    if not isinstance(action, str):
+        return False
+    if action.startswith(TOGGLE):
+        return action[1:].isdigit()
+    return action in MOVES or action in FIRES
+
+
+class MapTemplate:
+    """
+    A MapTemplate is a map file loaded once, from which any number of new
+    games can be created without reading and parsing the file again.
+
+    New games are forks of the loaded game, see `Game.fork`, so creating one
+    takes the same time for any size of map.
+    """
+
+    def __init__(self, filename: str, grid_type: type = a2.Grid):
+        """
+        Parameters:
+            filename: Path where the map file should be found.
+            grid_type: The Grid subclass used to store the entities.
+        """
+        self._filename = filename
+        self._game = a2.advanced_game(filename, grid_type)
+
+    def get_filename(self) -> str:
+        """Return the path of the map file of this template."""
+        return self._filename
+
+    def get_game(self) -> a2.AdvancedGame:
+        """
+        Return the game loaded from the map file, which new games are forked
+        from. Changing it changes every game created afterwards.
+        """
+        return self._game
+
+    def new_game(self, seed: int) -> a2.AdvancedGame:
+        """
+        Return a new game of the map whose random number generator starts
+        from the given seed.
+
+        Parameters:
+            seed: The seed of the game's random number generator.
+        """
+        game = self._game.fork()
+        game.get_rng().set_state((seed, -1, 0))
+        return game
+
+
+class Policy:
+    """
+    A Policy chooses the actions of the player in a headless game.
+
+    The Policy class is an abstract class, subclasses implement `choose`.
+    """
+
+    def reset(self, seed: int) -> None:
+        """
+        Prepare for a new game, seeding the randomness of the policy.
+
+        Parameters:
+            seed: The seed of the new game.
+        """
+        self._random = random.Random(seed)
+
+    def choose(self, game: a2.AdvancedGame) -> str:
+        """
+        Return the next action of the player, see `apply_action`.
+
+        Parameters:
+            game: The game being played.
+        """
+        raise NotImplementedError()
+
+
+class RandomWalk(Policy):
+    """A RandomWalk moves the player in a random direction every turn."""
+
+    def choose(self, game: a2.AdvancedGame) -> str:
+        return self._random.choice(MOVES)
+
+
+class Scripted(Policy):
+    """
+    A Scripted policy performs a fixed sequence of actions, starting again
+    from the first action after the last.
+
+    Examples:
+        >>> policy = Scripted([RIGHT, "T0", DOWN])
+        >>> policy.reset(0)
+        >>> [policy.choose(None) for _ in range(4)]
+        ['D', 'T0', 'S', 'D']
+    """
+
+    def __init__(self, actions: List[str]):
+        """
+        Parameters:
+            actions: The actions to perform, see `apply_action`.
+        """
+        if not actions:
+            raise ValueError("A script needs at least one action.")
+        self._actions = list(actions)
+        self._next = 0
+
+    def reset(self, seed: int) -> None:
+        super().reset(seed)
+        self._next = 0
+
+    def choose(self, game: a2.AdvancedGame) -> str:
+        action = self._actions[self._next]
+        self._next = (self._next + 1) % len(self._actions)
+        return action
+
+
+class Greedy(Policy):
+    """
+    A Greedy policy moves the player towards the nearest hospital, avoiding
+    cells next to zombies where it can.
+
+    It shoots zombies in line with the player when holding a crossbow and
+    keeps garlic active while a zombie is next to the player.
+    """
+
+    def choose(self, game: a2.AdvancedGame) -> str:
+        grid = game.get_grid()
+        player = grid.find_player()
+        inventory = game.get_player().get_inventory()
+
+        threats = _zombies_next_to(grid, player)
+        if threats and not inventory.has_active(GARLIC):
+            for index, item in enumerate(inventory.get_items()):
+                if item.display() == GARLIC:
+                    return f"{TOGGLE}{index}"
+
+        if inventory.contains(CROSSBOW):
+            for action in FIRES:
+                first = grid.first_in_direction(
+                    player, game.direction_to_offset(action[1:]))
+                if (first is not None and first[1].display() in ZOMBIES
+                        and first[0].distance(player) <= 2):
+                    return action
+
+        hospitals = grid.positions_of(HOSPITAL)
+        best: List[Tuple[int, float, str]] = []
+        for action in MOVES:
+            destination = player.add(game.direction_to_offset(action))
+            entity = grid.get_entity(destination)
+            if not grid.in_bounds(destination) or (
+                    entity is not None and entity.display() in ZOMBIES):
+                continue
+            distance = min((destination.distance(hospital)
+                            for hospital in hospitals), default=0)
+            danger = _zombies_next_to(grid, destination)
+            best.append((distance + 2 * danger, self._random.random(), action))
+        if not best:
+            return self._random.choice(MOVES)
+        return min(best)[2]
+
+
+def _zombies_next_to(grid: a2.Grid, position: a2.Position) -> int:
+    """Return the number of zombies next to a position."""
+    count = 0
+    for offset in a2.OFFSET_POSITIONS.values():
+        entity = grid.get_entity(position.add(offset))
+        if entity is not None and entity.display() in ZOMBIES:
+            count += 1
+    return count
+
+
+POLICIES = {
+    "random": RandomWalk,
+    "greedy": Greedy,
+}
+"""The policies which can be chosen by name, e.g. on a command line."""
+
+
+def finished(game: a2.AdvancedGame) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Return the (outcome, cause) of a game which has ended, see GameSummary,
+    or None if the game has not ended.
+
+    Parameters:
+        game: The game being played.
+    """
+    if game.has_won():
+        return WON, None
+    if game.has_lost():
+        player = game.get_player()
+        source = None
+        if isinstance(player, a2.VulnerablePlayer):
+            source = player.get_infected_by()
+        return INFECTED, None if source is None else source.display()
+    return None
+
+
+def play_game(game: a2.AdvancedGame, policy: Policy,
+              max_steps: int = DEFAULT_MAX_STEPS) -> GameSummary:
+    """
+    Play a game to the end with a policy choosing every action.
+
+    The policy must already be reset for the game. A game is abandoned once
+    max_steps _step_ events have been played, or after as many actions in a
+    row which do not trigger the _step_ event.
+
+    Examples:
+        >>> grid = a2.Grid(5)
+        >>> grid.add_entity(a2.Position(0, 0), a2.HoldingPlayer())
+        >>> grid.add_entity(a2.Position(4, 4), a2.Hospital())
+        >>> policy = Greedy()
+        >>> policy.reset(0)
+        >>> play_game(a2.AdvancedGame(grid), policy)
+        ('won', 8, None)
+
+    Parameters:
+        game: The game to play.
+        policy: The policy choosing the actions of the player.
+        max_steps: The number of _step_ events after which the game is
+                   abandoned.
+    """
+    steps = 0
+    idle = 0
+    while True:
+        result = finished(game)
+        if result is not None:
+            return result[0], steps, result[1]
+        if steps >= max_steps or idle >= max_steps:
+            return TIMEOUT, steps, None
+
+        if apply_action(game, policy.choose(game)):
+            steps += 1
+            idle = 0
+        else:
+            idle += 1
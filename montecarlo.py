@@ -0,0 +1,281 @@
+"""
+Estimates the probability that a policy wins a map by playing many seeded
+headless games across all processors.
+
+Run this module with a map file and a policy name, e.g.
+`python montecarlo.py maps/basic3.txt --policy greedy`, to print a JSON
+object with the estimate after every batch of games. Games stop once the
+confidence interval of the win rate is narrow enough.
+"""
+import argparse
+import collections
+import concurrent.futures
+import json
+import math
+import os
+import statistics
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import headless
+
+DEFAULT_MARGIN = 0.02
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_MAX_GAMES = 100000
+DEFAULT_BATCH = 200
+
+
+def wilson_interval(wins: int, games: int,
+                    confidence: float = DEFAULT_CONFIDENCE
+                    ) -> Tuple[float, float]:
+    """
+    Return the Wilson score interval of a win rate.
+
+    Examples:
+        >>> low, high = wilson_interval(50, 100)
+        >>> round(low, 3), round(high, 3)
+        (0.404, 0.596)
+        >>> wilson_interval(0, 0)
+        (0.0, 1.0)
+
+    Parameters:
+        wins: The number of games won.
+        games: The number of games played.
+        confidence: The probability that the interval holds the win rate.
+    """
+    if games == 0:
+        return 0.0, 1.0
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    rate = wins / games
+    denominator = 1 + z * z / games
+    centre = (rate + z * z / (2 * games)) / denominator
+    spread = z * math.sqrt(rate * (1 - rate) / games
+                           + z * z / (4 * games * games)) / denominator
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+class Estimate:
+    """
+    An Estimate accumulates the summaries of games played by a policy on a
+    map, see `headless.GameSummary`.
+
+    Examples:
+        >>> estimate = Estimate()
+        >>> estimate.add([("won", 10, None), ("won", 14, None),
+        ...               ("infected", 3, "T"), ("timeout", 200, None)])
+        >>> estimate.get_games(), estimate.get_win_rate()
+        (4, 0.5)
+        >>> estimate.get_mean_steps_to_win(), estimate.get_causes()
+        (12.0, {'T': 1})
+    """
+
+    def __init__(self):
+        self._games = 0
+        self._outcomes = {outcome: 0 for outcome in headless.OUTCOMES}
+        self._win_steps = 0
+        self._causes: Dict[str, int] = {}
+
+    def add(self, summaries: List[headless.GameSummary]) -> None:
+        """
+        Add the summaries of played games to the estimate.
+
+        Parameters:
+            summaries: The summaries of the games.
+        """
+        for outcome, steps, cause in summaries:
+            self._games += 1
+            self._outcomes[outcome] += 1
+            if outcome == headless.WON:
+                self._win_steps += steps
+            elif cause is not None:
+                self._causes[cause] = self._causes.get(cause, 0) + 1
+
+    def merge(self, other: 'Estimate') -> None:
+        """
+        Add the games of another estimate of the same map and policy.
+
+        Parameters:
+            other: The estimate to add.
+        """
+        self._games += other._games
+        for outcome, count in other._outcomes.items():
+            self._outcomes[outcome] += count
+        self._win_steps += other._win_steps
+        for cause, count in other._causes.items():
+            self._causes[cause] = self._causes.get(cause, 0) + count
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Estimate':
+        """
+        Return the estimate of a dictionary returned by `to_dict`.
+
+        Examples:
+            >>> estimate = Estimate()
+            >>> estimate.add([("won", 9, None), ("infected", 3, "Z")])
+            >>> copy = Estimate.from_dict(estimate.to_dict())
+            >>> copy.merge(estimate)
+            >>> copy.get_games(), copy.get_mean_steps_to_win()
+            (4, 9.0)
+
+        Parameters:
+            data: The dictionary of the estimate.
+        """
+        estimate = cls()
+        estimate._games = data["games"]
+        estimate._outcomes.update(data["outcomes"])
+        estimate._win_steps = data["win_steps"]
+        estimate._causes = dict(data["causes"])
+        return estimate
+
+    def get_games(self) -> int:
+        """Return the number of games played."""
+        return self._games
+
+    def get_win_rate(self) -> float:
+        """Return the fraction of the games played which were won."""
+        return self._outcomes[headless.WON] / max(self._games, 1)
+
+    def get_interval(self, confidence: float = DEFAULT_CONFIDENCE
+                     ) -> Tuple[float, float]:
+        """
+        Return the confidence interval of the win rate, see
+        `wilson_interval`.
+        """
+        return wilson_interval(self._outcomes[headless.WON], self._games,
+                               confidence)
+
+    def get_mean_steps_to_win(self) -> Optional[float]:
+        """Return the mean steps of the games won, None if none were won."""
+        wins = self._outcomes[headless.WON]
+        return self._win_steps / wins if wins else None
+
+    def get_causes(self) -> Dict[str, int]:
+        """
+        Return the number of games lost to each type of zombie, by display
+        character.
+        """
+        return dict(self._causes)
+
+    def to_dict(self, confidence: float = DEFAULT_CONFIDENCE) -> Dict:
+        """Return the estimate as a dictionary which can be written as JSON."""
+        low, high = self.get_interval(confidence)
+        return {"games": self._games, "win_rate": self.get_win_rate(),
+                "interval": [low, high], "confidence": confidence,
+                "mean_steps_to_win": self.get_mean_steps_to_win(),
+                "win_steps": self._win_steps,
+                "outcomes": dict(self._outcomes), "causes": self.get_causes()}
+
+
+# The map and policy of a worker process, loaded once by _start_worker.
+_template: Optional[headless.MapTemplate] = None
+_policy: Optional[headless.Policy] = None
+_max_steps = headless.DEFAULT_MAX_STEPS
+
+
+def _start_worker(filename: str, policy: str, max_steps: int) -> None:
+    """Load the map and policy of a worker process."""
+    global _template, _policy, _max_steps
+    _template = headless.MapTemplate(filename)
+    _policy = headless.POLICIES[policy]()
+    _max_steps = max_steps
+
+
+def _play_seeds(start: int, stop: int) -> List[headless.GameSummary]:
+    """Play the games with the seeds in range(start, stop) in a worker."""
+    summaries = []
+    for seed in range(start, stop):
+        _policy.reset(seed)
+        summaries.append(headless.play_game(_template.new_game(seed), _policy,
+                                            _max_steps))
+    return summaries
+
+
+def estimate(filename: str, policy: str, margin: float = DEFAULT_MARGIN,
+             confidence: float = DEFAULT_CONFIDENCE,
+             max_games: int = DEFAULT_MAX_GAMES, batch: int = DEFAULT_BATCH,
+             seed: int = 0, workers: Optional[int] = None,
+             max_steps: int = headless.DEFAULT_MAX_STEPS
+             ) -> Iterator[Estimate]:
+    """
+    Estimate the probability that a policy wins a map, yielding the estimate
+    after each batch of games.
+
+    Game i is played with seed + i. Batches are played by a pool of worker
+    processes, each of which loads the map once, and are added to the
+    estimate in the order of their seeds. The estimate stops after the
+    first batch which leaves half the width of the confidence interval at
+    most the margin, or after max_games games. The estimates yielded
+    therefore only depend on the arguments, not on the number of workers
+    or on which worker finishes first. Each estimate yielded is a copy,
+    which the later batches do not change.
+
+    Parameters:
+        filename: Path where the map file should be found.
+        policy: The name of the policy, a key of `headless.POLICIES`.
+        margin: The greatest accepted half width of the interval.
+        confidence: The probability that the interval holds the win rate.
+        max_games: The greatest number of games to play.
+        batch: The number of games sent to a worker at a time.
+        seed: The seed of the first game.
+        workers: The number of processes, None for one per processor.
+        max_steps: The number of _step_ events after which a game is lost.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    result = Estimate()
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_start_worker,
+            initargs=(filename, policy, max_steps)) as executor:
+        in_flight = 2 * workers
+        started = 0
+        # The batches submitted but not yet added, in the order of seeds.
+        pending: Deque[concurrent.futures.Future] = collections.deque()
+        while True:
+            while len(pending) < in_flight and started < max_games:
+                count = min(batch, max_games - started)
+                pending.append(executor.submit(_play_seeds, seed + started,
+                                               seed + started + count))
+                started += count
+            if not pending:
+                break
+
+            result.add(pending.popleft().result())
+            yield Estimate.from_dict(result.to_dict())
+
+            low, high = result.get_interval(confidence)
+            if (high - low) / 2 <= margin:
+                for future in pending:
+                    future.cancel()
+                break
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    """Print the estimates for the map and policy given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("map", help="path of the map file")
+    parser.add_argument("--policy", choices=sorted(headless.POLICIES),
+                        default="greedy", help="policy playing the games")
+    parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN,
+                        help="greatest half width of the confidence interval")
+    parser.add_argument("--confidence", type=float,
+                        default=DEFAULT_CONFIDENCE,
+                        help="confidence level of the interval")
+    parser.add_argument("--max-games", type=int, default=DEFAULT_MAX_GAMES,
+                        help="greatest number of games to play")
+    parser.add_argument("--max-steps", type=int,
+                        default=headless.DEFAULT_MAX_STEPS,
+                        help="steps after which a game is abandoned")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes, one per processor if "
+                             "not given")
+    args = parser.parse_args(arguments)
+
+    for result in estimate(args.map, args.policy, args.margin,
+                           args.confidence, args.max_games, seed=args.seed,
+                           workers=args.workers, max_steps=args.max_steps):
+        print(json.dumps(result.to_dict(args.confidence)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
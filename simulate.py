@@ -0,0 +1,386 @@
+"""
+Plays large batches of headless games across all processors and stores one
+row per game in a compact columnar result file.
+
+Run this module with a map file to play a batch and report its throughput,
+e.g. `python simulate.py maps/basic3.txt --games 100000 --output out.zip`.
+"""
+import argparse
+import array
+import concurrent.futures
+import json
+import math
+import os
+import sys
+import time
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+import headless
+
+DEFAULT_GAMES = 10000
+DEFAULT_SHARD = 500
+"""The greatest number of games sent to a worker process at a time."""
+
+
+def typecode(signed: bool, itemsize: int) -> str:
+    """
+    Return an array typecode whose values are integers of a fixed number of
+    bytes, whatever the size of the C types on this platform.
+
+    Examples:
+        >>> typecode(False, 1), array.array(typecode(True, 8)).itemsize
+        ('B', 8)
+
+    Parameters:
+        signed: Whether the integers are signed.
+        itemsize: The number of bytes of each integer.
+
+    Raises:
+        ValueError: If no typecode has items of that size.
+    """
+    for code in ("bhilq" if signed else "BHILQ"):
+        if array.array(code).itemsize == itemsize:
+            return code
+    raise ValueError(f"No array typecode has {itemsize} byte items.")
+
+
+COLUMNS = (("seed", typecode(True, 8)), ("outcome", typecode(False, 1)),
+           ("steps", typecode(False, 4)), ("cause", typecode(False, 1)))
+"""
+The (name, array typecode) of each column of a result, one row per game,
+with 8, 1, 4 and 1 byte values:
+
+* seed: The seed of the game.
+* outcome: The index of the outcome of the game in `headless.OUTCOMES`.
+* steps: The number of _step_ events played.
+* cause: The display character code of the entity which infected the
+  player, 0 if the player was not infected.
+"""
+
+Columns = Dict[str, array.array]
+"""Columns maps the name of each of the COLUMNS to its values."""
+
+
+def new_columns() -> Columns:
+    """Return empty columns."""
+    return {name: array.array(typecode) for name, typecode in COLUMNS}
+
+
+class SimulationResult:
+    """
+    A SimulationResult holds the summaries of a batch of games as columns,
+    with the time taken to play them.
+
+    Examples:
+        >>> columns = new_columns()
+        >>> columns["seed"].extend([0, 1])
+        >>> columns["outcome"].extend([0, 1])
+        >>> columns["steps"].extend([12, 7])
+        >>> columns["cause"].extend([0, ord("Z")])
+        >>> result = SimulationResult("basic.txt", "Greedy", columns, 0.5)
+        >>> result.get_games(), result.get_ticks(), result.ticks_per_second()
+        (2, 19, 38.0)
+        >>> result.get_summary(1)
+        ('infected', 7, 'Z')
+    """
+
+    def __init__(self, filename: str, policy: str, columns: Columns,
+                 elapsed: float):
+        """
+        Parameters:
+            filename: Path of the map the games were played on.
+            policy: The name of the policy which played the games.
+            columns: The columns of the result, see COLUMNS.
+            elapsed: The number of seconds taken to play the games.
+        """
+        self._filename = filename
+        self._policy = policy
+        self._columns = columns
+        self._elapsed = elapsed
+
+    def get_filename(self) -> str:
+        """Return the path of the map the games were played on."""
+        return self._filename
+
+    def get_policy(self) -> str:
+        """Return the name of the policy which played the games."""
+        return self._policy
+
+    def get_column(self, name: str) -> array.array:
+        """
+        Return a column of the result, see COLUMNS.
+
+        Parameters:
+            name: The name of the column.
+        """
+        return self._columns[name]
+
+    def get_elapsed(self) -> float:
+        """Return the number of seconds taken to play the games."""
+        return self._elapsed
+
+    def get_games(self) -> int:
+        """Return the number of games played."""
+        return len(self._columns["seed"])
+
+    def get_ticks(self) -> int:
+        """Return the number of _step_ events played across all games."""
+        return sum(self._columns["steps"])
+
+    def games_per_second(self) -> float:
+        """Return the number of games played per second."""
+        return self.get_games() / self._elapsed if self._elapsed else 0.0
+
+    def ticks_per_second(self) -> float:
+        """Return the number of _step_ events played per second."""
+        return self.get_ticks() / self._elapsed if self._elapsed else 0.0
+
+    def get_summary(self, row: int) -> headless.GameSummary:
+        """
+        Return the summary of one game.
+
+        Parameters:
+            row: The row of the game in the columns.
+        """
+        cause = self._columns["cause"][row]
+        return (headless.OUTCOMES[self._columns["outcome"][row]],
+                self._columns["steps"][row], chr(cause) if cause else None)
+
+    def get_outcomes(self) -> Dict[str, int]:
+        """Return the number of games with each outcome."""
+        counts = [0] * len(headless.OUTCOMES)
+        for outcome in self._columns["outcome"]:
+            counts[outcome] += 1
+        return dict(zip(headless.OUTCOMES, counts))
+
+    def to_dict(self) -> Dict:
+        """Return the totals of the result as a dictionary."""
+        return {"map": self._filename, "policy": self._policy,
+                "games": self.get_games(), "ticks": self.get_ticks(),
+                "elapsed": self._elapsed,
+                "games_per_second": self.games_per_second(),
+                "ticks_per_second": self.ticks_per_second(),
+                "outcomes": self.get_outcomes()}
+
+    def save(self, filename: str) -> None:
+        """
+        Write the result to a zip file holding each column as raw little
+        endian values, and the totals, column types, item sizes and byte
+        order in meta.json.
+
+        Parameters:
+            filename: Path of the file to write.
+        """
+        meta = self.to_dict()
+        meta["columns"] = dict(COLUMNS)
+        meta["itemsizes"] = {name: array.array(code).itemsize
+                             for name, code in COLUMNS}
+        meta["byteorder"] = "little"
+        with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("meta.json", json.dumps(meta))
+            for name, _ in COLUMNS:
+                values = self._columns[name]
+                if sys.byteorder == "big":
+                    values = array.array(values.typecode, values)
+                    values.byteswap()
+                archive.writestr(f"{name}.bin", values.tobytes())
+
+
+def load_result(filename: str) -> SimulationResult:
+    """
+    Read a result written by `SimulationResult.save`.
+
+    Each column is read with the typecode of this platform whose items have
+    the size recorded in the file, which need not be the typecode it was
+    written with.
+
+    Examples:
+        >>> import io
+        >>> columns = new_columns()
+        >>> columns["seed"].extend([0, 1])
+        >>> columns["outcome"].extend([0, 1])
+        >>> columns["steps"].extend([12, 70000])
+        >>> columns["cause"].extend([0, ord("Z")])
+        >>> buffer = io.BytesIO()
+        >>> SimulationResult("basic.txt", "Greedy", columns, 0.5).save(buffer)
+        >>> steps = load_result(buffer).get_column("steps")
+        >>> list(steps), steps.itemsize
+        ([12, 70000], 4)
+
+    Parameters:
+        filename: Path of the file to read.
+
+    Raises:
+        ValueError: If the file does not record the item sizes and byte
+                    order of its columns, or they cannot be read here.
+    """
+    with zipfile.ZipFile(filename) as archive:
+        meta = json.loads(archive.read("meta.json"))
+        itemsizes = meta.get("itemsizes")
+        if itemsizes is None or meta.get("byteorder") != "little":
+            raise ValueError(f"{filename} does not record little endian "
+                             f"columns with their item sizes.")
+        columns = {}
+        for name, code in meta["columns"].items():
+            values = array.array(typecode(code.islower(), itemsizes[name]))
+            values.frombytes(archive.read(f"{name}.bin"))
+            if sys.byteorder == "big":
+                values.byteswap()
+            columns[name] = values
+    return SimulationResult(meta["map"], meta["policy"], columns,
+                            meta["elapsed"])
+
+
+# The maps loaded by a worker process, by path and modification time.
+_templates: Dict[Tuple[str, float], headless.MapTemplate] = {}
+
+
+def _warm_up(worker: int) -> int:
+    """Do nothing, so that starting a worker process can be waited for."""
+    return worker
+
+
+def _play_shard(filename: str, policy: headless.Policy, start: int, stop: int,
+                max_steps: int) -> Columns:
+    """Play the games with the seeds in range(start, stop) in a worker."""
+    key = (filename, os.path.getmtime(filename))
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = headless.MapTemplate(filename)
+
+    columns = new_columns()
+    seeds, outcomes = columns["seed"], columns["outcome"]
+    steps, causes = columns["steps"], columns["cause"]
+    codes = {outcome: code for code, outcome in enumerate(headless.OUTCOMES)}
+    for seed in range(start, stop):
+        policy.reset(seed)
+        outcome, played, cause = headless.play_game(template.new_game(seed),
+                                                    policy, max_steps)
+        seeds.append(seed)
+        outcomes.append(codes[outcome])
+        steps.append(played)
+        causes.append(0 if cause is None else ord(cause))
+    return columns
+
+
+class Simulator:
+    """
+    A Simulator keeps a pool of worker processes which play batches of
+    games, split into shards of consecutive seeds.
+
+    The processes are started when the simulator is created and each keeps
+    the maps it has loaded, so later batches start playing at once.
+    Simulators should be closed, e.g. with a with statement.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Parameters:
+            workers: The number of processes, None for one per processor.
+        """
+        self._workers = workers or os.cpu_count() or 1
+        self._executor = concurrent.futures.ProcessPoolExecutor(self._workers)
+        list(self._executor.map(_warm_up, range(self._workers)))
+
+    def get_workers(self) -> int:
+        """Return the number of worker processes."""
+        return self._workers
+
+    def run(self, filename: str, policy: headless.Policy, games: int,
+            seed: int = 0, shard: Optional[int] = None,
+            max_steps: int = headless.DEFAULT_MAX_STEPS) -> SimulationResult:
+        """
+        Play a batch of games, game i with seed + i, and return their
+        summaries in order of seed.
+
+        Parameters:
+            filename: Path where the map file should be found.
+            policy: The policy playing every game, copied to the workers.
+            games: The number of games to play.
+            seed: The seed of the first game.
+            shard: The number of games sent to a worker at a time, None to
+                   give each worker about four shards, at most DEFAULT_SHARD.
+            max_steps: The number of _step_ events after which a game is
+                       abandoned.
+        """
+        if shard is None:
+            shard = min(DEFAULT_SHARD,
+                        max(1, math.ceil(games / (4 * self._workers))))
+        start = time.perf_counter()
+        futures = [self._executor.submit(_play_shard, filename, policy, first,
+                                         min(first + shard, seed + games),
+                                         max_steps)
+                   for first in range(seed, seed + games, shard)]
+        columns = new_columns()
+        for future in futures:
+            for name, values in future.result().items():
+                columns[name].extend(values)
+        elapsed = time.perf_counter() - start
+        return SimulationResult(filename, type(policy).__name__, columns,
+                                elapsed)
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._executor.shutdown()
+
+    def __enter__(self) -> 'Simulator':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    """Play the batch of games given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("map", help="path of the map file")
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES,
+                        help="number of games to play")
+    parser.add_argument("--policy", choices=sorted(headless.POLICIES),
+                        default="greedy", help="policy playing the games")
+    parser.add_argument("--script", default=None,
+                        help="space separated actions to play in a loop "
+                             "instead of a policy, e.g. 'D D S FD T0'")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game")
+    parser.add_argument("--max-steps", type=int,
+                        default=headless.DEFAULT_MAX_STEPS,
+                        help="steps after which a game is abandoned")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes, one per processor if "
+                             "not given")
+    parser.add_argument("--shard", type=int, default=None,
+                        help="number of games sent to a process at a time")
+    parser.add_argument("--output", default=None,
+                        help="path of the result file to write")
+    parser.add_argument("--json", action="store_true",
+                        help="print the totals as a JSON object")
+    args = parser.parse_args(arguments)
+
+    if args.script is not None:
+        policy = headless.Scripted(args.script.split())
+    else:
+        policy = headless.POLICIES[args.policy]()
+
+    with Simulator(args.workers) as simulator:
+        result = simulator.run(args.map, policy, args.games, args.seed,
+                               args.shard, args.max_steps)
+    if args.output is not None:
+        result.save(args.output)
+
+    if args.json:
+        print(json.dumps(result.to_dict()))
+        return
+    print(f"{result.get_games()} games and {result.get_ticks()} ticks in "
+          f"{result.get_elapsed():.2f}s with {simulator.get_workers()} "
+          f"processes")
+    print(f"{result.games_per_second():.0f} games/s, "
+          f"{result.ticks_per_second():.0f} ticks/s "
+          f"({result.ticks_per_second() * 60 / 1e6:.2f}M ticks/min)")
+    print(", ".join(f"{outcome}: {count}"
+                    for outcome, count in result.get_outcomes().items()))
+
+
+if __name__ == "__main__":
+    main()
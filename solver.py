@@ -0,0 +1,276 @@
+"""
+A headless solver which searches for the shortest sequence of actions that
+wins a map.
+
+Run this module with the path of a map file to print the solution, e.g.
+`python solver.py maps/basic3.txt`.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import tracemalloc
+from typing import List, Optional
+
+import a2_solution as a2
+from constants import *
+from headless import TOGGLE, MOVES, FIRES, apply_action
+
+DEFAULT_MAX_NODES = 1000000
+DEFAULT_MAX_MEMORY = 1024 * 1024 * 1024
+
+
+class StaticZombie(a2.Zombie):
+    """
+    A StaticZombie stands in for a randomly moving zombie while solving.
+
+    It never moves but infects the player whenever the player is next to it.
+    This is an approximation, not the worst case: a moving zombie can reach
+    cells a StaticZombie never threatens, so a solution found against it is
+    not guaranteed to win against the random zombies of the map.
+    """
+
+    __slots__ = ()
+
+    def step(self, position: a2.Position, game: a2.Game) -> None:
+        """
+        Infect the player if the player is next to this zombie.
+
+        Parameters:
+            position: The position of this zombie when the _step_ event
+                      is triggered.
+            game: The current game being played.
+        """
+        grid = game.get_grid()
+        for offset in a2.OFFSET_POSITIONS.values():
+            entity = grid.get_entity(position.add(offset))
+            if isinstance(entity, a2.VulnerablePlayer):
+                entity.infect(self)
+                return
+
+
+class SearchLimitError(Exception):
+    """Raised when the search stops at its node or memory limit."""
+
+
+class Solution:
+    """A Solution is the shortest sequence of actions which wins a map."""
+
+    def __init__(self, actions: List[str], steps: int, expanded: int):
+        """
+        Parameters:
+            actions: The actions to perform, see `apply_action`.
+            steps: The number of _step_ events triggered by the actions.
+            expanded: The number of states expanded by the search.
+        """
+        self._actions = actions
+        self._steps = steps
+        self._expanded = expanded
+
+    def get_actions(self) -> List[str]:
+        """Return the actions to perform, see `apply_action`."""
+        return self._actions[:]
+
+    def get_steps(self) -> int:
+        """Return the number of _step_ events triggered by the actions."""
+        return self._steps
+
+    def get_expanded(self) -> int:
+        """Return the number of states expanded by the search."""
+        return self._expanded
+
+
+def load_game(filename: str) -> a2.AdvancedGame:
+    """
+    Load a map with the AdvancedMapLoader for solving.
+
+    Randomly moving zombies are replaced with StaticZombies, tracking
+    zombies move deterministically and are kept.
+
+    Parameters:
+        filename: Path where the map file should be found.
+    """
+    grid = a2.AdvancedMapLoader().load(filename)
+    for position, entity in grid.get_mapping().items():
+        if type(entity) is a2.Zombie:
+            grid.add_entity(position, StaticZombie())
+    return a2.AdvancedGame(grid)
+
+
+def heuristic(game: a2.AdvancedGame) -> int:
+    """
+    Return the manhattan distance from the player to the nearest hospital,
+    which never overestimates the number of steps needed to win.
+    """
+    player = game.get_grid().find_player()
+    if player is None:
+        return 0
+    return min((player.distance(hospital)
+                for hospital in game.get_grid().positions_of(HOSPITAL)),
+               default=0)
+
+
+def state_key(game: a2.AdvancedGame) -> int:
+    """
+    Return the key of a game in the transposition table, the Zobrist hash of
+    its grid and player without the number of steps, see `Game.state_hash`.
+    """
+    player = game.get_player()
+    key = game.get_grid().get_hash()
+    if player is not None:
+        key ^= player.state_hash()
+    return key
+
+
+def _actions(game: a2.AdvancedGame) -> List[str]:
+    """Return the actions worth trying in a game."""
+    actions = MOVES[:]
+    inventory = game.get_player().get_inventory()
+    items = inventory.get_items()
+    if inventory.contains(CROSSBOW):
+        grid = game.get_grid()
+        start = grid.find_player()
+        for action in FIRES:
+            first = grid.first_in_direction(
+                start, game.direction_to_offset(action[1:]))
+            if first is not None and first[1].display() in ZOMBIES:
+                actions.append(action)
+    actions.extend(f"{TOGGLE}{index}" for index in range(len(items)))
+    return actions
+
+
+def _node_size(game: a2.AdvancedGame) -> int:
+    """
+    Return the approximate number of bytes used by a stored state.
+
+    Memory is traced only while measuring, unless it was already traced by
+    the caller, in which case tracing is left running.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    child = game.fork()
+    child.move_player(child.direction_to_offset(UP))
+    child.step()
+    used = tracemalloc.get_traced_memory()[0] - before
+    if started:
+        tracemalloc.stop()
+    return max(used, 1)
+
+
+def solve(game: a2.AdvancedGame, max_nodes: int = DEFAULT_MAX_NODES,
+          max_memory: int = DEFAULT_MAX_MEMORY) -> Optional[Solution]:
+    """
+    Search for the shortest sequence of actions which wins a game with A*.
+
+    States are compared with a transposition table keyed by `state_key` so
+    that every state is expanded at most once. Toggling an item takes no
+    step, every other action takes one.
+
+    Parameters:
+        game: The game to solve, e.g. from `load_game`. It is not changed.
+        max_nodes: The greatest number of states to expand.
+        max_memory: The greatest number of bytes to use for stored states,
+                    estimated from the size of one state.
+
+    Returns:
+        The shortest solution, or None if the game cannot be won.
+
+    Raises:
+        SearchLimitError: If a limit is reached before the search ends.
+
+    Examples:
+        >>> grid = a2.Grid(5)
+        >>> grid.add_entity(a2.Position(0, 2), a2.HoldingPlayer())
+        >>> grid.add_entity(a2.Position(4, 2), a2.Hospital())
+        >>> grid.add_entity(a2.Position(2, 2), StaticZombie())
+        >>> solution = solve(a2.AdvancedGame(grid))
+        >>> solution.get_steps(), solution.get_actions()
+        (8, ['W', 'D', 'W', 'D', 'D', 'S', 'D', 'S'])
+        >>> grid.add_entity(a2.Position(0, 3), a2.Crossbow())
+        >>> solution = solve(a2.AdvancedGame(grid))
+        >>> solution.get_steps(), solution.get_actions()
+        (7, ['S', 'W', 'FD', 'D', 'D', 'D', 'D'])
+    """
+    max_stored = max_memory // _node_size(game)
+    start = game.fork()
+    counter = itertools.count()
+    # Entries are (f, h, tie breaker, g, game, path) where the path is a
+    # linked list of (action, previous path) pairs.
+    frontier = [(heuristic(start), heuristic(start), next(counter), 0, start,
+                 None)]
+    best = {state_key(start): 0}
+    expanded = 0
+    while frontier:
+        _, _, _, steps, node, path = heapq.heappop(frontier)
+        if best.get(state_key(node), steps) < steps:
+            continue
+        if node.has_won():
+            actions = []
+            while path is not None:
+                action, path = path
+                actions.append(action)
+            return Solution(actions[::-1], steps, expanded)
+
+        expanded += 1
+        if expanded > max_nodes:
+            raise SearchLimitError(f"Expanded more than {max_nodes} states.")
+        if len(frontier) > max_stored:
+            raise SearchLimitError(
+                f"Stored more than {max_memory} bytes of states.")
+
+        for action in _actions(node):
+            child = node.fork()
+            cost = steps + apply_action(child, action)
+            if child.has_lost() and not child.has_won():
+                continue
+            key = state_key(child)
+            if best.get(key, cost + 1) <= cost:
+                continue
+            best[key] = cost
+            estimate = heuristic(child)
+            heapq.heappush(frontier, (cost + estimate, estimate, next(counter),
+                                      cost, child, (action, path)))
+    return None
+
+
+def main() -> None:
+    """Solve the map given on the command line and print the solution."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("map", help="path of the map file to solve")
+    parser.add_argument("--max-nodes", type=int, default=DEFAULT_MAX_NODES,
+                        help="greatest number of states to expand")
+    parser.add_argument("--max-memory", type=int,
+                        default=DEFAULT_MAX_MEMORY // (1024 * 1024),
+                        help="greatest memory for stored states, in MiB")
+    parser.add_argument("--json", action="store_true",
+                        help="print the result as a JSON object")
+    args = parser.parse_args()
+
+    try:
+        solution = solve(load_game(args.map), args.max_nodes,
+                         args.max_memory * 1024 * 1024)
+    except SearchLimitError as error:
+        result = {"map": args.map, "solved": False, "error": str(error)}
+    else:
+        result = {"map": args.map, "solved": solution is not None}
+        if solution is not None:
+            result.update(steps=solution.get_steps(),
+                          actions=solution.get_actions(),
+                          expanded=solution.get_expanded())
+
+    if args.json:
+        print(json.dumps(result))
+    elif "error" in result:
+        print(f"No solution found: {result['error']}")
+    elif not result["solved"]:
+        print("The map cannot be won.")
+    else:
+        print(f"Solved in {result['steps']} steps "
+              f"({result['expanded']} states expanded):")
+        print(" ".join(result["actions"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Sweeps the balance parameters of a map, playing seeded headless games for
+every combination of parameters and caching the results on disk.
+
+Run this module with a map file and lists of parameter values, e.g.
+`python sweep.py maps/basic3.txt --garlic 5 10 --zombies 0 2 4`, to print a
+table with the win rate of every combination.
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import a2_solution as a2
+from constants import *
+import headless
+from montecarlo import Estimate
+
+CACHE_FILE = ".sweep_cache.json"
+"""Name of the cache file written to the current directory by default."""
+
+CACHE_VERSION = 1
+"""Version of the game rules and policies, changing it invalidates caches."""
+
+BLOCK_SIZE = 100
+"""
+Seeds are played and cached in blocks of this many seeds, aligned to its
+multiples, so sweeps over overlapping seed ranges share blocks.
+"""
+
+PARAMETERS = ("garlic", "crossbow", "zombies", "tracking_zombies", "max_steps")
+
+Point = Tuple[int, int, int, int, int]
+"""
+A Point is one combination of the PARAMETERS as a (garlic, crossbow,
+zombies, tracking_zombies, max_steps) tuple of the lifetimes of garlic and
+crossbows, the number of zombies and tracking zombies added to the map and
+the number of _step_ events after which a game is abandoned.
+"""
+
+
+def parameter_grid(garlic: Iterable[int] = (LIFETIMES[GARLIC],),
+                   crossbow: Iterable[int] = (LIFETIMES[CROSSBOW],),
+                   zombies: Iterable[int] = (0,),
+                   tracking_zombies: Iterable[int] = (0,),
+                   max_steps: Iterable[int] = (headless.DEFAULT_MAX_STEPS,)
+                   ) -> List[Point]:
+    """
+    Return every combination of the given parameter values.
+
+    Examples:
+        >>> for point in parameter_grid(garlic=[5, 10], zombies=[1, 2]):
+        ...     print(point)
+        (5, 5, 1, 0, 200)
+        (5, 5, 2, 0, 200)
+        (10, 5, 1, 0, 200)
+        (10, 5, 2, 0, 200)
+    """
+    return list(itertools.product(garlic, crossbow, zombies, tracking_zombies,
+                                  max_steps))
+
+
+def configure(game: a2.AdvancedGame, point: Point, seed: int) -> None:
+    """
+    Apply the parameters of a point to a new game.
+
+    Every pickup in the grid is given the lifetimes of the point and the
+    zombies of the point are added to randomly chosen empty cells which are
+    not next to the player, as many as fit.
+
+    Examples:
+        >>> grid = a2.Grid(3)
+        >>> grid.add_entity(a2.Position(0, 0), a2.HoldingPlayer())
+        >>> grid.add_entity(a2.Position(2, 2), a2.Garlic())
+        >>> game = a2.AdvancedGame(grid)
+        >>> configure(game, (3, 5, 2, 1, 200), seed=0)
+        >>> for entity in sorted(map(repr, grid.get_mapping().values())):
+        ...     print(entity)
+        Garlic(3)
+        HoldingPlayer()
+        TrackingZombie()
+        Zombie()
+        Zombie()
+
+    Parameters:
+        game: The game to change, e.g. from `headless.MapTemplate.new_game`.
+        point: The parameters to apply.
+        seed: The seed choosing the cells of the added zombies.
+    """
+    garlic, crossbow, zombies, tracking_zombies, _ = point
+    lifetimes = {GARLIC: garlic, CROSSBOW: crossbow}
+    grid = game.get_grid()
+    mapping = grid.get_mapping()
+    for position, entity in mapping.items():
+        if isinstance(entity, a2.Pickup):
+            item = entity.copy()
+            item.set_lifetime(lifetimes[entity.display()])
+            grid.add_entity(position, item)
+
+    if zombies + tracking_zombies == 0:
+        return
+    player = grid.find_player()
+    size = grid.get_size()
+    empty = [grid.get_position(x, y) for y in range(size) for x in range(size)
+             if grid.get_position(x, y) not in mapping
+             and (player is None
+                  or grid.get_position(x, y).distance(player) > 1)]
+    chosen = random.Random(seed).sample(
+        empty, min(zombies + tracking_zombies, len(empty)))
+    for index, position in enumerate(chosen):
+        grid.add_entity(position, a2.flyweight(
+            a2.Zombie if index < zombies else a2.TrackingZombie))
+
+
+def seed_blocks(seed: int, games: int) -> List[Tuple[int, int]]:
+    """
+    Return the (start, stop) seed ranges covering the given games, split at
+    multiples of BLOCK_SIZE.
+
+    Examples:
+        >>> seed_blocks(50, 200)
+        [(50, 100), (100, 200), (200, 250)]
+    """
+    blocks = []
+    start = seed
+    while start < seed + games:
+        stop = min((start // BLOCK_SIZE + 1) * BLOCK_SIZE, seed + games)
+        blocks.append((start, stop))
+        start = stop
+    return blocks
+
+
+def cache_key(map_hash: str, policy: str, point: Point,
+              block: Tuple[int, int]) -> str:
+    """
+    Return the key of the results of a block of seeds in the cache.
+
+    Examples:
+        >>> cache_key("ab12", "greedy", (10, 5, 0, 0, 200), (0, 100))
+        'ab12:greedy:10,5,0,0,200:0-100'
+    """
+    return (f"{map_hash}:{policy}:{','.join(map(str, point))}:"
+            f"{block[0]}-{block[1]}")
+
+
+def load_cache(filename: str) -> Dict[str, Dict]:
+    """
+    Return the estimates cached in a file by `cache_key`, or an empty cache
+    if the file is missing, unreadable or from other game rules.
+
+    Parameters:
+        filename: Path of the cache file.
+    """
+    try:
+        with open(filename) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("estimates", {})
+
+
+def save_cache(filename: str, estimates: Dict[str, Dict]) -> None:
+    """
+    Write the estimates cached by `cache_key` to a file.
+
+    Parameters:
+        filename: Path of the cache file.
+        estimates: The estimates by key, see `Estimate.to_dict`.
+    """
+    with open(filename, "w") as cache_file:
+        json.dump({"version": CACHE_VERSION, "estimates": estimates},
+                  cache_file)
+
+
+# The maps loaded by a worker process, by path.
+_templates: Dict[str, headless.MapTemplate] = {}
+
+
+def _play_block(filename: str, policy: str, point: Point, start: int,
+                stop: int) -> Estimate:
+    """Play the games of a point with the seeds in range(start, stop)."""
+    template = _templates.get(filename)
+    if template is None:
+        template = _templates[filename] = headless.MapTemplate(filename)
+    player = headless.POLICIES[policy]()
+    result = Estimate()
+    for seed in range(start, stop):
+        game = template.new_game(seed)
+        configure(game, point, seed)
+        player.reset(seed)
+        result.add([headless.play_game(game, player, point[-1])])
+    return result
+
+
+def sweep(filename: str, points: List[Point], policy: str = "greedy",
+          games: int = 1000, seed: int = 0, workers: Optional[int] = None,
+          cache_file: Optional[str] = CACHE_FILE
+          ) -> List[Tuple[Point, Estimate]]:
+    """
+    Play games with the seeds in range(seed, seed + games) for every point
+    and return the estimate of each point, in the order of the points.
+
+    Blocks of seeds whose results are in the cache, keyed by the contents
+    of the map, the policy, the point and the seeds, are not played again.
+    The others are played in parallel and added to the cache.
+
+    Parameters:
+        filename: Path where the map file should be found.
+        points: The combinations of parameters, see `parameter_grid`.
+        policy: The name of the policy, a key of `headless.POLICIES`.
+        games: The number of games to play for each point.
+        seed: The seed of the first game.
+        workers: The number of processes, None for one per processor.
+        cache_file: Path of the cache file, None to not use a cache.
+    """
+    with open(filename, "rb") as map_file:
+        map_hash = hashlib.sha256(map_file.read()).hexdigest()
+    cache = {} if cache_file is None else load_cache(cache_file)
+
+    results = {point: Estimate() for point in points}
+    missing = []
+    for point in results:
+        for block in seed_blocks(seed, games):
+            cached = cache.get(cache_key(map_hash, policy, point, block))
+            if cached is not None:
+                results[point].merge(Estimate.from_dict(cached))
+            else:
+                missing.append((point, block))
+
+    if missing:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                futures = {executor.submit(_play_block, filename, policy,
+                                           point, *block): (point, block)
+                           for point, block in missing}
+                for future in concurrent.futures.as_completed(futures):
+                    point, block = futures[future]
+                    block_result = future.result()
+                    results[point].merge(block_result)
+                    cache[cache_key(map_hash, policy, point, block)] = \
+                        block_result.to_dict()
+        finally:
+            if cache_file is not None:
+                save_cache(cache_file, cache)
+    return [(point, results[point]) for point in points]
+
+
+def format_table(results: List[Tuple[Point, Estimate]]) -> str:
+    """
+    Return a table of the estimate of every point, one row per point.
+
+    Examples:
+        >>> estimate = Estimate()
+        >>> estimate.add([("won", 10, None), ("infected", 4, "Z")])
+        >>> table = format_table([((10, 5, 1, 0, 200), estimate)])
+        >>> for line in table.splitlines(): print(line[:54])
+        garlic  crossbow  zombies  tracking_zombies  max_steps
+            10         5        1                 0        200
+        >>> for line in table.splitlines(): print(line[54:])
+          games  win_rate  interval     steps  causes
+              2     0.500  0.095-0.905   10.0  Z:1
+    """
+    headings = PARAMETERS + ("games", "win_rate", "interval", "steps",
+                             "causes")
+    rows = [headings]
+    for point, estimate in results:
+        low, high = estimate.get_interval()
+        steps = estimate.get_mean_steps_to_win()
+        causes = " ".join(f"{cause}:{count}" for cause, count
+                          in sorted(estimate.get_causes().items()))
+        rows.append(tuple(map(str, point)) + (
+            str(estimate.get_games()), f"{estimate.get_win_rate():.3f}",
+            f"{low:.3f}-{high:.3f}", "-" if steps is None else f"{steps:.1f}",
+            causes))
+
+    widths = [max(len(row[column]) for row in rows)
+              for column in range(len(headings))]
+    lines = []
+    for row in rows:
+        cells = [cell.ljust(width) if column in (7, 9) else cell.rjust(width)
+                 for column, (cell, width) in enumerate(zip(row, widths))]
+        lines.append("  ".join(cells).rstrip())
+    return "\n".join(lines)
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    """Sweep the map and parameters given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("map", help="path of the map file")
+    parser.add_argument("--garlic", type=int, nargs="+",
+                        default=[LIFETIMES[GARLIC]],
+                        help="lifetimes of garlic")
+    parser.add_argument("--crossbow", type=int, nargs="+",
+                        default=[LIFETIMES[CROSSBOW]],
+                        help="lifetimes of crossbows")
+    parser.add_argument("--zombies", type=int, nargs="+", default=[0],
+                        help="numbers of zombies to add to the map")
+    parser.add_argument("--tracking-zombies", type=int, nargs="+",
+                        default=[0],
+                        help="numbers of tracking zombies to add to the map")
+    parser.add_argument("--max-steps", type=int, nargs="+",
+                        default=[headless.DEFAULT_MAX_STEPS],
+                        help="steps after which a game is abandoned")
+    parser.add_argument("--policy", choices=sorted(headless.POLICIES),
+                        default="greedy", help="policy playing the games")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="number of games for each combination")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes, one per processor if "
+                             "not given")
+    parser.add_argument("--cache", default=CACHE_FILE,
+                        help="cache file")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="play every game without reading or writing "
+                             "the cache")
+    parser.add_argument("--json", action="store_true",
+                        help="print one JSON object per combination")
+    args = parser.parse_args(arguments)
+
+    points = parameter_grid(args.garlic, args.crossbow, args.zombies,
+                            args.tracking_zombies, args.max_steps)
+    results = sweep(args.map, points, args.policy, args.games, args.seed,
+                    args.workers, None if args.no_cache else args.cache)
+    if args.json:
+        for point, estimate in results:
+            print(json.dumps(dict(zip(PARAMETERS, point),
+                                  **estimate.to_dict())))
+    else:
+        print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
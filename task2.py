@@ -300,20 +300,21 @@ class InventoryView(AbstractGrid):
             whether the item can be activated or deactivated
         """
         row, col = self.pixel_to_position(pixel)
-        if row > len(inventory.get_items()):
+        items = inventory.get_items()
+        if row > len(items):
             return False
 
         if inventory.any_active():
-            for index, pickup in enumerate(inventory.get_items()):
+            for index, pickup in enumerate(items):
                 if pickup.is_active() and index + 1 != row:
                     return True
                 if pickup.is_active() and index + 1 == row:
-                    inventory.get_items()[index].toggle_active()
+                    pickup.toggle_active()
                     self.draw_pickup(row, pickup, pickup.is_active())
         else:
-            for index, pickup in enumerate(inventory.get_items()):
+            for index, pickup in enumerate(items):
                 if index + 1 == row:
-                    inventory.get_items()[index].toggle_active()
+                    pickup.toggle_active()
                     self.draw_pickup(row, pickup, pickup.is_active())
         return False
 
@@ -467,6 +468,9 @@ class ImageGraphicalInterface:
         self._file_menu.add_separator()
         self._file_menu.add_command(label="Load game", command=self.load_game)
         self._file_menu.add_separator()
+        # Enabled by play, once the game records its steps
+        self._file_menu.add_command(label="Time machine", command=self.rewind_game, state=tk.DISABLED)
+        self._file_menu.add_separator()
         self._file_menu.add_command(label="Quit", command=self.quit_game)
         self._file_menu.add_separator()
         self._file_menu.add_command(label="High scores", command=self.high_scores)
@@ -506,7 +510,9 @@ class ImageGraphicalInterface:
             event
         """
         direction = event.char.upper()
-        if is_fire:
+        if direction == TIME_MACHINE:
+            self.rewind_game()
+        elif is_fire:
             self._fire(direction)
         else:
             self._move(direction)
@@ -539,21 +545,8 @@ class ImageGraphicalInterface:
 
         """
         if direction in DIRECTIONS:
-            # function handle_action in a2.solution.py
-            start = self._game.get_grid().find_player()
-            offset = self._game.direction_to_offset(direction)
-            if start is None or offset is None:
-                return  # Should never happen.
-
-            # Find the first entity in the direction player fired.
-            first = a2.first_in_direction(
-                self._game.get_grid(), start, offset
-            )
-
-            # If the entity is a zombie, kill it.
-            if first is not None and first[1].display() in ZOMBIES:
-                position, entity = first
-                self._game.get_grid().remove_entity(position)
+            # Kill the first entity in that direction if it is a zombie
+            if self._game.fire(direction):
                 self.draw(self._game)
             else:
                 print(NO_ZOMBIE_MESSAGE)
@@ -620,16 +613,51 @@ class ImageGraphicalInterface:
             game
         """
         self._game = game
+        self._game.enable_time_machine()
+        self._file_menu.entryconfig("Time machine", state=tk.NORMAL)
         self.draw(self._game)
         self.timer()
         self._step(self._game)
 
-        inventory = game.get_player().get_inventory()
+        self._bind_inventory()
+
+        self._master.mainloop()
+
+    def _bind_inventory(self):
+        """
+        Binds clicks on the inventory view to the inventory of the current player
+        """
+        inventory = self._game.get_player().get_inventory()
         self._inventory.bind("<Button-1>",
                              lambda event, func=self._inventory_click, inventory=inventory: self._inventory_click(event,
                                                                                                                   inventory))
 
-        self._master.mainloop()
+    def rewind_game(self):
+        """
+        Ask how many steps to go back in time and rewind the game
+        """
+        if self._game is None or self._game.get_time_machine() is None:
+            return
+
+        # A finished game has no schedule to stop or resume
+        running = not (self._game.has_won() or self._game.has_lost())
+        if running:
+            self.stop_schedule()
+        steps = simpledialog.askinteger(title="Time Machine", prompt="How many steps would you like to go back?",
+                                        minvalue=1, parent=self._master)
+        if steps is not None:
+            self._game.rewind(steps)
+            # The player is replaced when rewinding, so is its inventory
+            self._bind_inventory()
+            # Drawing binds the movement keys again
+            self.draw(self._game)
+            running = not (self._game.has_won() or self._game.has_lost())
+            if not running:
+                self._grid.unbind_all("<Any-KeyPress>")
+
+        if running:
+            self.timer()
+            self._step_schedule = self._master.after(STEP_FPS, self._step, self._game)
 
     def stop_schedule(self):
         """
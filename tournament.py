@@ -0,0 +1,511 @@
+"""
+Runs a tournament of automated players, bots, on a set of maps.
+
+Every bot plays every map with the same seeds in parallel processes, with a
+time budget for each move. Run this module with the bots and maps to print
+a ranked table, e.g.
+`python tournament.py --bots greedy random mybots:Cautious --maps maps/*.txt`,
+where mybots:Cautious names a Bot subclass in the module mybots.
+"""
+import argparse
+import concurrent.futures
+import importlib
+import json
+import signal
+import time
+from typing import Dict, List, Optional, Tuple
+
+import a2_solution as a2
+from constants import *
+import headless
+from montecarlo import Estimate
+
+DEFAULT_BUDGET = 0.05
+"""The default number of seconds a bot may take to choose a move."""
+
+DEFAULT_MAX_FORFEITS = 10
+"""The default number of forfeited moves after which a bot loses a game."""
+
+
+class GameView:
+    """
+    A GameView is the read-only view of a game given to a bot.
+
+    Entities are described by their display characters and items in the
+    inventory by (display, lifetime, active) tuples, so a bot cannot change
+    the game it is playing.
+
+    Examples:
+        >>> grid = a2.Grid(4)
+        >>> grid.add_entity(a2.Position(0, 0), a2.HoldingPlayer())
+        >>> grid.add_entity(a2.Position(0, 2), a2.Zombie())
+        >>> game = a2.AdvancedGame(grid)
+        >>> game.move_player(a2.Position(0, 1))
+        >>> view = GameView(game)
+        >>> view.get_player_position(), view.get_entity(a2.Position(0, 2))
+        (Position(0, 1), 'Z')
+        >>> view.first_in_direction(DOWN)
+        (Position(0, 2), 'Z')
+    """
+
+    def __init__(self, game: a2.AdvancedGame):
+        """
+        Parameters:
+            game: The game being played.
+        """
+        self._game = game
+
+    def get_size(self) -> int:
+        """Return the size of the grid."""
+        return self._game.get_grid().get_size()
+
+    def get_steps(self) -> int:
+        """Return the number of _step_ events played so far."""
+        return self._game.get_steps()
+
+    def get_player_position(self) -> Optional[a2.Position]:
+        """Return the position of the player."""
+        return self._game.get_grid().find_player()
+
+    def get_entity(self, position: a2.Position) -> Optional[str]:
+        """
+        Return the display character of the entity at a position, None if
+        the cell is empty or outside of the grid.
+        """
+        entity = self._game.get_grid().get_entity(position)
+        return None if entity is None else entity.display()
+
+    def positions_of(self, token: str) -> List[a2.Position]:
+        """Return the positions of every entity with a display character."""
+        return self._game.get_grid().positions_of(token)
+
+    def serialize(self) -> Dict[Tuple[int, int], str]:
+        """Return the display character of every entity, see Grid.serialize."""
+        return self._game.get_grid().serialize()
+
+    def first_in_direction(self, direction: str
+                           ) -> Optional[Tuple[a2.Position, str]]:
+        """
+        Return the position and display character of the first entity in a
+        direction from the player, None if there is none.
+
+        Parameters:
+            direction: One of DIRECTIONS.
+        """
+        first = self._game.get_grid().first_in_direction(
+            self.get_player_position(),
+            self._game.direction_to_offset(direction))
+        return None if first is None else (first[0], first[1].display())
+
+    def get_inventory(self) -> List[Tuple[str, int, bool]]:
+        """
+        Return the (display, lifetime, active) of every item the player is
+        holding, in the order of the toggle actions.
+        """
+        inventory = self._game.get_player().get_inventory()
+        return [(item.display(), item.get_lifetime(), item.is_active())
+                for item in inventory.get_items()]
+
+    def snapshot(self) -> a2.AdvancedGame:
+        """
+        Return a copy of the game which the bot may change freely, e.g. to
+        search ahead, see `Game.fork`.
+        """
+        return self._game.fork()
+
+
+class Bot:
+    """
+    A Bot chooses the actions of the player from a view of the game.
+
+    The Bot class is an abstract class, subclasses implement `act`.
+    Subclasses are created with no arguments in the worker processes of a
+    tournament.
+    """
+
+    def reset(self, seed: int) -> None:
+        """
+        Prepare for a new game.
+
+        Parameters:
+            seed: The seed of the new game, for any randomness of the bot.
+        """
+
+    def act(self, view: GameView) -> str:
+        """
+        Return the next action of the player: a direction, FIRE followed by
+        a direction, or headless.TOGGLE followed by an index of the
+        inventory, see `headless.apply_action`.
+
+        Parameters:
+            view: The view of the game being played.
+        """
+        raise NotImplementedError()
+
+
+class PolicyBot(Bot):
+    """A PolicyBot plays a headless Policy on a snapshot of every view."""
+
+    def __init__(self, policy: headless.Policy):
+        """
+        Parameters:
+            policy: The policy choosing the actions.
+        """
+        self._policy = policy
+
+    def reset(self, seed: int) -> None:
+        self._policy.reset(seed)
+
+    def act(self, view: GameView) -> str:
+        return self._policy.choose(view.snapshot())
+
+
+def load_bot(name: str) -> Bot:
+    """
+    Return a new bot by name, either a key of `headless.POLICIES` or the
+    name of a Bot subclass as module:class.
+
+    Examples:
+        >>> type(load_bot("greedy")).__name__
+        'PolicyBot'
+        >>> type(load_bot("tournament:Bot")).__name__
+        'Bot'
+
+    Parameters:
+        name: The name of the bot.
+    """
+    if name in headless.POLICIES:
+        return PolicyBot(headless.POLICIES[name]())
+    module, _, attribute = name.partition(":")
+    if not attribute:
+        raise ValueError(f"Unknown bot {name!r}, expected a policy name or "
+                         f"module:class.")
+    return getattr(importlib.import_module(module), attribute)()
+
+
+class MoveTimeout(BaseException):
+    """
+    Raised in a bot which exceeds its time budget. It is not an Exception so
+    that `except Exception` in a bot does not stop it.
+    """
+
+
+def _interrupt(signum, frame) -> None:
+    """Stop the bot choosing a move, see MoveTimeout."""
+    raise MoveTimeout()
+
+
+def _choose(bot: Bot, view: GameView, budget: float
+            ) -> Tuple[Optional[str], float]:
+    """
+    Return the action chosen by a bot, or None if the bot exceeded its
+    budget or failed, and the seconds taken.
+
+    Where the platform supports SIGALRM a bot is interrupted once its budget
+    runs out, elsewhere the move is only forfeited after the bot returns.
+    """
+    timer = hasattr(signal, "setitimer")
+    start = time.perf_counter()
+    try:
+        try:
+            if timer:
+                signal.setitimer(signal.ITIMER_REAL, budget)
+            action = bot.act(view)
+        finally:
+            if timer:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except (MoveTimeout, Exception):
+        action = None
+    elapsed = time.perf_counter() - start
+    if elapsed > budget or not headless.is_action(action):
+        action = None
+    return action, elapsed
+
+
+BotSummary = Tuple[str, int, Optional[str], int, float, int]
+"""
+A BotSummary is the result of a game played by a bot as a GameSummary
+followed by the number of forfeited moves, the seconds taken by the bot and
+the number of moves it chose.
+"""
+
+
+def play_bot_game(game: a2.AdvancedGame, bot: Bot,
+                  budget: float = DEFAULT_BUDGET,
+                  max_steps: int = headless.DEFAULT_MAX_STEPS,
+                  max_forfeits: int = DEFAULT_MAX_FORFEITS) -> BotSummary:
+    """
+    Play a game to the end with a bot choosing every action.
+
+    A move is forfeited when the bot takes longer than its budget, fails or
+    returns an invalid action: the player stays where it is and the _step_
+    event is triggered. A bot which forfeits max_forfeits moves loses the
+    game with the TIMEOUT outcome, as does a game reaching max_steps.
+
+    Examples:
+        >>> grid = a2.Grid(5)
+        >>> grid.add_entity(a2.Position(0, 0), a2.HoldingPlayer())
+        >>> grid.add_entity(a2.Position(0, 4), a2.Hospital())
+        >>> bot = load_bot("greedy")
+        >>> bot.reset(0)
+        >>> play_bot_game(a2.AdvancedGame(grid), bot)[:4]
+        ('won', 4, None, 0)
+
+    Parameters:
+        game: The game to play.
+        bot: The bot choosing the actions, already reset for the game.
+        budget: The number of seconds the bot may take to choose a move.
+        max_steps: The number of _step_ events after which the game is lost.
+        max_forfeits: The number of forfeited moves after which the game is
+                      lost.
+    """
+    if hasattr(signal, "setitimer"):
+        previous = signal.signal(signal.SIGALRM, _interrupt)
+    view = GameView(game)
+    steps = idle = forfeits = moves = 0
+    thinking = 0.0
+    try:
+        while True:
+            result = headless.finished(game)
+            if result is not None:
+                return (result[0], steps, result[1], forfeits, thinking,
+                        moves)
+            if (steps >= max_steps or idle >= max_steps
+                    or forfeits >= max_forfeits):
+                return headless.TIMEOUT, steps, None, forfeits, thinking, moves
+
+            action, elapsed = _choose(bot, view, budget)
+            thinking += elapsed
+            moves += 1
+            if action is None:
+                forfeits += 1
+                game.step()
+                stepped = True
+            else:
+                stepped = headless.apply_action(game, action)
+            if stepped:
+                steps += 1
+                idle = 0
+            else:
+                idle += 1
+    finally:
+        if hasattr(signal, "setitimer"):
+            signal.signal(signal.SIGALRM, previous)
+
+
+class Standing:
+    """
+    A Standing is the record of one bot in a tournament, with an Estimate
+    for every map it played.
+    """
+
+    def __init__(self, bot: str):
+        """
+        Parameters:
+            bot: The name of the bot, see `load_bot`.
+        """
+        self._bot = bot
+        self._estimates: Dict[str, Estimate] = {}
+        self._forfeits = 0
+        self._thinking = 0.0
+        self._moves = 0
+
+    def add(self, filename: str, summaries: List[BotSummary]) -> None:
+        """
+        Add the summaries of games played by the bot on a map.
+
+        Parameters:
+            filename: Path of the map.
+            summaries: The summaries of the games.
+        """
+        estimate = self._estimates.setdefault(filename, Estimate())
+        estimate.add([summary[:3] for summary in summaries])
+        for _, _, _, forfeits, thinking, moves in summaries:
+            self._forfeits += forfeits
+            self._thinking += thinking
+            self._moves += moves
+
+    def get_bot(self) -> str:
+        """Return the name of the bot."""
+        return self._bot
+
+    def get_estimate(self, filename: str) -> Estimate:
+        """Return the estimate of the games played on a map."""
+        return self._estimates.get(filename, Estimate())
+
+    def get_score(self) -> float:
+        """Return the mean of the win rates of the maps played."""
+        if not self._estimates:
+            return 0.0
+        return (sum(estimate.get_win_rate()
+                    for estimate in self._estimates.values())
+                / len(self._estimates))
+
+    def get_mean_steps_to_win(self) -> Optional[float]:
+        """Return the mean steps of the games won on every map."""
+        total = Estimate()
+        for estimate in self._estimates.values():
+            total.merge(estimate)
+        return total.get_mean_steps_to_win()
+
+    def get_forfeits(self) -> int:
+        """Return the number of moves forfeited by the bot."""
+        return self._forfeits
+
+    def get_mean_move_time(self) -> float:
+        """Return the mean seconds taken by the bot to choose a move."""
+        return self._thinking / self._moves if self._moves else 0.0
+
+    def rank_key(self) -> Tuple[float, float, int]:
+        """
+        Return the key which sorts standings from first to last: highest
+        score, then fewest steps to win, then fewest forfeits.
+        """
+        steps = self.get_mean_steps_to_win()
+        return (-self.get_score(), float("inf") if steps is None else steps,
+                self._forfeits)
+
+
+# The bots and maps loaded by a worker process, by name and path.
+_bots: Dict[str, Bot] = {}
+_templates: Dict[str, headless.MapTemplate] = {}
+
+
+def _play_games(bot_name: str, filename: str, start: int, stop: int,
+                budget: float, max_steps: int, max_forfeits: int
+                ) -> List[BotSummary]:
+    """
+    Play the games of a bot on a map with the seeds in range(start, stop).
+    """
+    bot = _bots.get(bot_name)
+    if bot is None:
+        bot = _bots[bot_name] = load_bot(bot_name)
+    template = _templates.get(filename)
+    if template is None:
+        template = _templates[filename] = headless.MapTemplate(filename)
+    summaries = []
+    for seed in range(start, stop):
+        bot.reset(seed)
+        summaries.append(play_bot_game(template.new_game(seed), bot, budget,
+                                       max_steps, max_forfeits))
+    return summaries
+
+
+def run_tournament(bots: List[str], maps: List[str], games: int = 100,
+                   seed: int = 0, budget: float = DEFAULT_BUDGET,
+                   max_steps: int = headless.DEFAULT_MAX_STEPS,
+                   max_forfeits: int = DEFAULT_MAX_FORFEITS,
+                   workers: Optional[int] = None, batch: int = 50
+                   ) -> List[Standing]:
+    """
+    Play games with the seeds in range(seed, seed + games) for every bot
+    on every map and return the standings of the bots from first to last.
+
+    Parameters:
+        bots: The names of the bots, see `load_bot`.
+        maps: Paths of the map files.
+        games: The number of games each bot plays on each map.
+        seed: The seed of the first game.
+        budget: The number of seconds a bot may take to choose a move.
+        max_steps: The number of _step_ events after which a game is lost.
+        max_forfeits: The number of forfeited moves after which a game is
+                      lost.
+        workers: The number of processes, None for one per processor.
+        batch: The number of games sent to a worker at a time.
+    """
+    for name in bots:
+        load_bot(name)
+    standings = {name: Standing(name) for name in bots}
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = {}
+        for name in bots:
+            for filename in maps:
+                for start in range(seed, seed + games, batch):
+                    stop = min(start + batch, seed + games)
+                    future = executor.submit(_play_games, name, filename,
+                                             start, stop, budget, max_steps,
+                                             max_forfeits)
+                    futures[future] = name, filename
+        for future in concurrent.futures.as_completed(futures):
+            name, filename = futures[future]
+            standings[name].add(filename, future.result())
+    return sorted(standings.values(), key=Standing.rank_key)
+
+
+def format_table(standings: List[Standing], maps: List[str]) -> str:
+    """
+    Return a table of the standings of a tournament, one row per bot with
+    the win rate on every map.
+
+    Parameters:
+        standings: The standings from first to last.
+        maps: Paths of the map files played.
+    """
+    headings = (("rank", "bot") + tuple(maps)
+                + ("score", "steps", "forfeits", "ms/move"))
+    rows = [headings]
+    for rank, standing in enumerate(standings, 1):
+        steps = standing.get_mean_steps_to_win()
+        rates = tuple(f"{standing.get_estimate(filename).get_win_rate():.3f}"
+                      for filename in maps)
+        rows.append((str(rank), standing.get_bot()) + rates
+                    + (f"{standing.get_score():.3f}",
+                       "-" if steps is None else f"{steps:.1f}",
+                       str(standing.get_forfeits()),
+                       f"{standing.get_mean_move_time() * 1000:.2f}"))
+
+    widths = [max(len(row[column]) for row in rows)
+              for column in range(len(headings))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) if column == 1 else cell.rjust(width)
+                  for column, (cell, width) in enumerate(zip(row, widths)))
+        .rstrip()
+        for row in rows)
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    """Run the tournament given on the command line."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bots", nargs="+", required=True,
+                        help="policy names or module:class of Bot subclasses")
+    parser.add_argument("--maps", nargs="+", required=True,
+                        help="paths of the map files")
+    parser.add_argument("--games", type=int, default=100,
+                        help="number of games for each bot on each map")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="seconds a bot may take to choose a move")
+    parser.add_argument("--max-steps", type=int,
+                        default=headless.DEFAULT_MAX_STEPS,
+                        help="steps after which a game is lost")
+    parser.add_argument("--max-forfeits", type=int,
+                        default=DEFAULT_MAX_FORFEITS,
+                        help="forfeited moves after which a game is lost")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes, one per processor if "
+                             "not given")
+    parser.add_argument("--json", action="store_true",
+                        help="print one JSON object per bot")
+    args = parser.parse_args(arguments)
+
+    standings = run_tournament(args.bots, args.maps, args.games, args.seed,
+                               args.budget, args.max_steps, args.max_forfeits,
+                               args.workers)
+    if not args.json:
+        print(format_table(standings, args.maps))
+        return
+    for rank, standing in enumerate(standings, 1):
+        print(json.dumps({
+            "rank": rank, "bot": standing.get_bot(),
+            "score": standing.get_score(),
+            "mean_steps_to_win": standing.get_mean_steps_to_win(),
+            "forfeits": standing.get_forfeits(),
+            "mean_move_time": standing.get_mean_move_time(),
+            "maps": {filename: standing.get_estimate(filename).to_dict()
+                     for filename in args.maps}}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Validates every map file in a directory.
+
+Run this module with a directory of maps to print one JSON object per map,
+e.g. `python validator.py maps`. Maps are validated in parallel and results
+are cached by the contents of each map, so unchanged maps are not validated
+again.
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+import a2_solution as a2
+from constants import *
+
+CACHE_FILE = ".validator_cache.json"
+"""Name of the cache file written to the validated directory by default."""
+
+CACHE_VERSION = 2
+"""Version of the validation rules, changing it invalidates every cache."""
+
+MapReport = Dict[str, Any]
+"""
+A MapReport is the JSON object describing one map, with the keys:
+
+* valid: Whether the map can be played.
+* errors: A list of messages describing why the map cannot be played.
+* size: The size of the map.
+* counts: The number of entities with each display character.
+* reachable: Whether the player can reach a hospital, ignoring zombies,
+  or None if there is not one player and at least one hospital.
+"""
+
+
+def validate_contents(contents: bytes) -> MapReport:
+    """
+    Validate the contents of a map file.
+
+    Every character is turned into an entity with the AdvancedMapLoader, so
+    a character the loader does not recognise is reported as an error.
+
+    Examples:
+        >>> report = validate_contents(b"P Z\\n X \\n  H\\n")
+        >>> report["valid"], report["counts"], report["reachable"]
+        (False, {'P': 1, 'Z': 1, 'H': 1}, True)
+        >>> report["errors"]
+        ["(1, 1): Unrecognised entity 'X' in map file."]
+        >>> validate_contents(b"P \\r\\n H\\r\\n")["errors"]
+        []
+
+    Parameters:
+        contents: The bytes of the map file.
+    """
+    errors = []
+    try:
+        text = io.TextIOWrapper(io.BytesIO(contents), "utf-8",
+                                newline=None)
+        lines = text.readlines()
+    except UnicodeDecodeError as error:
+        return {"valid": False, "errors": [f"Cannot decode map: {error}"],
+                "size": 0, "counts": {}, "reachable": None}
+
+    mapping, size = a2.parse_map(lines)
+    loader = a2.AdvancedMapLoader()
+    grid = a2.Grid(size)
+    counts: Dict[str, int] = {}
+    for (x, y), token in mapping.items():
+        try:
+            entity = loader.create_entity(token)
+        except Exception as error:
+            errors.append(f"({x}, {y}): {error}")
+            continue
+        if x >= size:
+            errors.append(f"({x}, {y}): '{token}' is outside of the map.")
+            continue
+        counts[token] = counts.get(token, 0) + 1
+        grid.add_entity(grid.get_position(x, y), entity)
+
+    players = counts.get(PLAYER, 0)
+    if players != 1:
+        errors.append(f"Expected one player, found {players}.")
+    if counts.get(HOSPITAL, 0) == 0:
+        errors.append("There is no hospital.")
+
+    reachable = None
+    if players == 1 and counts.get(HOSPITAL, 0) > 0:
+        reachable = hospital_reachable(grid)
+        if not reachable:
+            errors.append("The hospital cannot be reached from the player.")
+
+    return {"valid": not errors, "errors": errors, "size": size,
+            "counts": counts, "reachable": reachable}
+
+
+def hospital_reachable(grid: a2.Grid) -> bool:
+    """
+    Return true if the player can reach a hospital, moving through empty
+    cells, pickups and zombies.
+
+    Parameters:
+        grid: The grid of the map, with exactly one player.
+    """
+    size = grid.get_size()
+    neighbours = a2.neighbour_indices(size)
+    codes = grid.get_codes()
+    hospital = a2.ENTITY_CODES[HOSPITAL]
+    passable = {0, hospital}
+    passable.update(a2.ENTITY_CODES[token]
+                    for token in ZOMBIES + PICKUP_ITEMS)
+
+    start = grid.find_player()
+    first = start.get_y() * size + start.get_x()
+    seen = {first}
+    frontier = [first]
+    while frontier:
+        reached = []
+        for cell in frontier:
+            for neighbour in neighbours[cell * 4:cell * 4 + 4]:
+                if neighbour < 0 or neighbour in seen:
+                    continue
+                code = codes[neighbour]
+                if code == hospital:
+                    return True
+                if code in passable:
+                    seen.add(neighbour)
+                    reached.append(neighbour)
+        frontier = reached
+    return False
+
+
+def load_cache(filename: str) -> Dict[str, MapReport]:
+    """
+    Return the reports cached in a file by content hash, or an empty cache
+    if the file is missing, unreadable or from other validation rules.
+
+    Parameters:
+        filename: Path of the cache file.
+    """
+    try:
+        with open(filename) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("reports", {})
+
+
+def save_cache(filename: str, reports: Dict[str, MapReport]) -> None:
+    """
+    Write the reports cached by content hash to a file.
+
+    Parameters:
+        filename: Path of the cache file.
+        reports: The reports by content hash.
+    """
+    with open(filename, "w") as cache_file:
+        json.dump({"version": CACHE_VERSION, "reports": reports}, cache_file)
+
+
+def validate_directory(directory: str, suffix: str = ".txt",
+                       workers: Optional[int] = None,
+                       cache_file: Optional[str] = None
+                       ) -> Iterator[MapReport]:
+    """
+    Validate every map file in a directory with a pool of processes,
+    yielding each report as soon as it is ready.
+
+    Each report has the keys of a MapReport and also "map", the path of the
+    map, "sha256", the hash of its contents and "cached", whether the report
+    came from the cache.
+
+    Parameters:
+        directory: The directory containing the map files.
+        suffix: Only files whose names end with this are validated.
+        workers: The number of processes, None for one per processor.
+        cache_file: Path of the cache file, None for CACHE_FILE in the
+                    directory.
+    """
+    if cache_file is None:
+        cache_file = os.path.join(directory, CACHE_FILE)
+    cache = load_cache(cache_file)
+    used: Dict[str, MapReport] = {}
+
+    pending = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.endswith(suffix) or not os.path.isfile(path):
+            continue
+        with open(path, "rb") as map_file:
+            contents = map_file.read()
+        digest = hashlib.sha256(contents).hexdigest()
+        report = cache.get(digest)
+        if report is not None:
+            used[digest] = report
+            yield dict(map=path, sha256=digest, cached=True, **report)
+        else:
+            pending.append((path, digest, contents))
+
+    try:
+        if pending:
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                futures = {executor.submit(validate_contents, contents):
+                           (path, digest)
+                           for path, digest, contents in pending}
+                for future in concurrent.futures.as_completed(futures):
+                    path, digest = futures[future]
+                    report = used[digest] = future.result()
+                    yield dict(map=path, sha256=digest, cached=False,
+                               **report)
+    finally:
+        save_cache(cache_file, used)
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    """
+    Validate the maps of the directory given on the command line, printing
+    one JSON object per line.
+
+    Returns:
+        The exit status, 1 if any map is not valid.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directory", help="directory containing the maps")
+    parser.add_argument("--suffix", default=".txt",
+                        help="suffix of the map file names")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes, one per processor if "
+                             "not given")
+    parser.add_argument("--cache", default=None,
+                        help=f"cache file, {CACHE_FILE} in the directory if "
+                             f"not given")
+    args = parser.parse_args(arguments)
+
+    status = 0
+    for report in validate_directory(args.directory, args.suffix,
+                                     args.workers, args.cache):
+        if not report["valid"]:
+            status = 1
+        print(json.dumps(report), flush=True)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,525 @@
+"""
+A vectorised environment which plays many games of one map in lock step,
+for training learned agents.
+
+Observations, rewards and done flags of all games are written into flat
+buffers which are reused every step, so a consumer can wrap them without
+copying, e.g. `numpy.frombuffer(codes, numpy.uint8).reshape(count, size,
+size)`.
+
+The type codes of every game are layers of one buffer, see LayerGrid, and
+the zombies of all of the games move in one pass over that buffer, see
+LayerStepper.
+"""
+import array
+import re
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import a2_solution as a2
+from constants import *
+import headless
+
+ACTIONS = (headless.MOVES + headless.FIRES
+           + [f"{headless.TOGGLE}{index}" for index in range(MAX_ITEMS)])
+"""The action of each action number, see `headless.apply_action`."""
+
+FEATURES = ("garlic", "active_garlic", "crossbow", "active_crossbow", "steps")
+"""
+The features of each game which are not in the grid: the number of garlic
+and crossbows the player holds and how many of each are active, and the
+number of _step_ events played.
+"""
+
+_PLAYER_CODE = a2.ENTITY_CODES[PLAYER]
+_ZOMBIE_CODE = a2.ENTITY_CODES[ZOMBIE]
+_TRACKING_ZOMBIE_CODE = a2.ENTITY_CODES[TRACKING_ZOMBIE]
+_TRACKING_ZOMBIE = a2.flyweight(a2.TrackingZombie)
+_OCCUPIED_CELL = re.compile(b"[^\x00]")
+# Cells whose entity may have a step behaviour: players, zombies and
+# entities without a type code.
+_ACTOR_CELL = re.compile(b"[" + bytes([_PLAYER_CODE, _ZOMBIE_CODE,
+                                      _TRACKING_ZOMBIE_CODE, a2.OTHER_CODE])
+                         + b"]")
+_PLAYER_CELL = re.compile(re.escape(bytes([_PLAYER_CODE])))
+_DIRECTION_NUMBERS = {offset: number for number, offset in enumerate(OFFSETS)}
+
+WIN_REWARD = 1.0
+LOSS_REWARD = -1.0
+STEP_REWARD = -0.01
+
+Observation = Tuple[bytearray, array.array]
+"""
+An Observation of every game as a (codes, features) tuple of the type code
+of every cell, see `Grid.get_codes`, with count * size * size values in
+game then row major order, and the FEATURES of every game, with
+count * len(FEATURES) values.
+"""
+
+Transition = Tuple[bytearray, array.array, array.array, bytearray,
+                   List[Optional[headless.GameSummary]]]
+"""
+A Transition is the result of stepping every game as a (codes, features,
+rewards, dones, summaries) tuple of the Observation after the step, the
+reward and whether the game ended for each game, and the GameSummary of
+each game which ended, None for the others.
+"""
+
+
+class LayerGrid(a2.ArrayGrid):
+    """
+    A LayerGrid is an ArrayGrid whose type codes can be a layer of a buffer
+    shared with other grids, see `attach`.
+
+    A layer grid keeps no index of its entities besides the type codes, so
+    a zombie moves by writing two bytes of the buffer, see LayerStepper.
+    Finding the player, the actors and the entities of a type scan the type
+    codes in row major order, and the hash is computed when asked for.
+
+    Examples:
+        >>> grid = LayerGrid(2)
+        >>> grid.add_entity(a2.Position(1, 0), a2.Zombie())
+        >>> buffer = bytearray(8)
+        >>> grid.attach(buffer, 1)
+        >>> grid.add_entity(a2.Position(0, 1), a2.HoldingPlayer())
+        >>> list(buffer), grid.find_player(), grid.get_layer()
+        ([0, 0, 0, 0, 0, 3, 1, 0], Position(0, 1), 1)
+        >>> grid.fork().get_layer()
+    """
+
+    def __init__(self, size: int):
+        """
+        Parameters:
+            size: The length and width of the grid.
+        """
+        super().__init__(size)
+        self._layer: Optional[int] = None
+
+    # The type codes may be a view of a shared buffer, forks take a copy.
+    _SHARED_FIELDS = tuple(name for name in a2.ArrayGrid._SHARED_FIELDS
+                           if name != "_codes")
+
+    def attach(self, buffer: bytearray, layer: int) -> None:
+        """
+        Move the type codes of this grid into a layer of a buffer, the
+        cells of layer n being the n-th size * size bytes of the buffer, so
+        that changes to the grid change the buffer and the other way round.
+
+        Parameters:
+            buffer: The shared buffer.
+            layer: The number of the layer of this grid.
+        """
+        cells = self._size * self._size
+        view = memoryview(buffer)[layer * cells:(layer + 1) * cells]
+        view[:] = self._codes
+        self._codes = view
+        self._layer = layer
+
+    def detach(self) -> None:
+        """Give this grid its own copy of the type codes again."""
+        self._codes = bytearray(self._codes)
+        self._layer = None
+
+    def get_layer(self) -> Optional[int]:
+        """Return the layer of the buffer holding this grid, None if none."""
+        return self._layer
+
+    def fork(self) -> "LayerGrid":
+        fork = super().fork()
+        fork._codes = bytearray(self._codes)
+        fork._layer = None
+        return fork
+
+    def get_codes(self) -> bytearray:
+        return bytearray(self._codes)
+
+    def _track(self, position: a2.Position, entity: a2.Entity) -> None:
+        pass
+
+    def _untrack(self, position: a2.Position, entity: a2.Entity) -> None:
+        pass
+
+    def _record_move(self, start: a2.Position, end: a2.Position,
+                     entity: a2.Entity) -> None:
+        """
+        Bring the journal and listeners up to date with a move made to the
+        type codes directly.
+        """
+        if self._journal is not None:
+            self._journal.append((start, entity))
+            self._journal.append((end, None))
+        for listener in self._listeners:
+            listener(start)
+            listener(end)
+
+    def _cells_of(self, token: str) -> Iterator[int]:
+        """Return the indexes of the cells of entities displayed as token."""
+        code = a2.ENTITY_CODES.get(token)
+        if code is None:
+            size = self._size
+            return (position._y * size + position._x
+                    for position, entity in self._items()
+                    if entity.display() == token)
+        return (match.start() for match in re.finditer(
+            re.escape(bytes([code])), self._codes))
+
+    def find_player(self) -> Optional[a2.Position]:
+        match = _PLAYER_CELL.search(self._codes)
+        if match is None:
+            return None
+        index = match.start()
+        return self._positions.get(index % self._size, index // self._size)
+
+    def positions_of(self, token: str) -> List[a2.Position]:
+        """
+        Return the positions of every entity in the grid which is displayed
+        with the given character, in row major order.
+
+        Parameters:
+            token: The display character of the entities to find.
+        """
+        size = self._size
+        positions = self._positions
+        return [positions.get(index % size, index // size)
+                for index in self._cells_of(token)]
+
+    def count_of(self, token: str) -> int:
+        code = a2.ENTITY_CODES.get(token)
+        if code is None:
+            return sum(1 for _ in self._cells_of(token))
+        return bytes(self._codes).count(code)
+
+    def get_hash(self) -> int:
+        return self.compute_hash()
+
+    def first_in_direction(
+        self, start: a2.Position, offset: a2.Position
+    ) -> Optional[Tuple[a2.Position, a2.Entity]]:
+        dx = offset._x
+        dy = offset._y
+        if not self.in_bounds(start) or abs(dx) + abs(dy) != 1:
+            return super().first_in_direction(start, offset)
+
+        size = self._size
+        if dy == 0:
+            line = bytes(self._codes[start._y * size:(start._y + 1) * size])
+            here = start._x
+        else:
+            line = bytes(self._codes[start._x::size])
+            here = start._y
+        if dx + dy > 0:
+            found = _OCCUPIED_CELL.search(line, here + 1)
+            if found is None:
+                return None
+            found = found.start()
+        else:
+            found = len(line[:here].rstrip(b"\x00")) - 1
+            if found < 0:
+                return None
+
+        if dy == 0:
+            position = self._positions.get(found, start._y)
+        else:
+            position = self._positions.get(start._x, found)
+        return position, self._get(position)
+
+
+class LayerStepper:
+    """
+    A LayerStepper performs the _step_ event of games on LayerGrids which
+    are layers of one buffer.
+
+    `step_games` moves the zombies of many games in a single pass over the
+    buffer, each move being two writes to the buffer. Games are visited in
+    the order of their layers and the cells of each game in row major
+    order, every zombie picking its directions as its step method does, so
+    each game is the same as when it is stepped on its own as an ArrayGrid
+    game. Other entities with a step behaviour have their step method
+    called in turn.
+
+    Examples:
+        >>> template = headless.MapTemplate("maps/basic2.txt", LayerGrid)
+        >>> size = template.get_game().get_grid().get_size()
+        >>> buffer = bytearray(2 * size * size)
+        >>> stepper = LayerStepper(buffer, size)
+        >>> games = []
+        >>> for layer in range(2):
+        ...     game = template.new_game(layer)
+        ...     game.get_grid().attach(buffer, layer)
+        ...     game.set_stepper(stepper)
+        ...     games.append(game)
+        >>> for _ in range(10): stepper.step_games(games)
+        >>> alone = headless.MapTemplate("maps/basic2.txt", a2.ArrayGrid)
+        >>> reference = alone.new_game(1)
+        >>> for _ in range(10): reference.step()
+        >>> games[1].get_grid().serialize() == reference.get_grid().serialize()
+        True
+        >>> games[1].get_steps()
+        10
+    """
+
+    def __init__(self, buffer: bytearray, size: int):
+        """
+        Parameters:
+            buffer: The buffer whose layers hold the grids of the games.
+            size: The length and width of the grid of every game.
+        """
+        self._buffer = buffer
+        self._size = size
+        self._neighbours = a2.neighbour_indices(size)
+        # The grids whose zombies were moved by step_games, whose _step_
+        # event still has to finish.
+        self._moved: Set[a2.Grid] = set()
+
+    def step_games(self, games: Sequence[a2.Game]) -> None:
+        """
+        Perform the _step_ event of games whose grids are distinct layers of
+        the buffer of this stepper and which are stepped by this stepper,
+        see `Game.set_stepper`.
+
+        Parameters:
+            games: The games to step.
+        """
+        layers = {game.get_grid().get_layer(): game for game in games}
+        self._move(self._buffer, layers)
+        self._moved = {game.get_grid() for game in games}
+        for game in games:
+            game.step()
+
+    def step(self, game: a2.Game) -> None:
+        """
+        Perform the _step_ event of a game, on its own unless its zombies
+        were already moved by `step_games`.
+
+        Parameters:
+            game: The game to step, its grid must be a LayerGrid.
+        """
+        grid = game.get_grid()
+        if grid in self._moved:
+            self._moved.discard(grid)
+            return
+        self._move(grid._codes, {0: game})
+
+    def _move(self, codes, layers: Dict[int, a2.Game]) -> None:
+        """
+        Move the zombies of the games in the given layers of a buffer, or
+        of the type codes of one grid as layer 0.
+        """
+        size = self._size
+        cells = size * size
+        neighbours = self._neighbours
+        numbers = _DIRECTION_NUMBERS
+        offsets = a2.OFFSET_POSITIONS
+        zombie = _ZOMBIE_CODE
+        current = -1
+        for match in _ACTOR_CELL.finditer(bytes(codes)):
+            cell = match.start()
+            layer, index = divmod(cell, cells)
+            if layer != current:
+                current = layer
+                game = layers.get(layer)
+                if game is not None:
+                    grid = game.get_grid()
+                    positions = grid._positions
+                    stateful = grid._stateful
+                    start = layer * cells
+                    rng = game.get_rng()
+            if game is None:
+                continue
+            code = codes[cell]
+            position = positions.get(index % size, index // size)
+            entity = stateful.get(index)
+            if entity is not None:
+                if a2.is_actor(entity):
+                    entity.step(position, game)
+                continue
+            if code == zombie:
+                directions = rng.directions()
+            elif code == _TRACKING_ZOMBIE_CODE:
+                directions = _TRACKING_ZOMBIE._directions(position, game)
+            else:
+                # The cell was emptied by an earlier step.
+                continue
+
+            base = index * 4
+            for direction in directions:
+                destination = neighbours[base + numbers[direction]]
+                if destination < 0:
+                    continue
+                target = codes[start + destination]
+                if target == 0:
+                    codes[start + destination] = code
+                    codes[cell] = 0
+                    grid._record_move(position,
+                                      position.add(offsets[direction]),
+                                      grid._prototypes[code])
+                    break
+                if target == _PLAYER_CODE or target == a2.OTHER_CODE:
+                    player = grid.get_entity(position.add(offsets[direction]))
+                    if isinstance(player, a2.VulnerablePlayer):
+                        player.infect(grid._prototypes[code])
+                        break
+
+
+class VectorEnv:
+    """
+    A VectorEnv holds a number of games of one map, all stepped together by
+    a sequence of action numbers, one per game.
+
+    A game which ends is replaced by a new game of the map with the next
+    unused seed, so the observation of a game which ended is the first
+    observation of its new game. Games are forks of a map loaded once, see
+    `headless.MapTemplate`, stored in LayerGrids whose layers are the type
+    codes of the observation, and stepped together by a LayerStepper. Each
+    game is the same as an ArrayGrid game played on its own.
+
+    The buffers returned by `reset` and `step` are overwritten by the next
+    call and should be copied to be kept.
+
+    Examples:
+        >>> env = VectorEnv("maps/basic.txt", 3, seed=0)
+        >>> codes, features = env.reset()
+        >>> len(codes), list(features[:len(FEATURES)])
+        (75, [0, 0, 0, 0, 0])
+        >>> codes, features, rewards, dones, summaries = env.step([3, 3, 1])
+        >>> list(rewards), list(dones), summaries
+        ([-0.01, -0.01, -0.01], [0, 0, 0], [None, None, None])
+        >>> features[len(FEATURES) - 1]
+        1
+    """
+
+    def __init__(self, filename: str, count: int, seed: int = 0,
+                 max_steps: int = headless.DEFAULT_MAX_STEPS):
+        """
+        Parameters:
+            filename: Path where the map file should be found.
+            count: The number of games.
+            seed: The seed of the first game, game i starts with seed + i.
+            max_steps: The number of _step_ events after which a game ends.
+        """
+        template = headless.MapTemplate(filename, LayerGrid)
+        size = template.get_game().get_grid().get_size()
+        self._template = template
+        self._count = count
+        self._seed = seed
+        self._max_steps = max_steps
+        self._cells = size * size
+
+        self._games: List[a2.AdvancedGame] = []
+        self._idle = [0] * count
+        self._next_seed = seed
+        self._codes = bytearray(count * self._cells)
+        self._stepper = LayerStepper(self._codes, size)
+        template.get_game().set_stepper(self._stepper)
+        self._features = array.array("i", bytes(4 * count * len(FEATURES)))
+        self._rewards = array.array("d", bytes(8 * count))
+        self._dones = bytearray(count)
+
+    def get_count(self) -> int:
+        """Return the number of games."""
+        return self._count
+
+    def get_size(self) -> int:
+        """Return the size of the grid of every game."""
+        return self._template.get_game().get_grid().get_size()
+
+    def get_games(self) -> List[a2.AdvancedGame]:
+        """Return the games currently being played."""
+        return self._games[:]
+
+    def reset(self) -> Observation:
+        """
+        Start every game again, with the seeds the games started with when
+        the environment was created, and return their observations.
+        """
+        self._next_seed = self._seed
+        for game in self._games:
+            game.get_grid().detach()
+        self._games = [self._new_game(index) for index in range(self._count)]
+        self._idle = [0] * self._count
+        for index, game in enumerate(self._games):
+            self._observe(index, game)
+        return self._codes, self._features
+
+    def step(self, actions: Sequence[int]) -> Transition:
+        """
+        Perform one action in every game, see ACTIONS.
+
+        Every game which is won, lost or reaches max_steps ends: its reward
+        includes WIN_REWARD or LOSS_REWARD and it is replaced by a new game.
+        A game whose player only toggles items for max_steps actions in a
+        row also ends.
+
+        Parameters:
+            actions: The number of the action of each game.
+        """
+        if len(actions) != self._count:
+            raise ValueError(f"Expected {self._count} actions, "
+                             f"got {len(actions)}.")
+        if not self._games:
+            self.reset()
+
+        rewards = self._rewards
+        dones = self._dones
+        summaries: List[Optional[headless.GameSummary]] = [None] * self._count
+        stepping = []
+        for index, game in enumerate(self._games):
+            if headless.apply_action(game, ACTIONS[actions[index]],
+                                     step=False):
+                stepping.append(game)
+                self._idle[index] = 0
+            else:
+                self._idle[index] += 1
+        self._stepper.step_games(stepping)
+
+        for index, game in enumerate(self._games):
+            reward = 0.0 if self._idle[index] else STEP_REWARD
+            steps = game.get_steps()
+            result = headless.finished(game)
+            if result is None and (steps >= self._max_steps
+                                   or self._idle[index] >= self._max_steps):
+                result = headless.TIMEOUT, None
+            if result is None:
+                dones[index] = 0
+            else:
+                if result[0] == headless.WON:
+                    reward += WIN_REWARD
+                elif result[0] == headless.INFECTED:
+                    reward += LOSS_REWARD
+                dones[index] = 1
+                summaries[index] = (result[0], steps, result[1])
+                game.get_grid().detach()
+                game = self._games[index] = self._new_game(index)
+                self._idle[index] = 0
+            rewards[index] = reward
+            self._observe(index, game)
+        return self._codes, self._features, rewards, dones, summaries
+
+    def _new_game(self, index: int) -> a2.AdvancedGame:
+        """
+        Return a new game with the next unused seed, whose grid is the layer
+        of the type codes of the game with the given index.
+        """
+        game = self._template.new_game(self._next_seed)
+        self._next_seed += 1
+        game.get_grid().attach(self._codes, index)
+        return game
+
+    def _observe(self, index: int, game: a2.AdvancedGame) -> None:
+        """
+        Write the features of a game into the buffers, its type codes are
+        already a layer of the observation.
+        """
+        garlic = active_garlic = crossbow = active_crossbow = 0
+        player = game.get_player()
+        if isinstance(player, a2.HoldingPlayer):
+            for item in player.get_inventory().get_items():
+                if item.display() == GARLIC:
+                    garlic += 1
+                    active_garlic += item.is_active()
+                else:
+                    crossbow += 1
+                    active_crossbow += item.is_active()
+        start = index * len(FEATURES)
+        self._features[start:start + len(FEATURES)] = array.array(
+            "i", (garlic, active_garlic, crossbow, active_crossbow,
+                  game.get_steps()))